@@ -1,9 +1,23 @@
+import argparse
+import importlib.util
+import os
+from bisect import bisect_right
+from itertools import accumulate
+
+from common_flights import (
+    KODECI, brojac, dodaj_sink, faza, metrike_ukljucene, otvori_izlaz, otvori_ulaz, pisi_delove,
+    pokreni_uporedo, postavi_nivo_kompresije, procitaj_parove, pronadji_ulaz, putanja_rezultata, sufiks_kompresije,
+    ucitaj_sa_kesom, ucitaj_sink, ukljuci_metrike, zavrsi_metrike
+)
+
+
 def ucitaj_letove(naziv_datoteke):
     """Učitava letove iz datoteke i vraća strukturu podataka sa letovima."""
     letovi = []
+    broj_redova = 0
     
-    with open(naziv_datoteke, 'r', encoding='utf-8') as f:
-        for linija in f:
+    with otvori_ulaz(naziv_datoteke) as f:
+        for broj_redova, linija in enumerate(f, 1):
             linija = linija.strip()
             if not linija:
                 continue
@@ -65,6 +79,34 @@ def ucitaj_letove(naziv_datoteke):
                 'letovi': letovi_na_liniji
             })
     
+    brojac('redova', broj_redova)
+    return letovi
+
+
+def prebroj_letove(letovi):
+    """Brojači ruta i letova, samo kada je merenje uključeno."""
+    if metrike_ukljucene():
+        brojac('ruta', len({(r['grad_polaska'], r['grad_dolaska']) for r in letovi}))
+        brojac('letova', sum(len(r['letovi']) for r in letovi))
+
+
+def pisi_izlaze(upisi_direktne, upisi_indirektne, uporedo=None):
+    """Direktni pa indirektni letovi, ili oba istovremeno (uporedo: thread/process)."""
+    if uporedo is None:
+        with faza('direct'):
+            upisi_direktne()
+        with faza('indirect'):
+            upisi_indirektne()
+        return
+    with faza('izlaz'):
+        pokreni_uporedo([upisi_direktne, upisi_indirektne], uporedo)
+
+
+def ucitaj_red_letenja():
+    """Učitava flights.txt (ili .gz/.zst) preko binarnog keša, kao faza merenja."""
+    with faza('ucitavanje'):
+        letovi = ucitaj_sa_kesom(pronadji_ulaz('flights.txt'), ucitaj_letove, 'cc')
+        prebroj_letove(letovi)
     return letovi
 
 
@@ -87,19 +129,29 @@ def formiraj_direktne_letove(letovi, naziv_datoteke):
     # Sortiranje parova leksikografski
     sortirani_parovi = sorted(parovi.keys())
     
-    with open(naziv_datoteke, 'w', encoding='utf-8') as f:
-        for par in sortirani_parovi:
-            f.write(f"{par}\n")
-            
-            # Sortiranje aviokompanija leksikografski
-            sortirane_kompanije = sorted(parovi[par], key=lambda x: x['aviokompanija'])
+    with otvori_izlaz(naziv_datoteke) as f:
+        pisi_delove(f, redovi_direktnih(parovi, sortirani_parovi))
+
+
+def redovi_direktnih(parovi, sortirani_parovi):
+    """Redovi datoteke sa direktnim letovima, redom."""
+    for par in sortirani_parovi:
+        yield f"{par}\n"
+        
+        # Sortiranje aviokompanija leksikografski
+        sortirane_kompanije = sorted(parovi[par], key=lambda x: x['aviokompanija'])
+        
+        for kompanija in sortirane_kompanije:
+            # Sortiranje letova hronološki
+            sortirani_letovi = sorted(kompanija['letovi'], key=lambda x: x['vreme_polaska'])
             
-            for kompanija in sortirane_kompanije:
-                # Sortiranje letova hronološki
-                sortirani_letovi = sorted(kompanija['letovi'], key=lambda x: x['vreme_polaska'])
-                
-                for let in sortirani_letovi:
-                    f.write(f"{kompanija['aviokompanija']}|{let['vreme_polaska']}-{let['vreme_dolaska']},{let['cena']:.2f}\n")
+            for let in sortirani_letovi:
+                yield f"{kompanija['aviokompanija']}|{prikaz_leta(let)}\n"
+
+
+def prikaz_leta(let):
+    """Tekst leta u izlazu: hh:mm-hh:mm,cena."""
+    return f"{let['vreme_polaska']}-{let['vreme_dolaska']},{let['cena']:.2f}"
 
 
 def vreme_u_minute(vreme_str):
@@ -113,16 +165,16 @@ def trajanje_leta(vreme_polaska, vreme_dolaska):
     return vreme_u_minute(vreme_dolaska) - vreme_u_minute(vreme_polaska)
 
 
-def formiraj_indirektne_letove(letovi, par_gradova, naziv_datoteke):
-    """Formira datoteku sa letovima sa jednim presedalim."""
-    delovi = par_gradova.split('->')
-    if len(delovi) != 2:
-        raise ValueError("Neispravan format para gradova")
-    
-    polazni_grad = delovi[0]
-    odredisni_grad = delovi[1]
-    
-    # Pronalaženje svih letova
+def kljuc_leta(let):
+    """Ključ sortiranja: vreme polaska, trajanje, aviokompanija."""
+    return (let['min_polaska'], let['min_dolaska'] - let['min_polaska'], let['aviokompanija'])
+
+
+def grupisi_po_gradovima(letovi):
+    """
+    Grupiše letove po gradu polaska i gradu dolaska.
+    Vremena se parsiraju tek kada se ruta prvi put spaja (letovi_rute).
+    """
     letovi_iz = {}  # grad_polaska -> grad_dolaska -> lista letova
     
     for linija in letovi:
@@ -142,49 +194,297 @@ def formiraj_indirektne_letove(letovi, par_gradova, naziv_datoteke):
                 'vreme_dolaska': let['vreme_dolaska'],
                 'cena': let['cena']
             })
-    
-    # Pronalaženje svih presedanja
-    presedanja = {}
+
+    return letovi_iz
+
+
+def letovi_rute(letovi_iz, grad_p, grad_d):
+    """
+    Letovi rute grad_p -> grad_d sortirani po kljuc_leta, sa vremenima u minutima.
+    Ruta se priprema pri prvom spajanju i takva ostaje (batch režim je deli),
+    pa neispravno vreme na ruti koja se ne spaja ne prekida upit.
+    """
+    lista = letovi_iz[grad_p][grad_d]
+    if lista and 'min_polaska' not in lista[0]:
+        for let in lista:
+            let['min_polaska'] = vreme_u_minute(let['vreme_polaska'])
+            let['min_dolaska'] = vreme_u_minute(let['vreme_dolaska'])
+        lista.sort(key=kljuc_leta)
+    return lista
+
+
+def parsiraj_par(par_gradova):
+    """Razdvaja upit CITY1->CITY2 na polazni i odredišni grad."""
+    delovi = par_gradova.split('->')
+    if len(delovi) != 2:
+        raise ValueError("Neispravan format para gradova")
+
+    return delovi[0], delovi[1]
+
+
+def pronadji_presedanja(letovi_iz, polazni_grad, odredisni_grad):
+    """Sortirani gradovi preko kojih postoji veza polazni -> medjugrad -> odredišni."""
+    presedanja = []
     
     if polazni_grad in letovi_iz:
         for medjugrad in letovi_iz[polazni_grad]:
             if medjugrad != odredisni_grad and medjugrad in letovi_iz:
                 if odredisni_grad in letovi_iz[medjugrad]:
-                    presedanja[medjugrad] = []
-                    
-                    # Kombinacije letova
-                    for let1 in letovi_iz[polazni_grad][medjugrad]:
-                        for let2 in letovi_iz[medjugrad][odredisni_grad]:
-                            # Provera da li je vreme presedanja moguće
-                            if vreme_u_minute(let2['vreme_polaska']) > vreme_u_minute(let1['vreme_dolaska']):
-                                presedanja[medjugrad].append((let1, let2))
+                    presedanja.append(medjugrad)
     
     # Sortiranje gradova presedanja leksikografski
-    sortirani_gradovi = sorted(presedanja.keys())
+    presedanja.sort()
+    return presedanja
+
+
+def formiraj_indirektne_letove(letovi, par_gradova, naziv_datoteke, letovi_iz=None,
+                               offset=0, limit=None):
+    """
+    Formira datoteku sa letovima sa jednim presedalim.
+    offset/limit: po međugradu se preskače prvih offset parova i piše najviše limit.
+    """
+    polazni_grad, odredisni_grad = parsiraj_par(par_gradova)
     
-    with open(naziv_datoteke, 'w', encoding='utf-8') as f:
-        for medjugrad in sortirani_gradovi:
+    # Pronalaženje svih letova (batch režim prosleđuje već grupisane letove)
+    if letovi_iz is None:
+        letovi_iz = grupisi_po_gradovima(letovi)
+    
+    # Pronalaženje svih gradova presedanja
+    presedanja = pronadji_presedanja(letovi_iz, polazni_grad, odredisni_grad)
+    
+    with otvori_izlaz(naziv_datoteke) as f:
+        for medjugrad in presedanja:
             f.write(f"{polazni_grad}->{medjugrad}->{odredisni_grad}\n")
             
-            # Sortiranje kombinacija
-            kombinacije = presedanja[medjugrad]
-            kombinacije_sortirane = sorted(kombinacije, key=lambda x: (
-                x[0]['vreme_polaska'],
-                trajanje_leta(x[0]['vreme_polaska'], x[0]['vreme_dolaska']),
-                x[0]['aviokompanija']
-            ))
+            # Obe liste su već sortirane po (polazak, trajanje, aviokompanija)
+            prvi_letovi = letovi_rute(letovi_iz, polazni_grad, medjugrad)
+            drugi_letovi = letovi_rute(letovi_iz, medjugrad, odredisni_grad)
+            polasci_drugih = [let2['min_polaska'] for let2 in drugi_letovi]
+
+            # Tekst drugog dela se formira jednom po letu
+            drugi_blokovi = [
+                f"{medjugrad}->{odredisni_grad}\n"
+                f"{let2['aviokompanija']}|{prikaz_leta(let2)}\n"
+                for let2 in drugi_letovi
+            ]
             
-            for let1, let2 in kombinacije_sortirane:
-                f.write(f"{polazni_grad}->{medjugrad}\n")
-                f.write(f"{let1['aviokompanija']}|{let1['vreme_polaska']}-{let1['vreme_dolaska']},{let1['cena']:.2f}\n")
+            preskoci = offset
+            ostalo = limit
+            parova = 0
+            for let1 in prvi_letovi:
+                if ostalo == 0:
+                    break
+
+                # Validni drugi letovi su sufiks: polazak strogo posle dolaska let1
+                idx = bisect_right(polasci_drugih, let1['min_dolaska'])
+                if preskoci >= len(drugi_letovi) - idx:
+                    preskoci -= len(drugi_letovi) - idx
+                    continue
                 
-                # Sortiranje drugog dela
-                f.write(f"{medjugrad}->{odredisni_grad}\n")
-                f.write(f"{let2['aviokompanija']}|{let2['vreme_polaska']}-{let2['vreme_dolaska']},{let2['cena']:.2f}\n")
+                pocetak = idx + preskoci
+                kraj = len(drugi_letovi) if ostalo is None else min(len(drugi_letovi), pocetak + ostalo)
+                preskoci = 0
+                if ostalo is not None:
+                    ostalo -= kraj - pocetak
+
+                parova += kraj - pocetak
+                prvi_blok = (
+                    f"{polazni_grad}->{medjugrad}\n"
+                    f"{let1['aviokompanija']}|{prikaz_leta(let1)}\n"
+                )
+                f.write("".join(prvi_blok + blok for blok in drugi_blokovi[pocetak:kraj]))
+
+            brojac('medjugradova')
+            brojac('parova', parova)
+
+
+def procena_indirektnih(letovi_iz, polazni_grad, odredisni_grad):
+    """
+    Veličina izlaza pre pisanja: za svaki međugrad (medjugrad, broj_parova, broj_bajtova).
+    Broj validnih drugih letova za let1 je n - bisect, a bajtovi sufiksa
+    drugih blokova se čitaju iz prefiksnih suma.
+    """
+    procena = []
+    for medjugrad in pronadji_presedanja(letovi_iz, polazni_grad, odredisni_grad):
+        prvi_letovi = letovi_rute(letovi_iz, polazni_grad, medjugrad)
+        drugi_letovi = letovi_rute(letovi_iz, medjugrad, odredisni_grad)
+        polasci_drugih = [let2['min_polaska'] for let2 in drugi_letovi]
+        n = len(drugi_letovi)
+
+        bajtovi_drugih = list(accumulate(
+            (len(f"{medjugrad}->{odredisni_grad}\n{let2['aviokompanija']}|{prikaz_leta(let2)}\n".encode('utf-8'))
+             for let2 in drugi_letovi),
+            initial=0
+        ))
+
+        parova = 0
+        bajtova = len(f"{polazni_grad}->{medjugrad}->{odredisni_grad}\n".encode('utf-8'))
+        for let1 in prvi_letovi:
+            idx = bisect_right(polasci_drugih, let1['min_dolaska'])
+            if idx == n:
+                continue
+            duzina_prvog = len(f"{polazni_grad}->{medjugrad}\n{let1['aviokompanija']}|{prikaz_leta(let1)}\n".encode('utf-8'))
+            parova += n - idx
+            bajtova += (n - idx) * duzina_prvog + bajtovi_drugih[n] - bajtovi_drugih[idx]
+
+        procena.append((medjugrad, parova, bajtova))
+    return procena
+
+
+def formiraj_sazetak(letovi, par_gradova, naziv_datoteke, letovi_iz=None):
+    """
+    Sažetak umesto pune liste, jedan red po međugradu sa bar jednim parom:
+    polazni->medjugrad->odredišni|broj_parova|najniža_cena|najraniji_dolazak
+    """
+    polazni_grad, odredisni_grad = parsiraj_par(par_gradova)
+    if letovi_iz is None:
+        letovi_iz = grupisi_po_gradovima(letovi)
+
+    with otvori_izlaz(naziv_datoteke) as f:
+        for medjugrad in pronadji_presedanja(letovi_iz, polazni_grad, odredisni_grad):
+            prvi_letovi = letovi_rute(letovi_iz, polazni_grad, medjugrad)
+            drugi_letovi = letovi_rute(letovi_iz, medjugrad, odredisni_grad)
+            polasci_drugih = [let2['min_polaska'] for let2 in drugi_letovi]
+            n = len(drugi_letovi)
+
+            # Najniža cena i let sa najranijim dolaskom među drugi_letovi[i:]
+            min_cena = [float('inf')] * (n + 1)
+            min_dolazak = [None] * (n + 1)
+            for i in range(n - 1, -1, -1):
+                let2 = drugi_letovi[i]
+                min_cena[i] = min(let2['cena'], min_cena[i + 1])
+                d = min_dolazak[i + 1]
+                min_dolazak[i] = let2 if d is None or let2['min_dolaska'] <= d['min_dolaska'] else d
+
+            parova = 0
+            cena = float('inf')
+            dolazak = None
+            for let1 in prvi_letovi:
+                idx = bisect_right(polasci_drugih, let1['min_dolaska'])
+                if idx == n:
+                    continue
+                parova += n - idx
+                cena = min(cena, let1['cena'] + min_cena[idx])
+                d = min_dolazak[idx]
+                if dolazak is None or d['min_dolaska'] < dolazak['min_dolaska']:
+                    dolazak = d
 
+            if parova:
+                brojac('medjugradova')
+                brojac('parova', parova)
+                f.write(f"{polazni_grad}->{medjugrad}->{odredisni_grad}|{parova}|{cena:.2f}|{dolazak['vreme_dolaska']}\n")
 
-def main():
+
+def formiraj_rezultat(letovi, par_gradova, naziv_datoteke, letovi_iz=None, opcije=None):
+    """Bira način pisanja indirektnih letova prema opcijama komandne linije."""
+    if opcije is None:
+        formiraj_indirektne_letove(letovi, par_gradova, naziv_datoteke, letovi_iz)
+        return
+
+    if letovi_iz is None:
+        letovi_iz = grupisi_po_gradovima(letovi)
+
+    if opcije.summary:
+        formiraj_sazetak(letovi, par_gradova, naziv_datoteke, letovi_iz)
+        return
+
+    # Provera veličine pre pisanja; strana sa limitom je već ograničena
+    if opcije.max_output_bytes is not None and opcije.limit is None:
+        ukupno = sum(b for _, _, b in procena_indirektnih(letovi_iz, *parsiraj_par(par_gradova)))
+        if ukupno > opcije.max_output_bytes:
+            raise ValueError(f"Izlaz bi imao {ukupno} bajtova (najviše {opcije.max_output_bytes})")
+
+    formiraj_indirektne_letove(letovi, par_gradova, naziv_datoteke, letovi_iz,
+                               opcije.offset, opcije.limit)
+
+
+def obradi_batch(izvor, izlazni_dir, opcije=None):
+    """
+    Batch režim: flights.txt se učitava jednom, flights_direct.txt se piše
+    jednom, a za svaki par se u izlazni_dir piše CITY1->CITY2.txt
+    identičan datoteci flights_indirect.txt za pojedinačni upit.
+    """
+    sufiks = opcije.sufiks if opcije is not None else ''
+    parovi = procitaj_parove(izvor)
+
+    # Svi upiti se proveravaju pre bilo kakvog upisa
+    for par in parovi:
+        parsiraj_par(par)
+
+    letovi = ucitaj_red_letenja()
+    os.makedirs(izlazni_dir, exist_ok=True)
+
+    def upisi_indirektne():
+        letovi_iz = grupisi_po_gradovima(letovi)
+        for par in dict.fromkeys(parovi):
+            polazni_grad, odredisni_grad = parsiraj_par(par)
+            formiraj_rezultat(
+                letovi, par,
+                putanja_rezultata(izlazni_dir, polazni_grad, odredisni_grad, sufiks),
+                letovi_iz, opcije
+            )
+
+    pisi_izlaze(
+        lambda: formiraj_direktne_letove(letovi, 'flights_direct.txt' + sufiks),
+        upisi_indirektne, opcije.concurrent if opcije is not None else None
+    )
+
+
+def parsiraj_argumente(argv):
+    """Opcije komandne linije; bez opcija program radi kao ranije."""
+    parser = argparse.ArgumentParser(description="Direktni i indirektni letovi")
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                        help="jedan par CITY1->CITY2 po redu iz FILE ili sa stdin")
+    parser.add_argument('--out-dir', default='flights_indirect',
+                        help="direktorijum za rezultate batch režima")
+    parser.add_argument('--max-output-bytes', type=int, metavar='N',
+                        help="GRESKA umesto pisanja ako bi izlaz imao više od N bajtova")
+    parser.add_argument('--offset', type=int, default=0, metavar='N',
+                        help="preskače prvih N parova letova po međugradu")
+    parser.add_argument('--limit', type=int, metavar='N',
+                        help="najviše N parova letova po međugradu")
+    parser.add_argument('--summary', action='store_true',
+                        help="jedan red po međugradu: broj parova, najniža cena, najraniji dolazak")
+    parser.add_argument('--compress', choices=sorted(KODECI),
+                        help="izlazne datoteke se pišu kompresovane (.gz, .zst)")
+    parser.add_argument('--compress-level', type=int, metavar='N',
+                        help="nivo kompresije (gzip 1-9, zstd 1-22)")
+    parser.add_argument('--concurrent', choices=('thread', 'process'),
+                        help="direktni i indirektni letovi se pišu istovremeno")
+    parser.add_argument('--metrics', nargs='?', const='-', metavar='FILE',
+                        help="vreme, CPU i vršni RSS procesa po fazi (uz python -X tracemalloc "
+                             "i vršna alokacija faze) i brojači kao JSON na stderr ili u FILE")
+    parser.add_argument('--metrics-sink', metavar='MODUL:FUNKCIJA',
+                        help="funkcija koja na kraju dobija rečnik metrika")
+    args = parser.parse_args(argv)
+    if args.offset < 0 or (args.limit is not None and args.limit < 0):
+        parser.error("--offset i --limit ne mogu biti negativni")
+    if args.metrics_sink is not None:
+        try:
+            args.metrics_sink = ucitaj_sink(args.metrics_sink)
+        except (ImportError, AttributeError, ValueError) as e:
+            parser.error(f"--metrics-sink: {e}")
+    if args.compress == 'zstd' and importlib.util.find_spec('zstandard') is None:
+        parser.error("--compress zstd zahteva paket zstandard")
+    if args.compress_level is not None and args.compress is None:
+        parser.error("--compress-level zahteva --compress")
+    postavi_nivo_kompresije(args.compress_level)
+    args.sufiks = sufiks_kompresije(args.compress)
+    return args
+
+
+def main(argv=None):
+    args = parsiraj_argumente(argv)
+    # Merenje je uključeno samo uz --metrics ili --metrics-sink
+    if args.metrics_sink is not None:
+        dodaj_sink(args.metrics_sink)
+    if args.metrics is not None or args.metrics_sink is not None:
+        ukljuci_metrike('CC')
     try:
+        if args.batch is not None:
+            obradi_batch(args.batch, args.out_dir, args)
+            return
+
         # Učitavanje para gradova sa standardnog ulaza
         try:
             par_gradova = input().strip()
@@ -194,19 +494,22 @@ def main():
         if not par_gradova:
             return
         
-        # Učitavanje letova iz datoteke
-        letovi = ucitaj_letove('flights.txt')
-        
-        # Formiranje datoteke sa direktnim letovima
-        formiraj_direktne_letove(letovi, 'flights_direct.txt')
+        # Učitavanje letova iz datoteke (preko binarnog keša ako je ažuran)
+        letovi = ucitaj_red_letenja()
         
-        # Formiranje datoteke sa indirektnim letovima
-        formiraj_indirektne_letove(letovi, par_gradova, 'flights_indirect.txt')
+        # Formiranje datoteka sa direktnim i indirektnim letovima
+        pisi_izlaze(
+            lambda: formiraj_direktne_letove(letovi, 'flights_direct.txt' + args.sufiks),
+            lambda: formiraj_rezultat(letovi, par_gradova, 'flights_indirect.txt' + args.sufiks, opcije=args),
+            args.concurrent
+        )
         
     except FileNotFoundError:
         print("DAT_GRESKA")
     except Exception:
         print("GRESKA")
+    finally:
+        zavrsi_metrike(args.metrics)
 
 
 if __name__ == "__main__":
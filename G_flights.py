@@ -1,5 +1,17 @@
+import argparse
+import importlib.util
 import sys
 import os
+from bisect import bisect_right
+from itertools import accumulate
+
+from common_flights import (
+    KODECI, brojac, dodaj_sink, faza, metrike_ukljucene, napravi_kes_prikaza,
+    otvori_izlaz, otvori_ulaz, pisi_delove, pokreni_uporedo, postavi_nivo_kompresije,
+    procitaj_parove,
+    pronadji_ulaz, putanja_rezultata, sufiks_kompresije, ucitaj_sa_kesom, ucitaj_sink,
+    ukljuci_metrike, zavrsi_metrike
+)
 
 def parsiraj_vreme(vreme_str):
     """
@@ -19,6 +31,13 @@ def formatiraj_cenu(cena):
     """
     return "{:.2f}".format(cena)
 
+
+def prikaz_leta(let):
+    """
+    Tekst leta u izlazu: HH:MM-HH:MM,cena (isti u direktnom i indirektnom izlazu).
+    """
+    return f"{let['vreme_pol_str']}-{let['vreme_dol_str']},{formatiraj_cenu(let['cena'])}"
+
 def ucitaj_letove(putanja):
     """
     Ucitava i parsira podatke o letovima iz datoteke.
@@ -28,9 +47,10 @@ def ucitaj_letove(putanja):
         raise FileNotFoundError
     
     letovi = {}
+    broj_redova = 0
     
-    with open(putanja, 'r', encoding='utf-8') as f:
-        for linija in f:
+    with otvori_ulaz(putanja) as f:
+        for broj_redova, linija in enumerate(f, 1):
             linija = linija.strip()
             if not linija:
                 continue
@@ -91,65 +111,101 @@ def ucitaj_letove(putanja):
                     letovi[kljuc] = []
                 letovi[kljuc].append(let)
                 
+    brojac("redova", broj_redova)
     return letovi
 
-def obradi_direktne_letove(letovi):
+
+def prebroj_letove(letovi):
+    """
+    Brojaci ruta i letova, samo kada je merenje ukljuceno.
+    """
+    if metrike_ukljucene():
+        brojac("ruta", len(letovi))
+        brojac("letova", sum(map(len, letovi.values())))
+
+def obradi_direktne_letove(letovi, prikaz=prikaz_leta,
+                           izlazno_ime="flights_direct.txt"):
+    """
+    Formira datoteku flights_direct.txt (ili izlazno_ime).
+    """
+    with otvori_izlaz(izlazno_ime) as f:
+        pisi_delove(f, redovi_direktnih(letovi, prikaz))
+
+
+def redovi_direktnih(letovi, prikaz=prikaz_leta):
     """
-    Formira datoteku flights_direct.txt.
+    Redovi datoteke flights_direct.txt redom.
     """
-    izlazno_ime = "flights_direct.txt"
-    with open(izlazno_ime, 'w', encoding='utf-8') as f:
-        # Sortiranje parova gradova leksikografski
-        parovi_gradova = sorted(letovi.keys())
+    # Sortiranje parova gradova leksikografski
+    parovi_gradova = sorted(letovi.keys())
+    
+    for par in parovi_gradova:
+        grad_pol, grad_dol = par
+        yield f"{grad_pol}->{grad_dol}\n"
         
-        for par in parovi_gradova:
-            grad_pol, grad_dol = par
-            f.write(f"{grad_pol}->{grad_dol}\n")
-            
-            # Grupisanj letova po aviokompaniji
-            letovi_na_ruti = letovi[par]
-            po_kompanijama = {}
-            for let in letovi_na_ruti:
-                kompanija = let['aviokompanija']
-                if kompanija not in po_kompanijama:
-                    po_kompanijama[kompanija] = []
-                po_kompanijama[kompanija].append(let)
+        # Grupisanj letova po aviokompaniji
+        letovi_na_ruti = letovi[par]
+        po_kompanijama = {}
+        for let in letovi_na_ruti:
+            kompanija = let['aviokompanija']
+            if kompanija not in po_kompanijama:
+                po_kompanijama[kompanija] = []
+            po_kompanijama[kompanija].append(let)
+        
+        # Sortiranje aviokompanija leksikografski
+        kompanije_sorted = sorted(po_kompanijama.keys())
+        
+        for komp in kompanije_sorted:
+            yield f"{komp}\n"
             
-            # Sortiranje aviokompanija leksikografski
-            kompanije_sorted = sorted(po_kompanijama.keys())
+            # Sortiranje letova hronoloski rastuce
+            letovi_kompanije = po_kompanijama[komp]
+            letovi_kompanije.sort(key=lambda x: x['vreme_pol_min'])
             
-            for komp in kompanije_sorted:
-                f.write(f"{komp}\n")
-                
-                # Sortiranje letova hronoloski rastuce
-                letovi_kompanije = po_kompanijama[komp]
-                letovi_kompanije.sort(key=lambda x: x['vreme_pol_min'])
-                
-                for l in letovi_kompanije:
-                    cena_txt = formatiraj_cenu(l['cena'])
-                    f.write(f"  {l['vreme_pol_str']}-{l['vreme_dol_str']},{cena_txt}\n")
+            for l in letovi_kompanije:
+                yield f"  {prikaz(l)}\n"
+
 
-def obradi_indirektne_letove(letovi, trazeni_polazak, trazeni_dolazak):
+def kljuc_leta(let):
     """
-    Formira datoteku flights_indirect.txt za zadati par gradova.
+    Kljuc sortiranja letova: vreme polaska, trajanje, aviokompanija.
     """
-    izlazno_ime = "flights_indirect.txt"
-    
+    return (let['vreme_pol_min'], let['trajanje'], let['aviokompanija'])
+
+
+def napravi_susede(letovi):
+    """
+    Indeks suseda po gradu: (izlazni, ulazni), gde je izlazni[grad] skup
+    gradova do kojih postoji let, a ulazni[grad] skup gradova iz kojih postoji let.
+    Pravi se jednom posle ucitavanja.
+    """
+    izlazni = {}
+    ulazni = {}
+    for (pol, dol) in letovi.keys():
+        izlazni.setdefault(pol, set()).add(dol)
+        ulazni.setdefault(dol, set()).add(pol)
+    return izlazni, ulazni
+
+def obradi_indirektne_letove(letovi, trazeni_polazak, trazeni_dolazak,
+                             izlazno_ime="flights_indirect.txt", susedi=None,
+                             prikaz=prikaz_leta):
+    """
+    Formira datoteku flights_indirect.txt (ili izlazno_ime) za zadati par gradova.
+    Sa indeksom suseda (napravi_susede) medjugradovi se nalaze presekom
+    skupova suseda, bez prolaza kroz sve rute.
+    """
+
     # Pronalazenje mogucih medjugradova
     # Grad X je medjugrad ako postoji let trazeni_polazak -> X i X -> trazeni_dolazak
-    medjugradovi = []
-    
-    # Prvi korak: naci sve rute koje krecu iz trazeni_polazak
-    for (pol, dol) in letovi.keys():
-        if pol == trazeni_polazak:
-            # Provera da li postoji ruta od dol do trazeni_dolazak
-            if (dol, trazeni_dolazak) in letovi:
-                medjugradovi.append(dol)
+    if susedi is None:
+        susedi = napravi_susede(letovi)
+    izlazni, ulazni = susedi
+    medjugradovi = izlazni.get(trazeni_polazak, set()) & ulazni.get(trazeni_dolazak, set())
     
     # Sortiranje medjugradova leksikografski
-    medjugradovi.sort()
+    medjugradovi = sorted(medjugradovi)
     
-    with open(izlazno_ime, 'w', encoding='utf-8') as f:
+    with otvori_izlaz(izlazno_ime) as f:
         for medju in medjugradovi:
             # Dohvatanje letova
             prvi_letovi = letovi[(trazeni_polazak, medju)]
@@ -158,10 +214,7 @@ def obradi_indirektne_letove(letovi, trazeni_polazak, trazeni_dolazak):
             # Filtriranje i sparivanje
             # Potrebno je prvo sortirati letove prvog segmenta
             # Kriterijum: vreme polaska, trajanje, aviokompanija
-            prvi_letovi_sortirani = sorted(
-                prvi_letovi, 
-                key=lambda x: (x['vreme_pol_min'], x['trajanje'], x['aviokompanija'])
-            )
+            prvi_letovi_sortirani = sorted(prvi_letovi, key=kljuc_leta)
             
             ima_ispisa_za_medjugrad = False
             buffer_ispisa = [] 
@@ -172,31 +225,169 @@ def obradi_indirektne_letove(letovi, trazeni_polazak, trazeni_dolazak):
             # Ako nema letova, grad nije identifikovan kao tacka presedanja u validnom smislu?
             # Pretpostavicemo da ispisujemo samo ako postoji bar jedna validna konekcija.
             
+            # Drugi segment se sortira jednom po medjugradu
+            # Kriterijum: vreme polaska, trajanje, aviokompanija
+            drugi_letovi_sortirani = sorted(drugi_letovi_kandidati, key=kljuc_leta)
+            polasci_l2 = [l2['vreme_pol_min'] for l2 in drugi_letovi_sortirani]
+            
             validne_konekcije = []
             
             for l1 in prvi_letovi_sortirani:
-                # Za svaki let l1, nadji validne l2
-                validni_l2 = []
-                for l2 in drugi_letovi_kandidati:
-                    if l2['vreme_pol_min'] > l1['vreme_dol_min']:
-                        validni_l2.append(l2)
-                
-                if validni_l2:
-                    # Sortiranje l2: vreme polaska, trajanje, aviokompanija
-                    validni_l2.sort(key=lambda x: (x['vreme_pol_min'], x['trajanje'], x['aviokompanija']))
-                    validne_konekcije.append((l1, validni_l2))
+                # Validni l2 (polazak strogo posle dolaska l1) su sufiks sortirane liste
+                idx = bisect_right(polasci_l2, l1['vreme_dol_min'])
+                if idx < len(drugi_letovi_sortirani):
+                    # Pamti se samo pocetak sufiksa, lista se ne kopira unapred
+                    validne_konekcije.append((l1, idx))
             
             if validne_konekcije:
+                if metrike_ukljucene():
+                    brojac("medjugradova")
+                    brojac("parova", sum(len(drugi_letovi_sortirani) - idx
+                                         for _, idx in validne_konekcije))
                 f.write(f"{trazeni_polazak}->{medju}->{trazeni_dolazak}\n")
-                for l1, lista_l2 in validne_konekcije:
-                    cena1 = formatiraj_cenu(l1['cena'])
-                    f.write(f"  {l1['aviokompanija']}|{l1['vreme_pol_str']}-{l1['vreme_dol_str']},{cena1}\n")
-                    for l2 in lista_l2:
-                        cena2 = formatiraj_cenu(l2['cena'])
-                        f.write(f"    {l2['aviokompanija']}|{l2['vreme_pol_str']}-{l2['vreme_dol_str']},{cena2}\n")
-
-def main():
+                pisi_delove(f, delovi_konekcija(validne_konekcije, drugi_letovi_sortirani, prikaz))
+
+
+def delovi_konekcija(validne_konekcije, drugi_letovi_sortirani, prikaz=prikaz_leta):
+    """
+    Tekst konekcija preko jednog medjugrada. Redovi drugog segmenta se
+    formatiraju jednom i spajaju u jedan tekst; sufiks za l1 je isecak
+    od ofseta prvog validnog l2.
+    """
+    redovi_l2 = [f"    {l2['aviokompanija']}|{prikaz(l2)}\n" for l2 in drugi_letovi_sortirani]
+    tekst_l2 = "".join(redovi_l2)
+    ofseti = list(accumulate(map(len, redovi_l2), initial=0))
+    for l1, idx in validne_konekcije:
+        yield f"  {l1['aviokompanija']}|{prikaz(l1)}\n"
+        yield tekst_l2[ofseti[idx]:]
+
+
+def parsiraj_par(ulaz):
+    """
+    Parsira upit oblika CITY1->CITY2.
+    Vraca (polazak, dolazak) ili (None, None) ako format nije ispravan.
+    """
+    if '->' in ulaz:
+        trazeni_gradovi = ulaz.split('->')
+        if len(trazeni_gradovi) == 2:
+            return trazeni_gradovi[0].strip(), trazeni_gradovi[1].strip()
+    # Tehnicki bi ovo bio format error, ali zadatak kaze da pretpostavimo ispravan ulaz
+    # osim ako nije drugacije receno.
+    return None, None
+
+
+def pisi_izlaze(upisi_direktne, upisi_indirektne, uporedo=None):
+    """
+    Pise direktne pa indirektne letove, ili oba istovremeno ako je zadat
+    nacin (thread/process, vidi pokreni_uporedo). Vraca False ako bilo
+    koja strana nije uspela (GRESKA).
+    """
+    try:
+        if uporedo is None:
+            with faza("direct"):
+                upisi_direktne()
+            with faza("indirect"):
+                upisi_indirektne()
+        else:
+            with faza("izlaz"):
+                pokreni_uporedo([upisi_direktne, upisi_indirektne], uporedo)
+    except Exception:
+        return False
+    return True
+
+
+def obradi_batch(izvor, izlazni_dir, sufiks="", uporedo=None):
+    """
+    Batch rezim: flights.txt se ucitava jednom, flights_direct.txt se pise
+    jednom, a za svaki par iz izvora u izlazni_dir se pise CITY1->CITY2.txt
+    sa istim sadrzajem kao flights_indirect.txt za taj pojedinacni upit.
+    sufiks (.gz, .zst) se dodaje svim izlaznim datotekama.
+    """
+    parovi = [parsiraj_par(ulaz) for ulaz in procitaj_parove(izvor)]
+
+    try:
+        with faza("ucitavanje"):
+            letovi = ucitaj_sa_kesom(pronadji_ulaz("flights.txt"), ucitaj_letove, "g")
+            prebroj_letove(letovi)
+    except FileNotFoundError:
+        print("DAT_GRESKA")
+        return
+    except Exception:
+        print("GRESKA")
+        return
+
+    # Tekst svakog leta se formatira jednom za sve izlaze
+    prikaz = napravi_kes_prikaza(prikaz_leta)
+
+    # Indeks suseda se pravi jednom za sve upite
+    susedi = napravi_susede(letovi)
+    os.makedirs(izlazni_dir, exist_ok=True)
+
+    def upisi_indirektne():
+        for trazeni_polazak, trazeni_dolazak in dict.fromkeys(parovi):
+            # Neispravan par ni u pojedinacnom rezimu ne daje flights_indirect.txt
+            if not (trazeni_polazak and trazeni_dolazak):
+                continue
+            obradi_indirektne_letove(
+                letovi, trazeni_polazak, trazeni_dolazak,
+                putanja_rezultata(izlazni_dir, trazeni_polazak, trazeni_dolazak, sufiks),
+                susedi, prikaz
+            )
+
+    if not pisi_izlaze(
+        lambda: obradi_direktne_letove(letovi, prikaz, "flights_direct.txt" + sufiks),
+        upisi_indirektne, uporedo
+    ):
+        print("GRESKA")
+
+
+def parsiraj_argumente(argv):
+    """
+    Opcije komandne linije; bez opcija program radi kao ranije.
+    """
+    parser = argparse.ArgumentParser(description="Direktni i indirektni letovi")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="jedan par CITY1->CITY2 po redu iz FILE ili sa stdin")
+    parser.add_argument("--out-dir", default="flights_indirect",
+                        help="direktorijum za rezultate batch rezima")
+    parser.add_argument("--compress", choices=sorted(KODECI),
+                        help="izlazne datoteke se pisu kompresovane (.gz, .zst)")
+    parser.add_argument("--compress-level", type=int, metavar="N",
+                        help="nivo kompresije (gzip 1-9, zstd 1-22)")
+    parser.add_argument("--concurrent", choices=("thread", "process"),
+                        help="direktni i indirektni letovi se pisu istovremeno")
+    parser.add_argument("--metrics", nargs="?", const="-", metavar="FILE",
+                        help="vreme, CPU i vrsni RSS procesa po fazi (uz python -X "
+                             "tracemalloc i vrsna alokacija faze) i brojaci kao JSON "
+                             "na stderr ili u FILE")
+    parser.add_argument("--metrics-sink", metavar="MODUL:FUNKCIJA",
+                        help="funkcija koja na kraju dobija recnik metrika")
+    args = parser.parse_args(argv)
+    if args.metrics_sink is not None:
+        try:
+            args.metrics_sink = ucitaj_sink(args.metrics_sink)
+        except (ImportError, AttributeError, ValueError) as e:
+            parser.error(f"--metrics-sink: {e}")
+    if args.compress == "zstd" and importlib.util.find_spec("zstandard") is None:
+        parser.error("--compress zstd zahteva paket zstandard")
+    if args.compress_level is not None and args.compress is None:
+        parser.error("--compress-level zahteva --compress")
+    postavi_nivo_kompresije(args.compress_level)
+    args.sufiks = sufiks_kompresije(args.compress)
+    return args
+
+def main(argv=None):
+    args = parsiraj_argumente(argv)
+    # Merenje je ukljuceno samo uz --metrics ili --metrics-sink
+    if args.metrics_sink is not None:
+        dodaj_sink(args.metrics_sink)
+    if args.metrics is not None or args.metrics_sink is not None:
+        ukljuci_metrike("G")
     try:
+        if args.batch is not None:
+            obradi_batch(args.batch, args.out_dir, args.sufiks, args.concurrent)
+            return
+
         # 1. Ucitavanje sa standardnog ulaza (par gradova)
         # S obzirom na potencijalni prazan ulaz, citamo odmah.
         # "Ucitava sve potrebne podatke sa standardnog ulaza" - to je samo par gradova za 2. deo.
@@ -204,20 +395,14 @@ def main():
         if not ulaz:
             return
             
-        if '->' in ulaz:
-            trazeni_gradovi = ulaz.split('->')
-            if len(trazeni_gradovi) == 2:
-                trazeni_polazak, trazeni_dolazak = trazeni_gradovi[0].strip(), trazeni_gradovi[1].strip()
-            else:
-                # Tehnicki bi ovo bio format error, ali zadatak kaze da pretpostavimo ispravan ulaz
-                # osim ako nije drugacije receno.
-                trazeni_polazak, trazeni_dolazak = None, None
-        else:
-            trazeni_polazak, trazeni_dolazak = None, None
+        trazeni_polazak, trazeni_dolazak = parsiraj_par(ulaz)
 
         # 2. Ucitavanje datoteke
         try:
-            letovi = ucitaj_letove("flights.txt")
+            # Binarni kes (flights.txt.g.idx) preskace ponovno parsiranje
+            with faza("ucitavanje"):
+                letovi = ucitaj_sa_kesom(pronadji_ulaz("flights.txt"), ucitaj_letove, "g")
+                prebroj_letove(letovi)
         except FileNotFoundError:
             print("DAT_GRESKA")
             return
@@ -226,23 +411,27 @@ def main():
             print("GRESKA")
             return
             
-        # 3. Obrada direktnih letova
-        try:
-            obradi_direktne_letove(letovi)
-        except Exception:
+        # Tekst svakog leta se formatira jednom za oba izlaza
+        prikaz = napravi_kes_prikaza(prikaz_leta)
+
+        # 3. i 4. Obrada direktnih i indirektnih letova
+        def upisi_indirektne():
+            if trazeni_polazak and trazeni_dolazak:
+                obradi_indirektne_letove(letovi, trazeni_polazak, trazeni_dolazak,
+                                         "flights_indirect.txt" + args.sufiks,
+                                         prikaz=prikaz)
+
+        if not pisi_izlaze(
+            lambda: obradi_direktne_letove(letovi, prikaz, "flights_direct.txt" + args.sufiks),
+            upisi_indirektne, args.concurrent
+        ):
             print("GRESKA")
             return
-            
-        # 4. Obrada indirektnih letova
-        if trazeni_polazak and trazeni_dolazak:
-            try:
-                obradi_indirektne_letove(letovi, trazeni_polazak, trazeni_dolazak)
-            except Exception:
-                print("GRESKA")
-                return
 
     except Exception:
         print("GRESKA")
+    finally:
+        zavrsi_metrike(args.metrics)
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,44 @@
+import argparse
+import importlib.util
+import os
 import sys
+import threading
 from bisect import bisect_left
+from itertools import accumulate
+
+from common_flights import (
+    KODECI,
+    MAX_BAJTOVA_REZULTATA,
+    brojac,
+    dodaj_sink,
+    faza,
+    hes_datoteke,
+    kljuc_rezultata,
+    metrike_ukljucene,
+    otvori_izlaz,
+    otvori_ulaz,
+    pisi_delove,
+    pokreni_uporedo,
+    postoji_rezultat,
+    postavi_nivo_kompresije,
+    procitaj_parove,
+    pronadji_ulaz,
+    putanja_rezultata,
+    sufiks_kompresije,
+    ucitaj_sa_kesom,
+    ucitaj_sink,
+    ukljuci_metrike,
+    upisi_sa_kesom,
+    zabelezi_ulaz,
+    zavrsi_metrike,
+)
+from search_flights import (
+    pripremi_izlazne,
+    pripremi_konekcije,
+    upisi_najjeftinija,
+    upisi_najraniji,
+    upisi_pareto,
+)
 
 # ------------------------------------------------------------
 # Funkcija: procitaj_ulaz
@@ -8,7 +47,15 @@ from bisect import bisect_left
 # Ako je format pogrešan, baca grešku
 # ------------------------------------------------------------
 def procitaj_ulaz():
-    s = sys.stdin.read().strip()
+    return parsiraj_par(sys.stdin.read())
+
+
+# ------------------------------------------------------------
+# Funkcija: parsiraj_par
+# Parsira jedan upit CITY1->CITY2 (isti format kao standardni ulaz)
+# ------------------------------------------------------------
+def parsiraj_par(s):
+    s = s.strip()
 
     # Ako je ulaz prazan niz znakova – program se korektno završava
     if s == "":
@@ -38,6 +85,33 @@ def time_to_min(t):
     return int(hh) * 60 + int(mm)
 
 
+# ------------------------------------------------------------
+# Tabela minuta: svih 1440 zapisa "HH:MM" -> minuti od ponoći.
+# Uobičajen zapis vremena se tako ne deli i ne pretvara ponovo;
+# ostali zapisi (npr. "8:00") idu kroz time_to_min.
+# ------------------------------------------------------------
+MINUTI = {f"{m // 60:02d}:{m % 60:02d}": m for m in range(24 * 60)}
+
+# Keš cena: tekst cene iz datoteke -> (cena, cena na dve decimale).
+# Ključ je tekst, a ne broj, jer 0.0 == -0.0 a prikazi se razlikuju.
+KES_CENA = {}
+MAX_KES_CENA = 1 << 17
+
+
+# ------------------------------------------------------------
+# Funkcija: parsiraj_cenu
+# Vraća (cena, prikaz cene) preko keša cena
+# ------------------------------------------------------------
+def parsiraj_cenu(price_str):
+    cena = KES_CENA.get(price_str)
+    if cena is None:
+        price = float(price_str)
+        cena = (price, f"{price:.2f}")
+        if len(KES_CENA) < MAX_KES_CENA:
+            KES_CENA[price_str] = cena
+    return cena
+
+
 # ------------------------------------------------------------
 # Funkcija: flight_sort_key
 # Ključ za sortiranje letova prema zahtevu zadatka:
@@ -46,107 +120,122 @@ def time_to_min(t):
 # 3) ime aviokompanije
 # ------------------------------------------------------------
 def flight_sort_key(flight):
-    airline, _, _, dep_min, lan_min, _, _, _ = flight
-    duration = lan_min - dep_min
-    return (dep_min, duration, airline)
+    # Let može imati i deveto polje (prikaz), pa se ne raspakuje
+    dep_min = flight[3]
+    duration = flight[4] - dep_min
+    return (dep_min, duration, flight[0])
 
 
 # ------------------------------------------------------------
-# Funkcija: procitaj_flights_file
-# Čita datoteku flights.txt i formira dve strukture podataka:
-#
-# route_map:
-#   (dep, lan) -> { airline -> [letovi...] }
-#
-# seg_map:
-#   (dep, lan) -> [letovi...]
+# Funkcija: parsiraj_liniju
+# Parsira jedan red datoteke flights.txt u listu letova
+# Prazan red daje praznu listu, neispravan red baca grešku
 #
-# Let je običan tuple (bez klasa!)
+# Let je običan tuple (bez klasa!):
+#   (airline, dep_city, lan_city, dep_min, lan_min,
+#    dep_str, lan_str, price, prikaz)
+# gde je prikaz tekst "dep_str-lan_str,price" iz izlaznih
+# datoteka, formatiran jednom pri učitavanju
 # ------------------------------------------------------------
-def procitaj_flights_file(path):
-    route_map = {}
-    seg_map = {}
+def parsiraj_liniju(line):
+    line = line.strip()
 
-    # Otvaranje datoteke
-    with open(path, "r", encoding="utf-8") as fh:
-        for line in fh:
-            line = line.strip()
+    # Preskačemo prazne redove
+    if line == "":
+        return []
 
-            # Preskačemo prazne redove
-            if line == "":
-                continue
+    # Očekujemo tačno tri dela razdvojena znakom |
+    parts = line.split("|")
+    if len(parts) != 3:
+        raise ValueError("Pogrešan format linije")
 
-            # Očekujemo tačno tri dela razdvojena znakom |
-            parts = line.split("|")
-            if len(parts) != 3:
-                raise ValueError("Pogrešan format linije")
+    airline = parts[0].strip()
+    route = parts[1].strip()
+    flights_part = parts[2].strip()
 
-            airline = parts[0].strip()
-            route = parts[1].strip()
-            flights_part = parts[2].strip()
+    # Provera rute
+    if "->" not in route:
+        raise ValueError("Pogrešan format rute")
 
-            # Provera rute
-            if "->" not in route:
-                raise ValueError("Pogrešan format rute")
+    dep_city, lan_city = [x.strip() for x in route.split("->", 1)]
 
-            dep_city, lan_city = [x.strip() for x in route.split("->", 1)]
+    if airline == "" or dep_city == "" or lan_city == "":
+        raise ValueError("Prazno polje u liniji")
 
-            if airline == "" or dep_city == "" or lan_city == "":
-                raise ValueError("Prazno polje u liniji")
+    # Svaki let je razdvojen znakom ;
+    tokens = flights_part.split(";")
+    flights = []
 
-            # Svaki let je razdvojen znakom ;
-            tokens = flights_part.split(";")
+    for tok in tokens:
+        tok = tok.strip()
+        if tok == "":
+            continue
 
-            for tok in tokens:
-                tok = tok.strip()
-                if tok == "":
-                    continue
+        # Format: hh:mm-hh:mm,price
+        if "," not in tok:
+            raise ValueError("Pogrešan format leta")
 
-                # Format: hh:mm-hh:mm,price
-                if "," not in tok:
-                    raise ValueError("Pogrešan format leta")
+        time_range, price_str = tok.split(",", 1)
 
-                time_range, price_str = tok.split(",", 1)
+        if "-" not in time_range:
+            raise ValueError("Pogrešan format vremena")
 
-                if "-" not in time_range:
-                    raise ValueError("Pogrešan format vremena")
+        dep_str, lan_str = [x.strip() for x in time_range.split("-", 1)]
 
-                dep_str, lan_str = [x.strip() for x in time_range.split("-", 1)]
+        # Pretvaranje vremena u minute
+        dep_min = MINUTI.get(dep_str)
+        if dep_min is None:
+            dep_min = time_to_min(dep_str)
+        lan_min = MINUTI.get(lan_str)
+        if lan_min is None:
+            lan_min = time_to_min(lan_str)
 
-                # Pretvaranje vremena u minute
-                dep_min = time_to_min(dep_str)
-                lan_min = time_to_min(lan_str)
+        # Cena mora biti realan broj
+        price, price_txt = parsiraj_cenu(price_str.strip())
 
-                # Cena mora biti realan broj
-                price = float(price_str.strip())
+        # Jedan let kao tuple
+        flight = (
+            airline,
+            dep_city,
+            lan_city,
+            dep_min,
+            lan_min,
+            dep_str,
+            lan_str,
+            price,
+            f"{dep_str}-{lan_str},{price_txt}"
+        )
+        flights.append(flight)
 
-                # Jedan let kao tuple
-                flight = (
-                    airline,
-                    dep_city,
-                    lan_city,
-                    dep_min,
-                    lan_min,
-                    dep_str,
-                    lan_str,
-                    price
-                )
+    return flights
 
-                key = (dep_city, lan_city)
 
-                # Popunjavanje route_map
-                if key not in route_map:
-                    route_map[key] = {}
-                if airline not in route_map[key]:
-                    route_map[key][airline] = []
-                route_map[key][airline].append(flight)
+# ------------------------------------------------------------
+# Funkcija: dodaj_let
+# Dodaje let u route_map i seg_map (bez sortiranja)
+# ------------------------------------------------------------
+def dodaj_let(route_map, seg_map, flight):
+    airline = flight[0]
+    key = (flight[1], flight[2])
 
-                # Popunjavanje seg_map
-                if key not in seg_map:
-                    seg_map[key] = []
-                seg_map[key].append(flight)
+    # Popunjavanje route_map
+    if key not in route_map:
+        route_map[key] = {}
+    if airline not in route_map[key]:
+        route_map[key][airline] = []
+    route_map[key][airline].append(flight)
 
-    # Sortiranje letova
+    # Popunjavanje seg_map
+    if key not in seg_map:
+        seg_map[key] = []
+    seg_map[key].append(flight)
+
+
+# ------------------------------------------------------------
+# Funkcija: sortiraj_letove
+# Sortira sve liste letova po flight_sort_key
+# ------------------------------------------------------------
+def sortiraj_letove(route_map, seg_map):
     for key in route_map:
         for airline in route_map[key]:
             route_map[key][airline].sort(key=flight_sort_key)
@@ -154,26 +243,79 @@ def procitaj_flights_file(path):
     for key in seg_map:
         seg_map[key].sort(key=flight_sort_key)
 
+
+# ------------------------------------------------------------
+# Funkcija: procitaj_flights_file
+# Čita datoteku flights.txt i formira dve strukture podataka:
+#
+# route_map:
+#   (dep, lan) -> { airline -> [letovi...] }
+#
+# seg_map:
+#   (dep, lan) -> [letovi...]
+# ------------------------------------------------------------
+def procitaj_flights_file(path):
+    route_map = {}
+    seg_map = {}
+
+    # Otvaranje datoteke (gzip/zstd se raspakuje tokom čitanja)
+    redova = 0
+    with otvori_ulaz(path) as fh:
+        for redova, line in enumerate(fh, 1):
+            for flight in parsiraj_liniju(line):
+                dodaj_let(route_map, seg_map, flight)
+    brojac("redova", redova)
+
+    # Sortiranje letova
+    sortiraj_letove(route_map, seg_map)
+
     return route_map, seg_map
 
 
+# ------------------------------------------------------------
+# Funkcija: prikaz_leta
+# Tekst leta u izlaznim datotekama: hh:mm-hh:mm,cena
+# Letovi iz parsiraj_liniju ga nose kao deveto polje; za let
+# od osam polja se formatira
+# ------------------------------------------------------------
+def prikaz_leta(f):
+    if len(f) > 8:
+        return f[8]
+    return f"{f[5]}-{f[6]},{f[7]:.2f}"
+
+
 # ------------------------------------------------------------
 # Funkcija: upisi_direct
 # Formira datoteku flights_direct.txt
 # ------------------------------------------------------------
-def upisi_direct(route_map, out_path):
-    with open(out_path, "w", encoding="utf-8") as out:
-        for dep, lan in sorted(route_map.keys()):
-            out.write(f"{dep}->{lan}\n")
+def upisi_direct(route_map, out_path, prikaz=prikaz_leta):
+    with otvori_izlaz(out_path) as out:
+        pisi_delove(out, (
+            red
+            for key in sorted(route_map.keys())
+            for red in redovi_direct_bloka(route_map, key, prikaz)
+        ))
 
-            for airline in sorted(route_map[(dep, lan)].keys()):
-                flights = route_map[(dep, lan)][airline]
 
-                flights_str = ";".join(
-                    f"{f[5]}-{f[6]},{f[7]:.2f}" for f in flights
-                )
+# ------------------------------------------------------------
+# Funkcija: redovi_direct_bloka
+# Redovi bloka CITY1->CITY2 iz flights_direct.txt za jednu rutu
+# ------------------------------------------------------------
+def redovi_direct_bloka(route_map, key, prikaz=prikaz_leta):
+    dep, lan = key
+    yield f"{dep}->{lan}\n"
 
-                out.write(f"{airline}|{flights_str}\n")
+    for airline in sorted(route_map[key].keys()):
+        flights = route_map[key][airline]
+        yield f"{airline}|{';'.join(map(prikaz, flights))}\n"
+
+
+# ------------------------------------------------------------
+# Funkcija: pisi_direct_blok
+# Piše blok CITY1->CITY2 iz flights_direct.txt za jednu rutu
+# ------------------------------------------------------------
+def pisi_direct_blok(route_map, key, out, prikaz=prikaz_leta):
+    out.write("".join(redovi_direct_bloka(route_map, key, prikaz)))
 
 
 # ------------------------------------------------------------
@@ -181,63 +323,884 @@ def upisi_direct(route_map, out_path):
 # Formira datoteku flights_indirect.txt
 # Sa jednim presedanjem
 # ------------------------------------------------------------
-def upisi_indirect(seg_map, dep, lan, out_path):
+def upisi_indirect(seg_map, dep, lan, out_path, susedi=None, prikaz=prikaz_leta):
+    with otvori_izlaz(out_path) as out:
+        pisi_indirect(seg_map, dep, lan, out, susedi, prikaz)
+
+
+# ------------------------------------------------------------
+# Funkcija: napravi_susede
+# Indeks suseda po gradu, pravi se jednom posle učitavanja:
+#   izlazni: grad -> skup gradova do kojih postoji let
+#   ulazni:  grad -> skup gradova iz kojih postoji let
+# Vraća (izlazni, ulazni)
+# ------------------------------------------------------------
+def napravi_susede(seg_map):
+    izlazni = {}
+    ulazni = {}
+    for fr, to in seg_map:
+        izlazni.setdefault(fr, set()).add(to)
+        ulazni.setdefault(to, set()).add(fr)
+    return izlazni, ulazni
+
+
+# ------------------------------------------------------------
+# Funkcija: medjugradovi
+# Sortirani gradovi med za koje postoje letovi dep->med i med->lan
+# ------------------------------------------------------------
+def medjugradovi(seg_map, dep, lan, susedi=None):
     # Pronalazimo sve gradove preko kojih je moguće presedanje
-    dep_to = {to for (fr, to) in seg_map if fr == dep}
-    to_lan = {fr for (fr, to) in seg_map if to == lan}
-    meds = sorted(dep_to & to_lan)
+    if susedi is None:
+        dep_to = {to for (fr, to) in seg_map if fr == dep}
+        to_lan = {fr for (fr, to) in seg_map if to == lan}
+    else:
+        dep_to = susedi[0].get(dep, set())
+        to_lan = susedi[1].get(lan, set())
+
+    return [
+        med for med in sorted(dep_to & to_lan)
+        if seg_map.get((dep, med)) and seg_map.get((med, lan))
+    ]
 
-    with open(out_path, "w", encoding="utf-8") as out:
-        for med in meds:
-            A = seg_map.get((dep, med), [])
-            B = seg_map.get((med, lan), [])
 
-            if not A or not B:
+# ------------------------------------------------------------
+# Funkcija: pisi_indirect
+# Piše letove sa jednim presedanjem u već otvoren tekstualni tok
+# (datoteku ili io.StringIO, npr. za server)
+#
+# Sa indeksom suseda (napravi_susede) međugradovi se nalaze
+# presekom dva skupa veličine stepena gradova, bez prolaza kroz
+# sve rute; to koriste batch režim i server.
+# ------------------------------------------------------------
+def pisi_indirect(seg_map, dep, lan, out, susedi=None, prikaz=prikaz_leta):
+    pisi_delove(out, redovi_indirect(seg_map, dep, lan, susedi, prikaz))
+
+
+# ------------------------------------------------------------
+# Funkcija: redovi_indirect
+# Delovi teksta flights_indirect.txt redom.
+# Redovi drugog segmenta se formatiraju jednom po međugradu i
+# spajaju u jedan tekst; validni drugi letovi za prvi let su
+# sufiks, pa je njihov tekst isečak od ofseta prvog validnog.
+# ------------------------------------------------------------
+def redovi_indirect(seg_map, dep, lan, susedi=None, prikaz=prikaz_leta):
+    for med in medjugradovi(seg_map, dep, lan, susedi):
+        A = seg_map[(dep, med)]
+        B = seg_map[(med, lan)]
+
+        yield f"{dep}->{med}->{lan}\n"
+
+        # Lista vremena polaska za drugi segment
+        b_dep_times = [f[3] for f in B]
+
+        # Tekst drugog segmenta i ofset početka svakog reda
+        b_linije = [f"{med}->{lan}|{b[0]}|{prikaz(b)}\n" for b in B]
+        b_tekst = "".join(b_linije)
+        b_ofseti = list(accumulate(map(len, b_linije), initial=0))
+
+        prefiks = f"{dep}->{med}|"
+        n = len(B)
+        parova = 0
+        for a in A:
+            yield f"{prefiks}{a[0]}|{prikaz(a)}\n"
+
+            # Tražimo letove koji mogu da se stignu
+            idx = bisect_left(b_dep_times, a[4])
+            if idx < n:
+                parova += n - idx
+                yield b_tekst[b_ofseti[idx]:]
+
+        brojac("medjugradova")
+        brojac("parova", parova)
+
+
+# ------------------------------------------------------------
+# Funkcija: procena_indirect
+# Veličina flights_indirect.txt pre pisanja, bez formiranja izlaza.
+# Za svaki prvi let broj validnih drugih letova je n - bisect, a
+# bajtovi sufiksa drugog segmenta se čitaju iz prefiksnih suma.
+# Vraća listu (med, broj_konekcija, broj_bajtova) u UTF-8.
+# ------------------------------------------------------------
+def procena_indirect(seg_map, dep, lan, susedi=None):
+    procena = []
+    for med in medjugradovi(seg_map, dep, lan, susedi):
+        A = seg_map[(dep, med)]
+        B = seg_map[(med, lan)]
+        n = len(B)
+        b_dep_times = [f[3] for f in B]
+
+        # "|" i "\n" su po jedan bajt
+        prefiks_b = len(f"{med}->{lan}|".encode("utf-8")) + 2
+        b_bajtovi = list(accumulate(
+            (prefiks_b + len(f"{b[0]}{prikaz_leta(b)}".encode("utf-8")) for b in B),
+            initial=0
+        ))
+
+        prefiks_a = len(f"{dep}->{med}|".encode("utf-8")) + 2
+        konekcija = 0
+        bajtova = len(f"{dep}->{med}->{lan}\n".encode("utf-8"))
+        for a in A:
+            idx = bisect_left(b_dep_times, a[4])
+            konekcija += n - idx
+            bajtova += prefiks_a + len(f"{a[0]}{prikaz_leta(a)}".encode("utf-8"))
+            bajtova += b_bajtovi[n] - b_bajtovi[idx]
+
+        procena.append((med, konekcija, bajtova))
+    return procena
+
+
+# ------------------------------------------------------------
+# Funkcija: redovi_indirect_strana
+# Jedna strana rezultata po međugradu: preskače se prvih offset
+# konekcija (parova prvi let, drugi let) i piše najviše limit.
+# Prvi let se piše samo ako na strani ima bar jednu konekciju.
+# ------------------------------------------------------------
+def redovi_indirect_strana(seg_map, dep, lan, offset=0, limit=None, susedi=None,
+                           prikaz=prikaz_leta):
+    for med in medjugradovi(seg_map, dep, lan, susedi):
+        A = seg_map[(dep, med)]
+        B = seg_map[(med, lan)]
+        n = len(B)
+
+        yield f"{dep}->{med}->{lan}\n"
+
+        b_dep_times = [f[3] for f in B]
+        b_linije = [f"{med}->{lan}|{b[0]}|{prikaz(b)}\n" for b in B]
+
+        preskoci = offset
+        ostalo = limit
+        parova = 0
+        for a in A:
+            if ostalo == 0:
+                break
+
+            idx = bisect_left(b_dep_times, a[4])
+            if preskoci >= n - idx:
+                preskoci -= n - idx
                 continue
 
-            out.write(f"{dep}->{med}->{lan}\n")
+            pocetak = idx + preskoci
+            kraj = n if ostalo is None else min(n, pocetak + ostalo)
+            preskoci = 0
+            if ostalo is not None:
+                ostalo -= kraj - pocetak
+
+            parova += kraj - pocetak
+            yield f"{dep}->{med}|{a[0]}|{prikaz(a)}\n"
+            yield "".join(b_linije[pocetak:kraj])
+
+        brojac("medjugradova")
+        brojac("parova", parova)
+
 
-            # Lista vremena polaska za drugi segment
-            b_dep_times = [f[3] for f in B]
+# ------------------------------------------------------------
+# Funkcija: redovi_sazetka
+# Sažetak umesto pune liste, jedan red po međugradu sa bar jednom
+# konekcijom:
+#   dep->med->lan|broj_konekcija|najniza_cena|najraniji_dolazak
+# Računa se u O(|A| + |B|) preko sufiksnih minimuma drugog segmenta.
+# ------------------------------------------------------------
+def redovi_sazetka(seg_map, dep, lan, susedi=None):
+    for med in medjugradovi(seg_map, dep, lan, susedi):
+        A = seg_map[(dep, med)]
+        B = seg_map[(med, lan)]
+        n = len(B)
+        b_dep_times = [f[3] for f in B]
 
-            for a in A:
-                out.write(
-                    f"{dep}->{med}|{a[0]}|{a[5]}-{a[6]},{a[7]:.2f}\n"
-                )
+        # Najniža cena i let sa najranijim dolaskom u B[i:]
+        min_cena = [float("inf")] * (n + 1)
+        min_dolazak = [None] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            b = B[i]
+            min_cena[i] = min(b[7], min_cena[i + 1])
+            d = min_dolazak[i + 1]
+            min_dolazak[i] = b if d is None or b[4] <= d[4] else d
+
+        konekcija = 0
+        cena = float("inf")
+        dolazak = None
+        for a in A:
+            idx = bisect_left(b_dep_times, a[4])
+            if idx == n:
+                continue
+            konekcija += n - idx
+            cena = min(cena, a[7] + min_cena[idx])
+            d = min_dolazak[idx]
+            if dolazak is None or d[4] < dolazak[4]:
+                dolazak = d
 
-                # Tražimo letove koji mogu da se stignu
-                idx = bisect_left(b_dep_times, a[4])
+        if konekcija:
+            brojac("medjugradova")
+            brojac("parova", konekcija)
+            yield f"{dep}->{med}->{lan}|{konekcija}|{cena:.2f}|{dolazak[6]}\n"
 
-                for b in B[idx:]:
-                    out.write(
-                        f"{med}->{lan}|{b[0]}|{b[5]}-{b[6]},{b[7]:.2f}\n"
-                    )
+
+# ------------------------------------------------------------
+# Funkcija: proveri_velicinu
+# Baca grešku (GRESKA, bez izlazne datoteke) ako bi pun
+# flights_indirect.txt imao više od max_bajtova
+# ------------------------------------------------------------
+def proveri_velicinu(seg_map, dep, lan, max_bajtova, susedi=None):
+    ukupno = sum(b for _, _, b in procena_indirect(seg_map, dep, lan, susedi))
+    if ukupno > max_bajtova:
+        raise ValueError(f"Izlaz bi imao {ukupno} bajtova (najviše {max_bajtova})")
+
+
+# ------------------------------------------------------------
+# Funkcija: napravi_pisca_indirect
+# Bira način pretrage za flights_indirect.txt prema opcijama.
+# Vraća funkciju (dep, lan, out_path); priprema (npr. sortiranje
+# svih konekcija) se radi jednom, i u batch režimu.
+# ------------------------------------------------------------
+def napravi_pisca_indirect(args, seg_map, prikaz=prikaz_leta):
+    if args.top_k is not None:
+        graf = pripremi_izlazne(seg_map)
+        pocetak = time_to_min(args.depart_after)
+
+        def pisac(dep, lan, out_path):
+            upisi_najjeftinija(
+                graf, dep, lan, out_path, args.top_k, args.max_transfers, pocetak
+            )
+        return pisac
+
+    if args.pareto:
+        pripremljeno = pripremi_konekcije(seg_map)
+        pocetak = time_to_min(args.depart_after)
+        max_presedanja = 1 if args.max_transfers is None else args.max_transfers
+
+        def pisac(dep, lan, out_path):
+            upisi_pareto(pripremljeno, dep, lan, out_path, max_presedanja, pocetak)
+        return pisac
+
+    if args.max_transfers is not None:
+        pripremljeno = pripremi_konekcije(seg_map)
+        pocetak = time_to_min(args.depart_after)
+
+        def pisac(dep, lan, out_path):
+            upisi_najraniji(
+                pripremljeno, dep, lan, out_path, args.max_transfers, pocetak
+            )
+        return pisac
+
+    susedi = napravi_susede(seg_map)
+
+    if args.summary:
+        def pisac(dep, lan, out_path):
+            with otvori_izlaz(out_path) as out:
+                pisi_delove(out, redovi_sazetka(seg_map, dep, lan, susedi))
+        return pisac
+
+    if args.offset or args.limit is not None:
+        def pisac(dep, lan, out_path):
+            if args.max_output_bytes is not None and args.limit is None:
+                proveri_velicinu(seg_map, dep, lan, args.max_output_bytes, susedi)
+            with otvori_izlaz(out_path) as out:
+                pisi_delove(out, redovi_indirect_strana(
+                    seg_map, dep, lan, args.offset, args.limit, susedi, prikaz
+                ))
+        return pisac
+
+    def pisac(dep, lan, out_path):
+        if args.max_output_bytes is not None:
+            proveri_velicinu(seg_map, dep, lan, args.max_output_bytes, susedi)
+        upisi_indirect(seg_map, dep, lan, out_path, susedi, prikaz)
+    return pisac
+
+
+# ------------------------------------------------------------
+# Funkcija: pripremi_obradu
+# Učitava red letenja (preko keša) i vraća par funkcija:
+#   upisi_direktne(out_path) i pisac(dep, lan, out_path)
+# Uz --columnar se red letenja koji se ne može predstaviti
+# kolonama obrađuje kao tuple-ovi (isti izlaz).
+# FileNotFoundError se prosleđuje pozivaocu (DAT_GRESKA)
+# ------------------------------------------------------------
+def pripremi_obradu(args):
+    kol = None
+    if args.columnar:
+        # columnar_flights uvozi ovaj modul, pa se uvozi tek ovde
+        import columnar_flights
+        kol = columnar_flights.ucitaj_kolone_sa_kesom(args.ulaz)
+
+    if kol is not None:
+        susedi = columnar_flights.susedi_kolone(kol)
+        brojac("ruta", len(kol["rute"]))
+        brojac("letova", kol["ofseti"][-1])
+
+        def upisi_direktne(out_path):
+            columnar_flights.upisi_direct_kolone(kol, out_path)
+
+        if args.engine == "numpy":
+            upisi_indirect_kolone = columnar_flights.upisi_indirect_numpy
+        else:
+            upisi_indirect_kolone = columnar_flights.upisi_indirect_kolone
+
+        def pisac(dep, lan, out_path):
+            upisi_indirect_kolone(kol, dep, lan, out_path, susedi)
+        return upisi_direktne, pisac
+
+    route_map, seg_map = ucitaj_indeks(args)
+
+    def upisi_direktne(out_path):
+        upisi_direct(route_map, out_path)
+
+    if args.all_pairs is not None:
+        return upisi_direktne, pripremi_sve_parove(args, seg_map)
+    return upisi_direktne, napravi_pisca_indirect(args, seg_map)
+
+
+# ------------------------------------------------------------
+# Funkcija: parametri_upita
+# Sve što utiče na sadržaj flights_indirect.txt za dep->lan
+# (deo ključa keša rezultata)
+# ------------------------------------------------------------
+def parametri_upita(args, dep, lan):
+    return {
+        "dep": dep, "lan": lan,
+        "max_transfers": args.max_transfers, "depart_after": args.depart_after,
+        "top_k": args.top_k, "pareto": args.pareto, "summary": args.summary,
+        "offset": args.offset, "limit": args.limit,
+        "max_output_bytes": args.max_output_bytes,
+    }
+
+
+# ------------------------------------------------------------
+# Funkcija: pripremi_obradu_sa_kesom
+# --cache-dir: kao pripremi_obradu, ali se flights_direct.txt i
+# rezultat svakog upita prvo traže u kešu rezultata (ključ: heš
+# sadržaja flights.txt i parametri upita). Red letenja se učitava
+# samo ako neki od najavljenih upita (lista (dep, lan)) nije u
+# kešu, ili kasnije ako ga drugi proces u međuvremenu izbaci.
+# ------------------------------------------------------------
+def pripremi_obradu_sa_kesom(args, upiti):
+    hes = hes_datoteke(args.ulaz)
+    zabelezi_ulaz(args.ulaz)
+    kljuc_direct = kljuc_rezultata(hes, "oai", {"izlaz": "direct"})
+    obrada = []
+    zakljucavanje = threading.Lock()
+
+    def kljuc_upita(dep, lan):
+        return kljuc_rezultata(hes, "oai", parametri_upita(args, dep, lan))
+
+    def ucitana_obrada():
+        # Najviše jedno učitavanje i kada se izlazi pišu u nitima
+        with zakljucavanje:
+            if not obrada:
+                obrada.extend(pripremi_obradu(args))
+        return obrada
+
+    kljucevi = [kljuc_direct] + [kljuc_upita(dep, lan) for dep, lan in upiti]
+    if not all(postoji_rezultat(args.cache_dir, k) for k in kljucevi):
+        ucitana_obrada()
+
+    def upisi_direktne(out_path):
+        upisi_sa_kesom(
+            args.cache_dir, kljuc_direct, out_path,
+            lambda putanja: ucitana_obrada()[0](putanja), args.cache_max_bytes,
+        )
+
+    def pisac(dep, lan, out_path):
+        upisi_sa_kesom(
+            args.cache_dir, kljuc_upita(dep, lan), out_path,
+            lambda putanja: ucitana_obrada()[1](dep, lan, putanja), args.cache_max_bytes,
+        )
+    return upisi_direktne, pisac
+
+
+# ------------------------------------------------------------
+# Funkcija: pripremi_sve_parove
+# --all-pairs: rezultati za sve parove se računaju jednom u
+# direktorijum (allpairs_flights), osim ako su već izračunati iz
+# istog flights.txt; pisac samo čita deo traženog para
+# ------------------------------------------------------------
+def pripremi_sve_parove(args, seg_map):
+    # allpairs_flights uvozi ovaj modul, pa se uvozi tek ovde
+    import allpairs_flights
+
+    hes = hes_datoteke(args.ulaz)
+    manifest = allpairs_flights.aktuelni_parovi(args.all_pairs, hes, args.shards)
+    if manifest is None:
+        with faza("sve_parove"):
+            parova = allpairs_flights.izracunaj_sve_parove(
+                seg_map, args.all_pairs, args.shards, args.all_pairs_workers, hes
+            )
+        brojac("parova_gradova", parova)
+        manifest = allpairs_flights.procitaj_manifest(args.all_pairs)
+
+    def pisac(dep, lan, out_path):
+        allpairs_flights.upisi_par(args.all_pairs, dep, lan, out_path, manifest)
+    return pisac
+
+
+# ------------------------------------------------------------
+# Funkcija: ucitaj_indeks
+# Učitava route_map i seg_map izabranim parserom (preko keša)
+# ------------------------------------------------------------
+def ucitaj_indeks(args):
+    ucitaj = procitaj_flights_file
+    if args.mmap:
+        # mmap_flights uvozi ovaj modul, pa se uvozi tek ovde
+        import mmap_flights
+        ucitaj = mmap_flights.procitaj_mmap
+    elif args.workers is not None:
+        # parallel_flights uvozi ovaj modul, pa se uvozi tek ovde
+        import parallel_flights
+
+        def ucitaj(path):
+            return parallel_flights.procitaj_paralelno(path, args.workers)
+
+    # Parsiranje se preskače ako postoji ažuran binarni keš
+    # (paralelno učitavanje daje isti rezultat, pa deli isti keš)
+    route_map, seg_map = ucitaj_sa_kesom(args.ulaz, ucitaj, "oai")
+    if metrike_ukljucene():
+        brojac("ruta", len(seg_map))
+        brojac("letova", sum(map(len, seg_map.values())))
+    return route_map, seg_map
+
+
+# ------------------------------------------------------------
+# Funkcija: obradi_batch
+# Batch režim: flights.txt se parsira jednom, flights_direct.txt
+# se piše jednom, a za svaki par se u out_dir piše datoteka
+# CITY1->CITY2.txt identična pojedinačnom flights_indirect.txt
+# ------------------------------------------------------------
+def obradi_batch(args):
+    # Svi upiti se proveravaju pre bilo kakvog upisa
+    parovi = [parsiraj_par(linija) for linija in procitaj_parove(args.batch)]
+
+    if args.stream:
+        os.makedirs(args.out_dir, exist_ok=True)
+        obradi_tokom(args, [
+            (dep, lan, putanja_rezultata(args.out_dir, dep, lan, args.sufiks))
+            for dep, lan in dict.fromkeys(parovi)
+        ])
+        return
+
+    if args.delta:
+        os.makedirs(args.out_dir, exist_ok=True)
+        obradi_izmene(args, [
+            (dep, lan, putanja_rezultata(args.out_dir, dep, lan, args.sufiks))
+            for dep, lan in dict.fromkeys(parovi)
+        ])
+        return
+
+    try:
+        with faza("ucitavanje"):
+            if args.cache_dir is not None:
+                upisi_direktne, pisac = pripremi_obradu_sa_kesom(args, parovi)
+            else:
+                upisi_direktne, pisac = pripremi_obradu(args)
+    except FileNotFoundError:
+        print("DAT_GRESKA")
+        return
+
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    def upisi_indirektne():
+        for dep, lan in dict.fromkeys(parovi):
+            pisac(dep, lan, putanja_rezultata(args.out_dir, dep, lan, args.sufiks))
+
+    pisi_izlaze(args, lambda: upisi_direktne(args.izlaz_direct), upisi_indirektne)
+
+
+# ------------------------------------------------------------
+# Funkcija: pisi_izlaze
+# Piše flights_direct.txt pa indirektne rezultate, ili oba
+# istovremeno uz --concurrent (pokreni_uporedo). Obe strane samo
+# čitaju učitan red letenja; greška bilo koje se prosleđuje
+# pozivaocu (GRESKA).
+# ------------------------------------------------------------
+def pisi_izlaze(args, upisi_direktne, upisi_indirektne):
+    if args.concurrent is None:
+        with faza("direct"):
+            upisi_direktne()
+        with faza("indirect"):
+            upisi_indirektne()
+        return
+
+    with faza("izlaz"):
+        pokreni_uporedo([upisi_direktne, upisi_indirektne], args.concurrent)
+
+
+# ------------------------------------------------------------
+# Funkcija: obradi_tokom
+# --stream: flights.txt se ne drži ceo u memoriji (stream_flights)
+# upiti: lista (dep, lan, out_path)
+# ------------------------------------------------------------
+def obradi_tokom(args, upiti):
+    # stream_flights uvozi ovaj modul, pa se uvozi tek ovde
+    import stream_flights
+
+    try:
+        # Učitavanje i pisanje se ovde prepliću, pa je to jedna faza
+        with faza("tok"):
+            stream_flights.obradi_tokom(
+                args.ulaz, args.izlaz_direct, upiti, args.chunk_size
+            )
+    except FileNotFoundError:
+        print("DAT_GRESKA")
+
+
+# ------------------------------------------------------------
+# Funkcija: obradi_izmene
+# --delta: red letenja je flights.txt (ili njegov keš) sa
+# primenjenim izmenama iz delta datoteka (delta_flights), redom.
+# Ako je sačuvano stanje napravljeno od istog flights.txt i početka
+# istog lanca delta datoteka, primenjuju se samo preostale.
+# Izlazi prethodne verzije se ažuriraju delimično: ponovo se pišu
+# samo zahvaćeni blokovi flights_direct.txt i rezultati upita koji
+# zavise od promenjenih ruta. Izlazi bez važeće oznake (ili sa
+# oznakom neke druge verzije) se pišu iznova.
+# upiti: lista (dep, lan, out_path)
+# ------------------------------------------------------------
+def obradi_izmene(args, upiti):
+    # delta_flights uvozi ovaj modul, pa se uvozi tek ovde
+    import delta_flights
+
+    try:
+        with faza("ucitavanje"):
+            lanac = [hes_datoteke(path) for path in args.delta]
+            hes, route_map, seg_map, primenjeno = delta_flights.ucitaj_stanje(
+                args.ulaz, lanac, lambda: ucitaj_indeks(args)
+            )
+            izmene = [i for path in args.delta[primenjeno:]
+                      for i in delta_flights.procitaj_izmene(path)]
+    except FileNotFoundError:
+        print("DAT_GRESKA")
+        return
+
+    prethodna = delta_flights.verzija_stanja(hes, lanac[:primenjeno])
+    verzija = delta_flights.verzija_stanja(hes, lanac)
+    oznake = delta_flights.procitaj_oznake(args.ulaz)
+
+    with faza("direct"):
+        promenjene = delta_flights.primeni_izmene(route_map, seg_map, izmene)
+        if primenjeno < len(lanac):
+            delta_flights.sacuvaj_stanje(args.ulaz, hes, lanac, route_map, seg_map)
+
+        stara = delta_flights.oznaka_izlaza(oznake, args.izlaz_direct)
+        if stara == prethodna and stara != verzija:
+            delta_flights.azuriraj_direct(route_map, promenjene, args.izlaz_direct)
+        elif stara != verzija:
+            upisi_direct(route_map, args.izlaz_direct)
+        delta_flights.oznaci_izlaz(oznake, args.izlaz_direct, verzija)
+    brojac("izmena", len(izmene))
+    brojac("promenjenih_ruta", len(promenjene))
+
+    # Pretrage sa više presedanja zavise od celog reda letenja
+    sve = args.max_transfers is not None or args.pareto or args.top_k is not None
+    with faza("indirect"):
+        pisac = napravi_pisca_indirect(args, seg_map)
+        for dep, lan, out_path in upiti:
+            parametri = parametri_upita(args, dep, lan)
+            stara = delta_flights.oznaka_izlaza(oznake, out_path, parametri)
+            if stara != verzija and (stara != prethodna or sve or
+                                     delta_flights.zahvacen_upit(dep, lan, promenjene)):
+                pisac(dep, lan, out_path)
+            delta_flights.oznaci_izlaz(oznake, out_path, verzija, parametri)
+    delta_flights.upisi_oznake(args.ulaz, oznake)
+
+
+# ------------------------------------------------------------
+# Funkcija: izracunaj_sve_parove
+# --all-pairs bez upita: piše flights_direct.txt i računa DIR
+# ------------------------------------------------------------
+def izracunaj_sve_parove(args):
+    try:
+        with faza("ucitavanje"):
+            upisi_direktne, _ = pripremi_obradu(args)
+    except FileNotFoundError:
+        print("DAT_GRESKA")
+        return
+    with faza("direct"):
+        upisi_direktne(args.izlaz_direct)
+
+
+# ------------------------------------------------------------
+# Nespojive opcije: (opcije, opcije sa kojima se ne kombinuju, poruka).
+# Greška se javlja ako je zadata bar jedna opcija iz obe grupe;
+# pravila se proveravaju redom, pa se prijavljuje prvo prekršeno.
+# ------------------------------------------------------------
+NAPREDNE_PRETRAGE = ("--max-transfers", "--pareto", "--top-k")
+STRANICENJE = ("--summary", "--offset", "--limit", "--max-output-bytes")
+NESPOJIVE_OPCIJE = (
+    (STRANICENJE, ("--stream", "--columnar", "--engine") + NAPREDNE_PRETRAGE,
+     "--summary, --offset, --limit i --max-output-bytes važe samo "
+     "za osnovnu pretragu sa jednim presedanjem"),
+    (("--all-pairs",),
+     ("--stream", "--delta", "--columnar", "--engine") + NAPREDNE_PRETRAGE + STRANICENJE,
+     "--all-pairs važi samo za osnovnu pretragu sa jednim presedanjem"),
+    (("--cache-dir",), ("--stream", "--delta"),
+     "--cache-dir se ne može kombinovati sa --stream i --delta"),
+    (("--concurrent",), ("--stream", "--delta"),
+     "--concurrent se ne može kombinovati sa --stream i --delta"),
+    (("--delta",), ("--stream", "--columnar", "--engine"),
+     "--delta se ne može kombinovati sa --stream i --columnar"),
+    (("--mmap",), ("--workers", "--stream", "--columnar", "--engine"),
+     "--mmap se ne može kombinovati sa --workers, --stream i --columnar"),
+    (("--workers",), ("--stream", "--columnar", "--engine"),
+     "--workers se ne može kombinovati sa --stream i --columnar"),
+    (("--stream",), ("--columnar", "--engine") + NAPREDNE_PRETRAGE,
+     "--stream podržava samo osnovnu pretragu sa jednim presedanjem"),
+    (("--columnar", "--engine"), NAPREDNE_PRETRAGE,
+     "--columnar podržava samo osnovnu pretragu sa jednim presedanjem"),
+)
+
+
+# ------------------------------------------------------------
+# Funkcija: zadata_opcija
+# Da li se vrednost opcije razlikuje od podrazumevane
+# ------------------------------------------------------------
+def zadata_opcija(parser, args, opcija):
+    dest = opcija.lstrip("-").replace("-", "_")
+    return getattr(args, dest) != parser.get_default(dest)
+
+
+# ------------------------------------------------------------
+# Funkcija: nenegativan_broj
+# Tip za argparse; greška se prijavljuje kao greška opcije
+# ------------------------------------------------------------
+def nenegativan_broj(tekst):
+    broj = int(tekst)
+    if broj < 0:
+        raise argparse.ArgumentTypeError("ne može biti negativan")
+    return broj
+
+
+# ------------------------------------------------------------
+# Funkcija: pozitivan_broj
+# Tip za argparse; greška se prijavljuje kao greška opcije
+# ------------------------------------------------------------
+def pozitivan_broj(tekst):
+    broj = int(tekst)
+    if broj < 1:
+        raise argparse.ArgumentTypeError("mora biti pozitivan")
+    return broj
+
+
+# ------------------------------------------------------------
+# Funkcija: parsiraj_argumente
+# Opcije komandne linije (bez opcija program radi kao ranije)
+# ------------------------------------------------------------
+def parsiraj_argumente(argv):
+    parser = argparse.ArgumentParser(description="Direktni i indirektni letovi")
+    parser.add_argument(
+        "--batch", nargs="?", const="-", metavar="FILE",
+        help="čita po jedan par CITY1->CITY2 po redu iz FILE ili sa stdin"
+    )
+    parser.add_argument(
+        "--out-dir", default="flights_indirect",
+        help="direktorijum za rezultate batch režima"
+    )
+    parser.add_argument(
+        "--max-transfers", type=int, metavar="K",
+        help="umesto svih veza sa jednim presedanjem upisuje putovanje sa "
+             "najranijim dolaskom i najviše K presedanja (Connection Scan)"
+    )
+    parser.add_argument(
+        "--depart-after", default="00:00", metavar="HH:MM",
+        help="najranije vreme polaska za --max-transfers, --pareto i --top-k"
+    )
+    parser.add_argument(
+        "--top-k", type=int, metavar="K",
+        help="upisuje K najjeftinijih putovanja (broj presedanja se može "
+             "ograničiti sa --max-transfers)"
+    )
+    parser.add_argument(
+        "--pareto", action="store_true",
+        help="upisuje samo Pareto front po (dolazak, cena, presedanja); "
+             "broj presedanja se zadaje sa --max-transfers (podrazumevano 1)"
+    )
+    parser.add_argument(
+        "--columnar", action="store_true",
+        help="kompaktan kolonski red letenja (columnar_flights) za "
+             "flights_direct.txt i flights_indirect.txt"
+    )
+    parser.add_argument(
+        "--engine", choices=("python", "numpy"), default="python",
+        help="numpy: vektorizovano spajanje veza nad kolonskim redom "
+             "letenja (podrazumeva --columnar, zahteva numpy)"
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="čita flights.txt tokom obrade sa ograničenom memorijom; "
+             "sortiranje za flights_direct.txt se preliva na disk"
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=1_000_000, metavar="N",
+        help="broj letova koji se sortira u memoriji u --stream režimu"
+    )
+    parser.add_argument(
+        "--workers", type=nenegativan_broj, metavar="N",
+        help="parsira flights.txt u N procesa po opsezima bajtova "
+             "(0 = broj jezgara)"
+    )
+    parser.add_argument(
+        "--mmap", action="store_true",
+        help="brže učitavanje flights.txt direktno iz bajtova (mmap_flights)"
+    )
+    parser.add_argument(
+        "--delta", action="append", metavar="FILE",
+        help="primenjuje izmene (+/=/- po aviokompaniji i ruti) na red "
+             "letenja i ponovo piše samo zahvaćene rezultate; može više puta "
+             "(lanac se navodi ceo, već primenjen početak se čita iz "
+             "flights.txt.oai-delta.idx)"
+    )
+    parser.add_argument(
+        "--max-output-bytes", type=int, metavar="N",
+        help="GRESKA umesto pisanja ako bi flights_indirect.txt imao više "
+             "od N bajtova (veličina se procenjuje pre pisanja)"
+    )
+    parser.add_argument(
+        "--offset", type=nenegativan_broj, default=0, metavar="N",
+        help="preskače prvih N konekcija po međugradu"
+    )
+    parser.add_argument(
+        "--limit", type=nenegativan_broj, metavar="N",
+        help="najviše N konekcija po međugradu"
+    )
+    parser.add_argument(
+        "--summary", action="store_true",
+        help="jedan red po međugradu: broj konekcija, najniža cena i "
+             "najraniji dolazak umesto pune liste"
+    )
+    parser.add_argument(
+        "--compress", choices=sorted(KODECI),
+        help="izlazne datoteke se pišu kompresovane (flights_direct.txt.gz, "
+             "flights_direct.txt.zst, ...); ulaz se raspakuje automatski"
+    )
+    parser.add_argument(
+        "--compress-level", type=int, metavar="N",
+        help="nivo kompresije (gzip 1-9, podrazumevano 6; zstd 1-22, podrazumevano 3)"
+    )
+    parser.add_argument(
+        "--concurrent", choices=("thread", "process"),
+        help="flights_direct.txt i indirektni rezultati se pišu istovremeno "
+             "(niti ili procesi koji dele učitan red letenja)"
+    )
+    parser.add_argument(
+        "--metrics", nargs="?", const="-", metavar="FILE",
+        help="vreme, CPU i vršni RSS procesa po fazi (uz python -X "
+             "tracemalloc i vršna alokacija faze) i brojači kao JSON na "
+             "stderr ili u FILE"
+    )
+    parser.add_argument(
+        "--metrics-sink", metavar="MODUL:FUNKCIJA",
+        help="funkcija koja na kraju dobija rečnik metrika (uključuje merenje)"
+    )
+    parser.add_argument(
+        "--all-pairs", metavar="DIR",
+        help="računa letove sa jednim presedanjem za sve parove gradova u "
+             "DIR (delovi po hešu para sa indeksom); upit se čita iz DIR, "
+             "a DIR se ponovo računa samo kada se flights.txt promeni"
+    )
+    parser.add_argument(
+        "--shards", type=pozitivan_broj, default=64, metavar="N",
+        help="broj delova za --all-pairs"
+    )
+    parser.add_argument(
+        "--all-pairs-workers", type=nenegativan_broj, default=0, metavar="N",
+        help="broj procesa za --all-pairs (0 = broj jezgara)"
+    )
+    parser.add_argument(
+        "--cache-dir", metavar="DIR",
+        help="keš rezultata: flights_direct.txt i rezultat upita se čuvaju u "
+             "DIR po hešu flights.txt i parametrima upita i pri ponovljenom "
+             "upitu samo prepisuju"
+    )
+    parser.add_argument(
+        "--cache-max-bytes", type=pozitivan_broj, default=MAX_BAJTOVA_REZULTATA, metavar="N",
+        help="najveća ukupna veličina keša rezultata; najdavnije korišćeni "
+             "rezultati se izbacuju (podrazumevano 256 MiB)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.metrics_sink is not None:
+        try:
+            args.metrics_sink = ucitaj_sink(args.metrics_sink)
+        except (ImportError, AttributeError, ValueError) as e:
+            parser.error(f"--metrics-sink: {e}")
+
+    if args.compress == "zstd" and importlib.util.find_spec("zstandard") is None:
+        parser.error("--compress zstd zahteva paket zstandard")
+    if args.compress_level is not None and args.compress is None:
+        parser.error("--compress-level zahteva --compress")
+    postavi_nivo_kompresije(args.compress_level)
+
+    # Ulaz može biti i flights.txt.gz / flights.txt.zst
+    args.ulaz = pronadji_ulaz("flights.txt")
+    args.sufiks = sufiks_kompresije(args.compress)
+    args.izlaz_direct = "flights_direct.txt" + args.sufiks
+    args.izlaz_indirect = "flights_indirect.txt" + args.sufiks
+
+    for opcije, nespojive, poruka in NESPOJIVE_OPCIJE:
+        if (any(zadata_opcija(parser, args, o) for o in opcije)
+                and any(zadata_opcija(parser, args, o) for o in nespojive)):
+            parser.error(poruka)
+
+    if args.engine == "numpy":
+        if importlib.util.find_spec("numpy") is None:
+            parser.error("--engine numpy zahteva paket numpy")
+        args.columnar = True
+    return args
 
 
 # ------------------------------------------------------------
 # Glavna funkcija
 # ------------------------------------------------------------
-def main():
+def main(argv=None):
+    args = parsiraj_argumente(argv)
+
+    # Merenje je uključeno samo uz --metrics ili --metrics-sink
+    if args.metrics_sink is not None:
+        dodaj_sink(args.metrics_sink)
+    if args.metrics is not None or args.metrics_sink is not None:
+        ukljuci_metrike("OAI")
+
     try:
+        if args.batch is not None:
+            obradi_batch(args)
+            return
+
         ulaz = procitaj_ulaz()
 
         # Ako je ulaz prazan – ništa se ne ispisuje
+        # (uz --all-pairs se samo računaju svi parovi)
         if ulaz is None:
+            if args.all_pairs is not None:
+                izracunaj_sve_parove(args)
             return
 
         dep, lan = ulaz
 
+        if args.stream:
+            obradi_tokom(args, [(dep, lan, args.izlaz_indirect)])
+            return
+
+        if args.delta:
+            obradi_izmene(args, [(dep, lan, args.izlaz_indirect)])
+            return
+
         try:
-            route_map, seg_map = procitaj_flights_file("flights.txt")
+            with faza("ucitavanje"):
+                if args.cache_dir is not None:
+                    upisi_direktne, pisac = pripremi_obradu_sa_kesom(args, [(dep, lan)])
+                else:
+                    upisi_direktne, pisac = pripremi_obradu(args)
         except FileNotFoundError:
             print("DAT_GRESKA")
             return
 
-        upisi_direct(route_map, "flights_direct.txt")
-        upisi_indirect(seg_map, dep, lan, "flights_indirect.txt")
+        pisi_izlaze(
+            args,
+            lambda: upisi_direktne(args.izlaz_direct),
+            lambda: pisac(dep, lan, args.izlaz_indirect),
+        )
 
     except Exception:
         print("GRESKA")
+    finally:
+        zavrsi_metrike(args.metrics)
 
 
 # Pokretanje programa
@@ -0,0 +1,344 @@
+import json
+import marshal
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zlib
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+
+from OAI_flights import napravi_susede, prikaz_leta
+from common_flights import VELICINA_BAFERA, brojac, otvori_izlaz
+
+# ------------------------------------------------------------
+# Unapred izračunati letovi sa jednim presedanjem za sve parove.
+#
+# Umesto jednog upisi_indirect po paru (svaki put ponovo traženje
+# međugradova i formatiranje drugog segmenta), svaki grad H se
+# obrađuje jednom kao čvorište: za sve rute X->H i H->Y piše se
+# blok X->H->Y, isti kao u flights_indirect.txt za upit X->Y.
+# Tekst drugog segmenta H->Y se formatira jednom po čvorištu.
+#
+# Čvorišta se dele procesima (map); svaki blok se šalje u deo
+# (shard) po hešu para (X, Y) i prvo upisuje u privremenu datoteku
+# po grupi čvorišta i delu. Zatim se svaki deo spaja (reduce): blokovi
+# se sortiraju po (X, Y, H), pa su blokovi jednog para uzastopni i
+# poređani po međugradu, tačno kao u upisi_indirect. Spaja se po
+# jedan deo, a blokovi se prepisuju direktno iz grupnih datoteka, pa
+# se u memoriji drže samo opisi blokova jednog dela.
+#
+# Direktorijum rezultata:
+#   manifest.json    verzija formata, broj delova i parova i heš
+#                    reda letenja iz koga su rezultati izračunati
+#   deo_NNN.txt      spojeni rezultati parova jednog dela (UTF-8)
+#   deo_NNN.idx      marshal rečnik (X, Y) -> (ofset, dužina,
+#                    broj međugradova, broj parova letova)
+#
+# Pretraga para čita samo indeks njegovog dela (heš -> deo ->
+# rečnik), pa je O(1) bez obzira na broj parova; indeks se učitava
+# jednom po procesu (batch i server ga dele za sve upite).
+# ------------------------------------------------------------
+
+VERZIJA_FORMATA = 1
+SHARDOVA = 64
+
+# Red letenja u procesima radnicima (postavlja ga _postavi_red_letenja)
+_SEG_MAP = None
+
+# Učitani indeksi delova: putanja -> (ključ, rečnik); vidi indeks_dela
+_INDEKSI = {}
+
+
+# ------------------------------------------------------------
+# Funkcija: shard_para
+# Deo kome pripada par; heš ne zavisi od PYTHONHASHSEED
+# ------------------------------------------------------------
+def shard_para(dep, lan, shardova):
+    return zlib.crc32(f"{dep}->{lan}".encode("utf-8")) % shardova
+
+
+# ------------------------------------------------------------
+# Funkcija: blokovi_cvorista
+# Blokovi (X, Y, tekst, parova) za sve parove koji presedaju u
+# čvorištu H; parova je broj parova letova u bloku.
+# Za dati par tekst je isti kao deo redovi_indirect za med = H.
+# ------------------------------------------------------------
+def blokovi_cvorista(seg_map, susedi, H, prikaz=prikaz_leta):
+    izlazni, ulazni = susedi
+
+    # Drugi segment H->Y: vremena polaska, tekst i ofseti, jednom po čvorištu
+    drugi = []
+    for Y in sorted(izlazni.get(H, ())):
+        B = seg_map.get((H, Y))
+        if not B:
+            continue
+        b_linije = [f"{H}->{Y}|{b[0]}|{prikaz(b)}\n" for b in B]
+        drugi.append((
+            Y, [f[3] for f in B], "".join(b_linije),
+            list(accumulate(map(len, b_linije), initial=0)),
+        ))
+
+    for X in sorted(ulazni.get(H, ())):
+        A = seg_map.get((X, H))
+        if not A:
+            continue
+        a_linije = [f"{X}->{H}|{a[0]}|{prikaz(a)}\n" for a in A]
+        a_dolasci = [a[4] for a in A]
+
+        for Y, b_dep_times, b_tekst, b_ofseti in drugi:
+            n = len(b_dep_times)
+            delovi = [f"{X}->{H}->{Y}\n"]
+            parova = 0
+            for linija, dolazak in zip(a_linije, a_dolasci):
+                delovi.append(linija)
+                idx = bisect_left(b_dep_times, dolazak)
+                if idx < n:
+                    parova += n - idx
+                    delovi.append(b_tekst[b_ofseti[idx]:])
+            yield X, Y, "".join(delovi), parova
+
+
+# ------------------------------------------------------------
+# Funkcija: _postavi_red_letenja
+# Inicijalizacija radnika; sa fork-om se seg_map nasleđuje bez
+# serijalizacije (inače se jednom šalje svakom radniku)
+# ------------------------------------------------------------
+def _postavi_red_letenja(seg_map):
+    global _SEG_MAP
+    _SEG_MAP = seg_map
+
+
+# ------------------------------------------------------------
+# Funkcija: obradi_grupu
+# Map: obrađuje grupu čvorišta; tekst blokova se kao UTF-8 nadovezuje
+# u privremenu datoteku po delu (gG.dS), a opis bloka (X, Y, H,
+# ofset, dužina, parova) u listu koja se na kraju upisuje u gG.dS.idx.
+# Vraća broj upisanih blokova.
+# ------------------------------------------------------------
+def obradi_grupu(grupa, cvorista, tmp_dir, shardova, seg_map=None):
+    seg_map = _SEG_MAP if seg_map is None else seg_map
+    susedi = napravi_susede(seg_map)
+    izlazi = {}
+    opisi = {}
+    blokova = 0
+    try:
+        for H in cvorista:
+            for X, Y, tekst, parova in blokovi_cvorista(seg_map, susedi, H):
+                s = shard_para(X, Y, shardova)
+                f = izlazi.get(s)
+                if f is None:
+                    f = izlazi[s] = open(os.path.join(tmp_dir, f"g{grupa}.d{s}"), "wb")
+                    opisi[s] = []
+                podaci = tekst.encode("utf-8")
+                opisi[s].append((X, Y, H, f.tell(), len(podaci), parova))
+                f.write(podaci)
+                blokova += 1
+    finally:
+        for f in izlazi.values():
+            f.close()
+
+    for s, opis in opisi.items():
+        with open(os.path.join(tmp_dir, f"g{grupa}.d{s}.idx"), "wb") as f:
+            marshal.dump(opis, f)
+    return blokova
+
+
+# ------------------------------------------------------------
+# Funkcija: spoji_shard
+# Reduce: opise blokova dela iz svih grupa sortira po (X, Y, H) i
+# prepisuje blokove u deo_NNN.txt čitanjem iz grupnih datoteka (kao
+# bajtove, bez ponovnog dekodiranja i bez učitavanja celih datoteka),
+# pa piše indeks deo_NNN.idx. Vraća broj parova.
+# ------------------------------------------------------------
+def spoji_shard(s, grupa, tmp_dir, izlaz_dir):
+    bloka = []
+    ulazi = []
+    try:
+        for g in range(grupa):
+            putanja = os.path.join(tmp_dir, f"g{g}.d{s}")
+            if not os.path.exists(putanja):
+                continue
+            with open(putanja + ".idx", "rb") as f:
+                opis = marshal.load(f)
+            ulazi.append(open(putanja, "rb"))
+            i = len(ulazi) - 1
+            bloka.extend((X, Y, H, i, ofset, duzina, parova)
+                         for X, Y, H, ofset, duzina, parova in opis)
+        bloka.sort()
+
+        indeks = {}
+        pozicija = 0
+        with open(os.path.join(izlaz_dir, f"deo_{s:03d}.txt"), "wb") as out:
+            for X, Y, _, i, ofset, duzina, parova in bloka:
+                ulaz = ulazi[i]
+                ulaz.seek(ofset)
+                ostalo = duzina
+                while ostalo:
+                    komad = ulaz.read(min(ostalo, VELICINA_BAFERA))
+                    out.write(komad)
+                    ostalo -= len(komad)
+                pocetak, ukupno, medjugradova, ukupno_parova = indeks.get((X, Y), (pozicija, 0, 0, 0))
+                indeks[(X, Y)] = (pocetak, ukupno + duzina, medjugradova + 1, ukupno_parova + parova)
+                pozicija += duzina
+    finally:
+        for ulaz in ulazi:
+            ulaz.close()
+            os.unlink(ulaz.name)
+            os.unlink(ulaz.name + ".idx")
+
+    with open(os.path.join(izlaz_dir, f"deo_{s:03d}.idx"), "wb") as f:
+        marshal.dump(indeks, f)
+    return len(indeks)
+
+
+# ------------------------------------------------------------
+# Funkcija: podeli_cvorista
+# Deli čvorišta u grupe približno jednakog posla (broj letova
+# dolazaka puta broj ruta odlaska), najveća prvo
+# ------------------------------------------------------------
+def podeli_cvorista(seg_map, susedi, grupa):
+    izlazni, ulazni = susedi
+    posao = {}
+    for H in set(izlazni) & set(ulazni):
+        dolazaka = sum(len(seg_map[(X, H)]) for X in ulazni[H])
+        posao[H] = dolazaka * len(izlazni[H])
+
+    grupe = [[] for _ in range(grupa)]
+    opterecenje = [0] * grupa
+    for H in sorted(posao, key=lambda h: (-posao[h], h)):
+        i = opterecenje.index(min(opterecenje))
+        grupe[i].append(H)
+        opterecenje[i] += posao[H]
+    return [g for g in grupe if g]
+
+
+# ------------------------------------------------------------
+# Funkcija: izracunaj_sve_parove
+# Piše direktorijum izlaz_dir sa rezultatima za sve parove.
+# radnika: broj procesa (None/0 = broj jezgara, 1 = bez procesa).
+# hes: heš flights.txt koji se čuva u manifestu (aktuelni_parovi).
+# Direktorijum se gradi pored odredišta i zamenjuje na kraju,
+# pa prekinuto računanje ne ostavlja polovične rezultate.
+# ------------------------------------------------------------
+def izracunaj_sve_parove(seg_map, izlaz_dir, shardova=SHARDOVA, radnika=None, hes=None):
+    radnika = radnika or os.cpu_count() or 1
+    susedi = napravi_susede(seg_map)
+    # Više grupa nego radnika ujednačava posao
+    grupe = podeli_cvorista(seg_map, susedi, radnika * 4 if radnika > 1 else 1)
+
+    izlaz_dir = os.path.abspath(izlaz_dir)
+    roditelj = os.path.dirname(izlaz_dir)
+    os.makedirs(roditelj, exist_ok=True)
+    novi_dir = tempfile.mkdtemp(dir=roditelj, prefix=".sviparovi_")
+    try:
+        with tempfile.TemporaryDirectory(dir=roditelj, prefix=".sviparovi_tmp_") as tmp_dir:
+            if radnika == 1:
+                for g, cvorista in enumerate(grupe):
+                    obradi_grupu(g, cvorista, tmp_dir, shardova, seg_map)
+                parova = sum(
+                    spoji_shard(s, len(grupe), tmp_dir, novi_dir) for s in range(shardova)
+                )
+            else:
+                kontekst = None
+                if "fork" in multiprocessing.get_all_start_methods():
+                    kontekst = multiprocessing.get_context("fork")
+                with ProcessPoolExecutor(
+                    max_workers=radnika, mp_context=kontekst,
+                    initializer=_postavi_red_letenja, initargs=(seg_map,),
+                ) as pool:
+                    for b in [pool.submit(obradi_grupu, g, c, tmp_dir, shardova)
+                              for g, c in enumerate(grupe)]:
+                        b.result()
+                    parova = sum(b.result() for b in [
+                        pool.submit(spoji_shard, s, len(grupe), tmp_dir, novi_dir)
+                        for s in range(shardova)
+                    ])
+
+        with open(os.path.join(novi_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "verzija": VERZIJA_FORMATA, "shardova": shardova,
+                "parova": parova, "hes": hes,
+            }, f)
+
+        if os.path.isdir(izlaz_dir):
+            shutil.rmtree(izlaz_dir)
+        os.replace(novi_dir, izlaz_dir)
+    except BaseException:
+        shutil.rmtree(novi_dir, ignore_errors=True)
+        raise
+    return parova
+
+
+# ------------------------------------------------------------
+# Funkcija: procitaj_manifest
+# ------------------------------------------------------------
+def procitaj_manifest(izlaz_dir):
+    with open(os.path.join(izlaz_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("verzija") != VERZIJA_FORMATA:
+        raise ValueError("Nepoznata verzija rezultata za sve parove")
+    return manifest
+
+
+# ------------------------------------------------------------
+# Funkcija: aktuelni_parovi
+# Manifest ako je izlaz_dir izračunat iz reda letenja sa hešom hes
+# i sa shardova delova, inače None (treba ponovo izračunati)
+# ------------------------------------------------------------
+def aktuelni_parovi(izlaz_dir, hes, shardova=SHARDOVA):
+    try:
+        manifest = procitaj_manifest(izlaz_dir)
+    except (OSError, ValueError):
+        return None
+    if hes is None or manifest.get("hes") != hes or manifest.get("shardova") != shardova:
+        return None
+    return manifest
+
+
+# ------------------------------------------------------------
+# Funkcija: indeks_dela
+# Indeks deo_NNN.idx, učitan jednom po procesu. Ključ keša je
+# putanja, heš reda letenja iz manifesta i stat indeksa (inode,
+# veličina, vreme izmene), pa ponovo izračunat direktorijum ne
+# vraća stari indeks.
+# ------------------------------------------------------------
+def indeks_dela(izlaz_dir, s, manifest):
+    putanja = os.path.abspath(os.path.join(izlaz_dir, f"deo_{s:03d}.idx"))
+    st = os.stat(putanja)
+    kljuc = (manifest.get("hes"), st.st_ino, st.st_size, st.st_mtime_ns)
+    zapis = _INDEKSI.get(putanja)
+    if zapis is None or zapis[0] != kljuc:
+        with open(putanja, "rb") as f:
+            zapis = _INDEKSI[putanja] = (kljuc, marshal.load(f))
+    return zapis[1]
+
+
+# ------------------------------------------------------------
+# Funkcija: procitaj_par
+# Tekst flights_indirect.txt za par dep->lan ("" ako nema veza)
+# ------------------------------------------------------------
+def procitaj_par(izlaz_dir, dep, lan, manifest=None):
+    manifest = manifest or procitaj_manifest(izlaz_dir)
+    s = shard_para(dep, lan, manifest["shardova"])
+    mesto = indeks_dela(izlaz_dir, s, manifest).get((dep, lan))
+    if mesto is None:
+        return ""
+    ofset, duzina, medjugradova, parova = mesto
+    brojac("medjugradova", medjugradova)
+    brojac("parova", parova)
+    with open(os.path.join(izlaz_dir, f"deo_{s:03d}.txt"), "rb") as f:
+        f.seek(ofset)
+        return f.read(duzina).decode("utf-8")
+
+
+# ------------------------------------------------------------
+# Funkcija: upisi_par
+# Piše flights_indirect.txt za dep->lan iz unapred izračunatih
+# rezultata (isti sadržaj kao upisi_indirect)
+# ------------------------------------------------------------
+def upisi_par(izlaz_dir, dep, lan, out_path, manifest=None):
+    tekst = procitaj_par(izlaz_dir, dep, lan, manifest)
+    with otvori_izlaz(out_path) as out:
+        out.write(tekst)
@@ -0,0 +1,533 @@
+"""
+Benchmarkovi za implementacije letova.
+
+Pokretanje:
+    python bench_flights.py cc-indirect --n 5000
+    python bench_flights.py memory --flights 200000
+    python bench_flights.py parse --flights 10000000 --workers 0
+    python bench_flights.py compression --flights 1000000 --level 6
+    python bench_flights.py all-pairs --flights 100000 --cities 100 --workers 0
+    python bench_flights.py generate flights.txt --flights 1000000 --hubs 5 --hub-share 0.5
+    python bench_flights.py suite --tiers 10000,100000,1000000 --output bench_results.json
+
+Rezultati se ispisuju na standardni izlaz.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def ucitaj_modul(ime_datoteke):
+    """Učitava skriptu kao modul bez pokretanja main()."""
+    spec = importlib.util.spec_from_file_location(
+        ime_datoteke.replace(".py", ""), os.path.join(REPO_DIR, ime_datoteke)
+    )
+    modul = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modul)
+    return modul
+
+
+def hh_mm(minuti):
+    """Minute od početka dana u format hh:mm."""
+    return f"{minuti // 60:02d}:{minuti % 60:02d}"
+
+
+def meri(funkcija, *args):
+    """Vraća (rezultat, trajanje u sekundama)."""
+    t0 = time.perf_counter()
+    rezultat = funkcija(*args)
+    return rezultat, time.perf_counter() - t0
+
+
+# ------------------------------------------------------------
+# CC_Flights: spajanje letova preko jednog čvorišta (hub)
+# ------------------------------------------------------------
+
+def cc_letovi_hub(n, seed=1):
+    """
+    Red letenja u formatu CC_Flights.ucitaj_letove sa n letova P->H i n letova H->O.
+    Prvi letovi stižu uveče, pa je izlaz mnogo manji od n*n kombinacija.
+    """
+    rnd = random.Random(seed)
+    letovi = []
+    for i in range(n):
+        pol = rnd.randint(18 * 60, 21 * 60)
+        dol = min(pol + rnd.randint(60, 180), 23 * 60 + 59)
+        letovi.append({
+            'aviokompanija': f"A{i % 50}", 'grad_polaska': 'P', 'grad_dolaska': 'H',
+            'letovi': [{'vreme_polaska': hh_mm(pol), 'vreme_dolaska': hh_mm(dol),
+                        'cena': rnd.randint(5000, 50000) / 100}],
+        })
+    for i in range(n):
+        pol = rnd.randint(0, 22 * 60)
+        dol = min(pol + rnd.randint(60, 180), 23 * 60 + 59)
+        letovi.append({
+            'aviokompanija': f"B{i % 50}", 'grad_polaska': 'H', 'grad_dolaska': 'O',
+            'letovi': [{'vreme_polaska': hh_mm(pol), 'vreme_dolaska': hh_mm(dol),
+                        'cena': rnd.randint(5000, 50000) / 100}],
+        })
+    return letovi
+
+
+def cc_kvadratno(cc, letovi_iz, polazni_grad, odredisni_grad, naziv_datoteke):
+    """Prethodna O(|A|*|B|) verzija formiraj_indirektne_letove, radi poređenja."""
+    presedanja = {}
+    if polazni_grad in letovi_iz:
+        for medjugrad in letovi_iz[polazni_grad]:
+            if medjugrad != odredisni_grad and medjugrad in letovi_iz:
+                if odredisni_grad in letovi_iz[medjugrad]:
+                    presedanja[medjugrad] = []
+                    for let1 in letovi_iz[polazni_grad][medjugrad]:
+                        for let2 in letovi_iz[medjugrad][odredisni_grad]:
+                            if cc.vreme_u_minute(let2['vreme_polaska']) > cc.vreme_u_minute(let1['vreme_dolaska']):
+                                presedanja[medjugrad].append((let1, let2))
+
+    with open(naziv_datoteke, 'w', encoding='utf-8') as f:
+        for medjugrad in sorted(presedanja.keys()):
+            f.write(f"{polazni_grad}->{medjugrad}->{odredisni_grad}\n")
+            kombinacije_sortirane = sorted(presedanja[medjugrad], key=lambda x: (
+                x[0]['vreme_polaska'],
+                cc.trajanje_leta(x[0]['vreme_polaska'], x[0]['vreme_dolaska']),
+                x[0]['aviokompanija']
+            ))
+            for let1, let2 in kombinacije_sortirane:
+                f.write(f"{polazni_grad}->{medjugrad}\n")
+                f.write(f"{let1['aviokompanija']}|{let1['vreme_polaska']}-{let1['vreme_dolaska']},{let1['cena']:.2f}\n")
+                f.write(f"{medjugrad}->{odredisni_grad}\n")
+                f.write(f"{let2['aviokompanija']}|{let2['vreme_polaska']}-{let2['vreme_dolaska']},{let2['cena']:.2f}\n")
+    return sum(len(k) for k in presedanja.values())
+
+
+def bench_cc_indirect(args):
+    cc = ucitaj_modul("CC_Flights.py")
+    letovi = cc_letovi_hub(args.n, args.seed)
+    letovi_iz = cc.grupisi_po_gradovima(letovi)
+
+    _, t_novo = meri(cc.formiraj_indirektne_letove, letovi, "P->O", os.devnull, letovi_iz)
+    parova, t_staro = meri(cc_kvadratno, cc, letovi_iz, "P", "O", os.devnull)
+
+    print(f"CC formiraj_indirektne_letove, hub {args.n}x{args.n}, {parova} kombinacija")
+    print(f"  kvadratno:  {t_staro:8.3f} s")
+    print(f"  bisect:     {t_novo:8.3f} s")
+    print(f"  ubrzanje:   {t_staro / t_novo:8.1f}x")
+
+
+# ------------------------------------------------------------
+# Sintetički flights.txt
+# ------------------------------------------------------------
+
+def ime_grada(i):
+    """Ime i-tog grada u sintetičkom redu letenja (prvih n_cvorista su čvorišta)."""
+    return f"Grad{i:04d}"
+
+
+def generisi_redove(n_letova, n_gradova=200, n_aviokompanija=40, letova_po_liniji=8,
+                    n_cvorista=0, udeo_cvorista=0.0, seed=1):
+    """
+    Redovi nasumičnog flights.txt sa približno n_letova letova.
+
+    Svaki red je jedna aviokompanija na jednoj ruti sa letova_po_liniji letova.
+    Sa n_cvorista > 0 udeo_cvorista redova ima čvorište (jedan od prvih
+    n_cvorista gradova) na jednom kraju, a drugi kraj je običan grad, pa
+    parovi običnih gradova imaju veze preko čvorišta. Isti argumenti daju
+    isti sadržaj; bez čvorišta je sadržaj isti kao u ranijim verzijama.
+    """
+    rnd = random.Random(seed)
+    gradovi = [ime_grada(i) for i in range(n_gradova)]
+    cvorista, obicni = gradovi[:n_cvorista], gradovi[n_cvorista:]
+    aviokompanije = [f"Avio{i:03d}" for i in range(n_aviokompanija)]
+    ostalo = n_letova
+    while ostalo > 0:
+        k = min(letova_po_liniji, ostalo)
+        if cvorista and rnd.random() < udeo_cvorista:
+            fr, to = rnd.choice(cvorista), rnd.choice(obicni)
+            if rnd.random() < 0.5:
+                fr, to = to, fr
+        else:
+            fr, to = rnd.sample(gradovi, 2)
+        tokeni = []
+        for _ in range(k):
+            pol = rnd.randint(0, 22 * 60)
+            dol = min(pol + rnd.randint(30, 300), 23 * 60 + 59)
+            tokeni.append(f"{hh_mm(pol)}-{hh_mm(dol)},{rnd.randint(2000, 90000) / 100:.2f}")
+        yield f"{rnd.choice(aviokompanije)}|{fr}->{to}|{';'.join(tokeni)}\n"
+        ostalo -= k
+
+
+def generisi_flights_txt(putanja, n_letova, **parametri):
+    """Piše nasumičan flights.txt (parametri kao za generisi_redove)."""
+    with open(putanja, "w", encoding="utf-8") as f:
+        f.writelines(generisi_redove(n_letova, **parametri))
+
+
+def zauzeta_memorija(funkcija, *args):
+    """Bajtovi koje drži rezultat funkcije (tracemalloc, posle izvršavanja)."""
+    tracemalloc.start()
+    rezultat = funkcija(*args)
+    trenutno, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rezultat
+    return trenutno
+
+
+def bench_memory(args):
+    oai = ucitaj_modul("OAI_flights.py")
+    kolone = ucitaj_modul("columnar_flights.py")
+    g = ucitaj_modul("G_flights.py")
+    cc = ucitaj_modul("CC_Flights.py")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        putanja = os.path.join(tmp, "flights.txt")
+        generisi_flights_txt(putanja, args.flights, seed=args.seed)
+
+        merenja = [
+            ("OAI route_map+seg_map (tuple)", oai.procitaj_flights_file),
+            ("G ucitaj_letove (dict po letu)", g.ucitaj_letove),
+            ("CC ucitaj_letove (dict po letu)", cc.ucitaj_letove),
+            ("columnar_flights (array)", kolone.procitaj_kolone),
+        ]
+        print(f"Memorija strukture za {args.flights} letova")
+        for ime, funkcija in merenja:
+            bajtova = zauzeta_memorija(funkcija, putanja)
+            print(f"  {ime:34s} {bajtova / 2**20:9.1f} MiB  {bajtova / args.flights:7.1f} B/let")
+
+
+def bench_parse(args):
+    oai = ucitaj_modul("OAI_flights.py")
+    mm = ucitaj_modul("mmap_flights.py")
+    # Funkcije radnika se serijalizuju po imenu modula, pa se uvozi normalno
+    sys.path.insert(0, REPO_DIR)
+    par = importlib.import_module("parallel_flights")
+    radnika = args.workers or os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        putanja = os.path.join(tmp, "flights.txt")
+        generisi_flights_txt(putanja, args.flights, seed=args.seed)
+        mib = os.path.getsize(putanja) / 2**20
+
+        merenja = [
+            ("procitaj_flights_file (tekst)", oai.procitaj_flights_file),
+            ("mmap_flights.procitaj_mmap", mm.procitaj_mmap),
+            (f"procitaj_paralelno ({radnika} proc.)",
+             lambda p: par.procitaj_paralelno(p, radnika)),
+        ]
+        print(f"Učitavanje {args.flights} letova ({mib:.0f} MiB, {os.cpu_count()} jezgara)")
+        vremena = []
+        for ime, funkcija in merenja:
+            # Rezultat se odmah oslobađa: dve strukture ne staju zajedno u memoriju
+            _, trajanje = meri(funkcija, putanja)
+            gc.collect()
+            vremena.append(trajanje)
+            print(f"  {ime:32s} {trajanje:8.2f} s  {args.flights / trajanje / 1e6:6.2f} M letova/s"
+                  f"  {vremena[0] / trajanje:5.2f}x")
+
+
+def bench_compression(args):
+    oai = ucitaj_modul("OAI_flights.py")
+    # Nivo važi za common_flights koji koristi OAI_flights
+    oai.postavi_nivo_kompresije(args.level)
+
+    sufiksi = [("tekst", ""), ("gzip", ".gz")]
+    if importlib.util.find_spec("zstandard") is not None:
+        sufiksi.append(("zstd", ".zst"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        putanja = os.path.join(tmp, "flights.txt")
+        generisi_flights_txt(putanja, args.flights, seed=args.seed)
+        mib = os.path.getsize(putanja) / 2**20
+        for _, sufiks in sufiksi[1:]:
+            with open(putanja, encoding="utf-8") as ulaz, \
+                    oai.otvori_izlaz(putanja + sufiks) as izlaz:
+                izlaz.write(ulaz.read())
+
+        route_map, _ = oai.procitaj_flights_file(putanja)
+        direct = os.path.join(tmp, "flights_direct.txt")
+        oai.upisi_direct(route_map, direct)
+        mib_direct = os.path.getsize(direct) / 2**20
+
+        print(f"Kompresija ({args.flights} letova, flights.txt {mib:.0f} MiB, "
+              f"flights_direct.txt {mib_direct:.0f} MiB, nivo {args.level or 'podrazumevani'})")
+        for ime, sufiks in sufiksi:
+            ulaz = putanja + sufiks
+            _, citanje = meri(oai.procitaj_flights_file, ulaz)
+            gc.collect()
+            _, pisanje = meri(oai.upisi_direct, route_map, direct + sufiks)
+            odnos = os.path.getsize(ulaz) / os.path.getsize(putanja)
+            print(f"  {ime:6s} čitanje {mib / citanje:7.1f} MiB/s  "
+                  f"pisanje {mib_direct / pisanje:7.1f} MiB/s  veličina {odnos:6.1%}")
+
+
+def bench_all_pairs(args):
+    oai = ucitaj_modul("OAI_flights.py")
+    # Funkcije radnika se serijalizuju po imenu modula, pa se uvozi normalno
+    sys.path.insert(0, REPO_DIR)
+    allpairs = importlib.import_module("allpairs_flights")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        putanja = os.path.join(tmp, "flights.txt")
+        generisi_flights_txt(putanja, args.flights, **parametri_generatora(args))
+        _, seg_map = oai.procitaj_flights_file(putanja)
+        susedi = oai.napravi_susede(seg_map)
+        gradovi = sorted(set(susedi[0]) | set(susedi[1]))
+
+        def svaki_par():
+            with open(os.path.join(tmp, "parovi.txt"), "w", encoding="utf-8") as out:
+                for dep in gradovi:
+                    for lan in gradovi:
+                        oai.pisi_indirect(seg_map, dep, lan, out, susedi)
+
+        _, petlja = meri(svaki_par)
+        mib = os.path.getsize(os.path.join(tmp, "parovi.txt")) / 2**20
+        print(f"Svi parovi ({args.flights} letova, {len(gradovi)} gradova, {mib:.0f} MiB rezultata)")
+        print(f"  pisi_indirect po paru       {petlja:8.2f} s")
+        for radnika in dict.fromkeys([1, args.workers or os.cpu_count() or 1]):
+            gc.collect()
+            parova, trajanje = meri(
+                allpairs.izracunaj_sve_parove, seg_map, os.path.join(tmp, "sviparovi"),
+                args.shards, radnika,
+            )
+            print(f"  po čvorištu, {radnika:2d} proces(a)  {trajanje:8.2f} s  "
+                  f"{petlja / trajanje:5.2f}x  ({parova} parova)")
+
+
+# ------------------------------------------------------------
+# Poređenje implementacija po veličini reda letenja
+# ------------------------------------------------------------
+
+IMPLEMENTACIJE = ("OAI", "G", "CC")
+
+
+def faze_implementacije(ime, dep, lan, direct, indirect):
+    """
+    Vraća (ucitaj, pisi_direct, pisi_indirect) za implementaciju ime,
+    u istom redosledu i sa istim pomoćnim strukturama kao njen main().
+    """
+    if ime == "OAI":
+        oai = ucitaj_modul("OAI_flights.py")
+        return (
+            oai.procitaj_flights_file,
+            lambda p: oai.upisi_direct(p[0], direct),
+            lambda p: oai.upisi_indirect(p[1], dep, lan, indirect),
+        )
+    if ime == "G":
+        g = ucitaj_modul("G_flights.py")
+        prikaz = g.napravi_kes_prikaza(g.prikaz_leta)
+        return (
+            g.ucitaj_letove,
+            lambda letovi: g.obradi_direktne_letove(letovi, prikaz, direct),
+            lambda letovi: g.obradi_indirektne_letove(letovi, dep, lan, indirect, prikaz=prikaz),
+        )
+    cc = ucitaj_modul("CC_Flights.py")
+    return (
+        cc.ucitaj_letove,
+        lambda letovi: cc.formiraj_direktne_letove(letovi, direct),
+        lambda letovi: cc.formiraj_indirektne_letove(letovi, f"{dep}->{lan}", indirect),
+    )
+
+
+def vrsni_rss_kib():
+    """Najveći RSS ovog procesa u KiB (Linux; na macOS ru_maxrss je u bajtovima)."""
+    import resource
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def bench_measure(args):
+    """Jedno merenje u zasebnom procesu, da vršni RSS pripada samo njemu."""
+    direct = os.path.join(args.out_dir, "flights_direct.txt")
+    indirect = os.path.join(args.out_dir, "flights_indirect.txt")
+    ucitaj, pisi_direct, pisi_indirect = faze_implementacije(
+        args.implementacija, args.dep, args.lan, direct, indirect
+    )
+    rss_pre = vrsni_rss_kib()
+
+    podaci, t_ucitaj = meri(ucitaj, args.putanja)
+    _, t_direct = meri(pisi_direct, podaci)
+    _, t_indirect = meri(pisi_indirect, podaci)
+
+    print(json.dumps({
+        "ucitavanje_s": round(t_ucitaj, 4),
+        "direct_s": round(t_direct, 4),
+        "indirect_s": round(t_indirect, 4),
+        "rss_pre_kib": rss_pre,
+        "vrsni_rss_kib": vrsni_rss_kib(),
+        "direct_bajtova": os.path.getsize(direct),
+        "indirect_bajtova": os.path.getsize(indirect),
+    }))
+
+
+def parametri_generatora(args):
+    """Parametri za generisi_redove iz opcija komandne linije."""
+    return {
+        "n_gradova": args.cities,
+        "n_aviokompanija": args.airlines,
+        "letova_po_liniji": args.per_route,
+        "n_cvorista": args.hubs,
+        "udeo_cvorista": args.hub_share,
+        "seed": args.seed,
+    }
+
+
+def bench_generate(args):
+    generisi_flights_txt(args.putanja, args.flights, **parametri_generatora(args))
+    print(f"{args.putanja}: {args.flights} letova, {os.path.getsize(args.putanja) / 2**20:.1f} MiB")
+
+
+def najgusci_upit(putanja, gradovi):
+    """
+    Par (dep, lan) iz gradovi sa najviše kombinacija redova dep->X i X->lan,
+    tj. upit sa najvećim indirektnim izlazom. Broje se samo redovi po rutama.
+    """
+    redova = {}
+    with open(putanja, encoding="utf-8") as f:
+        for red in f:
+            ruta = tuple(red.split("|", 2)[1].split("->"))
+            redova[ruta] = redova.get(ruta, 0) + 1
+    izlazni, ulazni = {}, {}
+    for (fr, to), n in redova.items():
+        izlazni.setdefault(fr, {})[to] = n
+        ulazni.setdefault(to, {})[fr] = n
+
+    def kombinacija(par):
+        dep, lan = par
+        a, b = izlazni.get(dep, {}), ulazni.get(lan, {})
+        return sum(a[x] * b[x] for x in a.keys() & b.keys() if x not in par)
+    return max(((d, c) for d in gradovi for c in gradovi if d != c), key=kombinacija)
+
+
+def bench_suite(args):
+    parametri = parametri_generatora(args)
+    rezultati = []
+
+    for letova in args.tiers:
+        with tempfile.TemporaryDirectory() as tmp:
+            putanja = os.path.join(tmp, "flights.txt")
+            generisi_flights_txt(putanja, letova, **parametri)
+            velicina = os.path.getsize(putanja)
+            # Upit između običnih gradova koji ima najviše veza (preko čvorišta)
+            dep, lan = najgusci_upit(
+                putanja, [ime_grada(i) for i in range(args.hubs, min(args.hubs + 20, args.cities))]
+            )
+            print(f"{letova} letova ({velicina / 2**20:.1f} MiB), upit {dep}->{lan}")
+
+            for ime in args.implementations:
+                izlaz = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "measure",
+                     ime, putanja, dep, lan, tmp],
+                    capture_output=True, text=True, check=True,
+                )
+                merenje = json.loads(izlaz.stdout)
+                merenje.update(implementacija=ime, letova=letova, ulaz_bajtova=velicina,
+                               upit=f"{dep}->{lan}")
+                rezultati.append(merenje)
+                print(f"  {ime:4s} učitavanje {merenje['ucitavanje_s']:8.3f} s  "
+                      f"direct {merenje['direct_s']:8.3f} s  "
+                      f"indirect {merenje['indirect_s']:8.3f} s  "
+                      f"RSS {merenje['vrsni_rss_kib'] / 1024:8.1f} MiB")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "vreme": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platforma": platform.platform(),
+            "procesora": os.cpu_count(),
+            "generator": parametri,
+            "rezultati": rezultati,
+        }, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"Rezultati: {args.output}")
+
+
+def dodaj_opcije_generatora(p):
+    p.add_argument("--cities", type=int, default=200, help="broj gradova")
+    p.add_argument("--airlines", type=int, default=40, help="broj aviokompanija")
+    p.add_argument("--per-route", type=int, default=8,
+                   help="letova po redu (jedna aviokompanija na jednoj ruti)")
+    p.add_argument("--hubs", type=int, default=0, help="broj čvorišta")
+    p.add_argument("--hub-share", type=float, default=0.0,
+                   help="udeo redova sa čvorištem na jednom kraju (0-1)")
+    p.add_argument("--seed", type=int, default=1)
+
+
+def lista_brojeva(tekst):
+    return [int(x) for x in tekst.split(",") if x]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarkovi za letove")
+    pod = parser.add_subparsers(dest="komanda", required=True)
+
+    p = pod.add_parser("cc-indirect", help="CC_Flights spajanje preko jednog čvorišta")
+    p.add_argument("--n", type=int, default=5000, help="broj letova po segmentu")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(funkcija=bench_cc_indirect)
+
+    p = pod.add_parser("memory", help="memorija dict/tuple struktura naspram kolonske")
+    p.add_argument("--flights", type=int, default=200000)
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(funkcija=bench_memory)
+
+    p = pod.add_parser("parse", help="procitaj_flights_file naspram mmap i paralelnog parsera")
+    p.add_argument("--flights", type=int, default=10_000_000)
+    p.add_argument("--workers", type=int, default=0,
+                   help="procesa za procitaj_paralelno (0 = broj jezgara; više od "
+                        "broja jezgara se ne pokreće)")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(funkcija=bench_parse)
+
+    p = pod.add_parser("compression", help="čitanje i pisanje bez kompresije, gzip i zstd")
+    p.add_argument("--flights", type=int, default=1_000_000)
+    p.add_argument("--level", type=int, help="nivo kompresije (podrazumevano: nivo kodeka)")
+    p.add_argument("--seed", type=int, default=1)
+    p.set_defaults(funkcija=bench_compression)
+
+    p = pod.add_parser("all-pairs", help="upisi_indirect za svaki par naspram "
+                                         "računanja po čvorištu (allpairs_flights)")
+    p.add_argument("--flights", type=int, default=100_000)
+    p.add_argument("--shards", type=int, default=64)
+    p.add_argument("--workers", type=int, default=0, help="broj procesa (0 = broj jezgara)")
+    dodaj_opcije_generatora(p)
+    p.set_defaults(cities=100, funkcija=bench_all_pairs)
+
+    p = pod.add_parser("generate", help="deterministički sintetički flights.txt")
+    p.add_argument("putanja")
+    p.add_argument("--flights", type=int, default=1_000_000)
+    dodaj_opcije_generatora(p)
+    p.set_defaults(funkcija=bench_generate)
+
+    p = pod.add_parser("suite", help="učitavanje, direct i indirect za sve implementacije "
+                                     "po veličinama; rezultati u JSON")
+    p.add_argument("--tiers", type=lista_brojeva, default=[10_000, 100_000, 1_000_000],
+                   help="broj letova po nivou, odvojeno zarezima")
+    p.add_argument("--implementations", type=lambda t: t.split(","),
+                   default=list(IMPLEMENTACIJE), help="npr. OAI,G,CC")
+    p.add_argument("--output", default="bench_results.json")
+    dodaj_opcije_generatora(p)
+    p.set_defaults(hubs=5, hub_share=0.5, funkcija=bench_suite)
+
+    p = pod.add_parser("measure", help="jedno merenje (poziva ga suite)")
+    p.add_argument("implementacija", choices=IMPLEMENTACIJE)
+    p.add_argument("putanja")
+    p.add_argument("dep")
+    p.add_argument("lan")
+    p.add_argument("out_dir")
+    p.set_defaults(funkcija=bench_measure)
+
+    args = parser.parse_args(argv)
+    args.funkcija(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+import math
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+
+from OAI_flights import parsiraj_liniju
+from common_flights import brojac, otvori_izlaz, otvori_ulaz, pisi_delove, ucitaj_sa_kesom
+
+try:
+    import numpy as np
+except ImportError:  # numpy je opcioni, potreban samo za upisi_indirect_numpy
+    np = None
+
+# ------------------------------------------------------------
+# Kolonski (columnar) red letenja.
+#
+# Umesto jednog tuple-a po letu, svaka osobina leta je jedan
+# niz (array) celih brojeva, a imena aviokompanija, gradova i
+# tekstovi vremena su internovani u tabele (id -> string).
+#
+# Struktura je običan rečnik:
+#
+#   aviokompanije, gradovi, vremena   tabele stringova
+#   indeks_gradova  ime grada -> id
+#   rute        lista (dep_id, lan_id), sortirana po imenima gradova
+#   indeks_ruta (dep_id, lan_id) -> redni broj rute
+#   ofseti      array('q'), letovi rute r su [ofseti[r], ofseti[r+1])
+#   aviokompanija, polazak_str, dolazak_str    array('i') id-jevi
+#   polazak, dolazak   array('h') minuti od početka dana
+#   cena               array('q') cena u centima (NEGATIVNA_NULA
+#                      za cenu koja se prikazuje kao -0.00)
+#
+# Unutar rute letovi su poređani po flight_sort_key (polazak,
+# trajanje, aviokompanija), isto kao seg_map u OAI_flights.
+# Zato upisi_direct_kolone i upisi_indirect_kolone daju izlaz
+# identičan upisi_direct i upisi_indirect.
+#
+# Red letenja koji se ne može tačno predstaviti kolonama (minuti
+# van opsega 'h', cena inf/nan ili van opsega 'q') procitaj_kolone
+# ne učitava (vraća None), a OAI_flights tada koristi tuple-ove.
+# ------------------------------------------------------------
+
+KOLONE = {
+    "aviokompanija": "i",
+    "polazak": "h",
+    "dolazak": "h",
+    "polazak_str": "i",
+    "dolazak_str": "i",
+    "cena": "q",
+}
+
+# Opseg minuta koji staje u 'h' i najveći iznos u centima koji staje u 'q';
+# najmanja vrednost 'q' je oznaka za -0.00, pa je nijedna cena ne dobija
+MIN_MINUT, MAX_MINUT = -(1 << 15), (1 << 15) - 1
+MAX_CENTI = (1 << 63) - 1
+NEGATIVNA_NULA = -(1 << 63)
+
+
+# ------------------------------------------------------------
+# Funkcija: cena_u_cente
+# Cena se zaokružuje tačno kao format "{:.2f}", pa je prikaz
+# iz centi bajt-identičan prikazu iz float-a. Vraća None za cenu
+# koja se ne može predstaviti (inf, nan, van opsega 'q').
+# ------------------------------------------------------------
+def cena_u_cente(price):
+    if not math.isfinite(price):
+        return None
+    s = f"{price:.2f}"
+    negativna = s.startswith("-")
+    ceo, dec = s.lstrip("-").split(".")
+    cente = int(ceo) * 100 + int(dec)
+    if cente > MAX_CENTI:
+        return None
+    if negativna:
+        return -cente if cente else NEGATIVNA_NULA
+    return cente
+
+
+# ------------------------------------------------------------
+# Funkcija: cente_u_tekst
+# Obrnuto od cena_u_cente: 15000 -> "150.00"
+# ------------------------------------------------------------
+def cente_u_tekst(cente):
+    if cente == NEGATIVNA_NULA:
+        return "-0.00"
+    znak = "-" if cente < 0 else ""
+    cente = abs(cente)
+    return f"{znak}{cente // 100}.{cente % 100:02d}"
+
+
+# ------------------------------------------------------------
+# Funkcija: interniraj
+# Vraća id stringa u tabeli, dodajući ga ako ga nema
+# ------------------------------------------------------------
+def interniraj(tabela, indeks, s):
+    i = indeks.get(s)
+    if i is None:
+        i = len(tabela)
+        tabela.append(s)
+        indeks[s] = i
+    return i
+
+
+# ------------------------------------------------------------
+# Funkcija: procitaj_kolone
+# Čita flights.txt (ista pravila kao procitaj_flights_file)
+# direktno u kolonsku strukturu; None ako neki let ne može da
+# se predstavi kolonama (greške formata se i dalje prosleđuju)
+# ------------------------------------------------------------
+def procitaj_kolone(path):
+    aviokompanije, gradovi, vremena = [], [], []
+    idx_avio, idx_grad, idx_vreme = {}, {}, {}
+    rute_po_redu, idx_rute = [], {}
+
+    # Kolone u redosledu iz datoteke
+    ruta = array("i")
+    sirove = {ime: array(tip) for ime, tip in KOLONE.items()}
+
+    redova = 0
+    with otvori_ulaz(path) as fh:
+        for redova, line in enumerate(fh, 1):
+            for f in parsiraj_liniju(line):
+                cente = cena_u_cente(f[7])
+                if cente is None or not (MIN_MINUT <= f[3] <= MAX_MINUT
+                                         and MIN_MINUT <= f[4] <= MAX_MINUT):
+                    return None
+                dep_id = interniraj(gradovi, idx_grad, f[1])
+                lan_id = interniraj(gradovi, idx_grad, f[2])
+                ruta.append(interniraj(rute_po_redu, idx_rute, (dep_id, lan_id)))
+                sirove["aviokompanija"].append(interniraj(aviokompanije, idx_avio, f[0]))
+                sirove["polazak"].append(f[3])
+                sirove["dolazak"].append(f[4])
+                sirove["polazak_str"].append(interniraj(vremena, idx_vreme, f[5]))
+                sirove["dolazak_str"].append(interniraj(vremena, idx_vreme, f[6]))
+                sirove["cena"].append(cente)
+    brojac("redova", redova)
+
+    # Rute po imenima gradova, aviokompanije po imenu (za flight_sort_key)
+    redosled_ruta = sorted(
+        range(len(rute_po_redu)),
+        key=lambda r: (gradovi[rute_po_redu[r][0]], gradovi[rute_po_redu[r][1]])
+    )
+    rang_rute = [0] * len(rute_po_redu)
+    for rang, r in enumerate(redosled_ruta):
+        rang_rute[r] = rang
+    rang_avio = [0] * len(aviokompanije)
+    for rang, a in enumerate(sorted(range(len(aviokompanije)), key=aviokompanije.__getitem__)):
+        rang_avio[a] = rang
+
+    # Jedan ceo broj kao ključ: (ruta, polazak, trajanje, aviokompanija);
+    # sorted je stabilan, pa jednaki letovi zadržavaju redosled iz datoteke
+    bitova_avio = max(1, len(aviokompanije).bit_length())
+    pol, dol, avio = sirove["polazak"], sirove["dolazak"], sirove["aviokompanija"]
+    kljucevi = [
+        (((rang_rute[ruta[i]] << 16 | (pol[i] + 32768)) << 17
+          | (dol[i] - pol[i] + 65536)) << bitova_avio) | rang_avio[avio[i]]
+        for i in range(len(ruta))
+    ]
+    permutacija = sorted(range(len(ruta)), key=kljucevi.__getitem__)
+    del kljucevi
+
+    kol = {
+        "aviokompanije": aviokompanije,
+        "gradovi": gradovi,
+        "vremena": vremena,
+        "rute": [rute_po_redu[r] for r in redosled_ruta],
+    }
+    kol["indeks_gradova"] = idx_grad
+    kol["indeks_ruta"] = {rk: r for r, rk in enumerate(kol["rute"])}
+    for ime, tip in KOLONE.items():
+        kolona = sirove[ime]
+        kol[ime] = array(tip, (kolona[i] for i in permutacija))
+
+    ofseti = array("q", [0] * (len(redosled_ruta) + 1))
+    for i in ruta:
+        ofseti[rang_rute[i] + 1] += 1
+    for r in range(len(redosled_ruta)):
+        ofseti[r + 1] += ofseti[r]
+    kol["ofseti"] = ofseti
+
+    return kol
+
+
+# ------------------------------------------------------------
+# Funkcija: u_kes / iz_kesa
+# Nizovi se za binarni keš (marshal) pretvaraju u bajtove
+# ------------------------------------------------------------
+def u_kes(kol):
+    podaci = dict(kol)
+    podaci["indeks_gradova"] = None
+    podaci["indeks_ruta"] = None
+    for ime in list(KOLONE) + ["ofseti"]:
+        podaci[ime] = (kol[ime].typecode, kol[ime].tobytes())
+    return podaci
+
+
+def iz_kesa(podaci):
+    kol = dict(podaci)
+    for ime in list(KOLONE) + ["ofseti"]:
+        tip, bajtovi = podaci[ime]
+        niz = array(tip)
+        niz.frombytes(bajtovi)
+        kol[ime] = niz
+    kol["indeks_gradova"] = {g: i for i, g in enumerate(kol["gradovi"])}
+    kol["indeks_ruta"] = {tuple(rk): r for r, rk in enumerate(kol["rute"])}
+    return kol
+
+
+# ------------------------------------------------------------
+# Funkcija: tekst_leta
+# "hh:mm-hh:mm,cena" za let sa indeksom i
+# ------------------------------------------------------------
+def tekst_leta(kol, i):
+    vremena = kol["vremena"]
+    return (
+        f"{vremena[kol['polazak_str'][i]]}-{vremena[kol['dolazak_str'][i]]},"
+        f"{cente_u_tekst(kol['cena'][i])}"
+    )
+
+
+# ------------------------------------------------------------
+# Funkcija: redovi_direct_kolone
+# Redovi flights_direct.txt (kao OAI_flights.redovi_direct_bloka
+# za sve rute redom)
+# ------------------------------------------------------------
+def redovi_direct_kolone(kol):
+    gradovi = kol["gradovi"]
+    aviokompanije = kol["aviokompanije"]
+    avio = kol["aviokompanija"]
+    ofseti = kol["ofseti"]
+
+    for r, (dep_id, lan_id) in enumerate(kol["rute"]):
+        yield f"{gradovi[dep_id]}->{gradovi[lan_id]}\n"
+
+        # Grupisanje po aviokompaniji čuva redosled unutar rute
+        po_avio = {}
+        for i in range(ofseti[r], ofseti[r + 1]):
+            po_avio.setdefault(avio[i], []).append(i)
+
+        for a in sorted(po_avio, key=aviokompanije.__getitem__):
+            flights_str = ";".join(tekst_leta(kol, i) for i in po_avio[a])
+            yield f"{aviokompanije[a]}|{flights_str}\n"
+
+
+# ------------------------------------------------------------
+# Funkcija: upisi_direct_kolone
+# Isti izlaz kao OAI_flights.upisi_direct
+# ------------------------------------------------------------
+def upisi_direct_kolone(kol, out_path):
+    with otvori_izlaz(out_path) as out:
+        pisi_delove(out, redovi_direct_kolone(kol))
+
+
+# ------------------------------------------------------------
+# Funkcija: medjugradovi_kolone
+# Gradovi preko kojih postoji ruta dep->med i med->lan,
+# sortirani po imenu
+# ------------------------------------------------------------
+def medjugradovi_kolone(kol, dep_id, lan_id, susedi=None):
+    if susedi is None:
+        dep_to = {lan for (fr, lan) in kol["rute"] if fr == dep_id}
+        to_lan = {fr for (fr, to) in kol["rute"] if to == lan_id}
+    else:
+        dep_to = susedi[0].get(dep_id, set())
+        to_lan = susedi[1].get(lan_id, set())
+    return sorted(dep_to & to_lan, key=kol["gradovi"].__getitem__)
+
+
+# ------------------------------------------------------------
+# Funkcija: susedi_kolone
+# Izlazni i ulazni susedi po id-u grada (kao OAI napravi_susede)
+# ------------------------------------------------------------
+def susedi_kolone(kol):
+    izlazni = {}
+    ulazni = {}
+    for fr, to in kol["rute"]:
+        izlazni.setdefault(fr, set()).add(to)
+        ulazni.setdefault(to, set()).add(fr)
+    return izlazni, ulazni
+
+
+# ------------------------------------------------------------
+# Funkcija: redovi_indirect_kolone
+# Delovi flights_indirect.txt za dep->lan (kao
+# OAI_flights.redovi_indirect)
+# ------------------------------------------------------------
+def redovi_indirect_kolone(kol, dep, lan, susedi=None):
+    gradovi = kol["gradovi"]
+    aviokompanije = kol["aviokompanije"]
+    avio = kol["aviokompanija"]
+    polazak = kol["polazak"]
+    dolazak = kol["dolazak"]
+    ofseti = kol["ofseti"]
+    indeks_ruta = kol["indeks_ruta"]
+
+    # Grad koji se ne pojavljuje u redu letenja nema ni veze
+    dep_id = kol["indeks_gradova"].get(dep)
+    lan_id = kol["indeks_gradova"].get(lan)
+    if dep_id is None or lan_id is None:
+        return
+
+    for med_id in medjugradovi_kolone(kol, dep_id, lan_id, susedi):
+        med = gradovi[med_id]
+        ra = indeks_ruta[(dep_id, med_id)]
+        rb = indeks_ruta[(med_id, lan_id)]
+        a0, a1 = ofseti[ra], ofseti[ra + 1]
+        b0, b1 = ofseti[rb], ofseti[rb + 1]
+
+        yield f"{dep}->{med}->{lan}\n"
+
+        # Vremena polaska drugog segmenta su već sortirana; tekst drugog
+        # segmenta se spaja jednom, a sufiks je isečak od ofseta
+        b_dep_times = polazak[b0:b1]
+        b_linije = [
+            f"{med}->{lan}|{aviokompanije[avio[j]]}|{tekst_leta(kol, j)}\n"
+            for j in range(b0, b1)
+        ]
+        b_tekst = "".join(b_linije)
+        b_ofseti = list(accumulate(map(len, b_linije), initial=0))
+
+        parova = 0
+        for i in range(a0, a1):
+            yield f"{dep}->{med}|{aviokompanije[avio[i]]}|{tekst_leta(kol, i)}\n"
+            idx = bisect_left(b_dep_times, dolazak[i])
+            parova += len(b_linije) - idx
+            yield b_tekst[b_ofseti[idx]:]
+
+        brojac("medjugradova")
+        brojac("parova", parova)
+
+
+# ------------------------------------------------------------
+# Funkcija: upisi_indirect_kolone
+# Isti izlaz kao OAI_flights.upisi_indirect
+# ------------------------------------------------------------
+def upisi_indirect_kolone(kol, dep, lan, out_path, susedi=None):
+    with otvori_izlaz(out_path) as out:
+        pisi_delove(out, redovi_indirect_kolone(kol, dep, lan, susedi))
+
+
+# ------------------------------------------------------------
+# Funkcija: upisi_indirect_numpy
+# Vektorizovana varijanta upisi_indirect_kolone (isti izlaz).
+#
+# Za svaki međugrad se početak validnog sufiksa drugog segmenta
+# računa za sve letove prvog segmenta jednim searchsorted pozivom.
+# Redovi drugog segmenta se spajaju u jedan tekst, pa je sufiks
+# za svaki prvi let samo isečak tog teksta (po ofsetima).
+# ------------------------------------------------------------
+def upisi_indirect_numpy(kol, dep, lan, out_path, susedi=None):
+    if np is None:
+        raise ImportError("upisi_indirect_numpy zahteva paket numpy")
+
+    gradovi = kol["gradovi"]
+    aviokompanije = kol["aviokompanije"]
+    avio = kol["aviokompanija"]
+    ofseti = kol["ofseti"]
+    indeks_ruta = kol["indeks_ruta"]
+
+    # Pogled na postojeće nizove, bez kopiranja
+    polazak = np.frombuffer(kol["polazak"], dtype=np.int16)
+    dolazak = np.frombuffer(kol["dolazak"], dtype=np.int16)
+
+    with otvori_izlaz(out_path) as out:
+        dep_id = kol["indeks_gradova"].get(dep)
+        lan_id = kol["indeks_gradova"].get(lan)
+        if dep_id is None or lan_id is None:
+            return
+
+        for med_id in medjugradovi_kolone(kol, dep_id, lan_id, susedi):
+            med = gradovi[med_id]
+            ra = indeks_ruta[(dep_id, med_id)]
+            rb = indeks_ruta[(med_id, lan_id)]
+            a0, a1 = ofseti[ra], ofseti[ra + 1]
+            b0, b1 = ofseti[rb], ofseti[rb + 1]
+
+            out.write(f"{dep}->{med}->{lan}\n")
+
+            # Početak sufiksa za sve letove prvog segmenta odjednom
+            pocetci = np.searchsorted(polazak[b0:b1], dolazak[a0:a1], side="left")
+
+            b_linije = [
+                f"{med}->{lan}|{aviokompanije[avio[j]]}|{tekst_leta(kol, j)}\n"
+                for j in range(b0, b1)
+            ]
+            b_tekst = "".join(b_linije)
+            b_ofseti = np.zeros(len(b_linije) + 1, dtype=np.int64)
+            np.cumsum([len(x) for x in b_linije], out=b_ofseti[1:])
+            pocetci_teksta = b_ofseti[pocetci].tolist()
+
+            # Delovi se pišu u ograničenim paketima (pisi_delove), pa gust
+            # međugrad ne formira ceo izlaz u memoriji
+            pisi_delove(out, _delovi_prvog_segmenta(
+                kol, dep, med, a0, a1, b_tekst, pocetci_teksta
+            ))
+
+            brojac("medjugradova")
+            brojac("parova", len(b_linije) * (a1 - a0) - int(pocetci.sum()))
+
+
+# ------------------------------------------------------------
+# Funkcija: _delovi_prvog_segmenta
+# Red svakog leta prvog segmenta a0..a1 i isečak teksta drugog
+# segmenta od njegovog prvog validnog leta
+# ------------------------------------------------------------
+def _delovi_prvog_segmenta(kol, dep, med, a0, a1, b_tekst, pocetci_teksta):
+    aviokompanije = kol["aviokompanije"]
+    avio = kol["aviokompanija"]
+    for i in range(a0, a1):
+        yield f"{dep}->{med}|{aviokompanije[avio[i]]}|{tekst_leta(kol, i)}\n"
+        yield b_tekst[pocetci_teksta[i - a0]:]
+
+
+# ------------------------------------------------------------
+# Funkcija: ucitaj_kolone_sa_kesom
+# procitaj_kolone preko binarnog sidecar keša (flights.txt.kol.idx).
+# I red letenja koji se ne može predstaviti kolonama se pamti u
+# kešu (kao False), pa se sledeći put odmah vraća None.
+# ------------------------------------------------------------
+def ucitaj_kolone_sa_kesom(path):
+    def ucitaj(p):
+        kol = procitaj_kolone(p)
+        return False if kol is None else u_kes(kol)
+
+    podaci = ucitaj_sa_kesom(path, ucitaj, "kol")
+    return None if podaci is False else iz_kesa(podaci)
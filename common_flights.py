@@ -0,0 +1,662 @@
+"""
+Zajedničke pomoćne funkcije za CC_Flights.py, G_flights.py i OAI_flights.py.
+
+Svaka implementacija zadržava sopstveni parser i format izlaza; ovde je
+samo infrastruktura koja je ista za sve tri (keš parsiranog reda letenja,
+keš rezultata upita, čitanje upita u batch režimu, baferisan upis izlaznih datoteka, kompresovan
+ulaz i izlaz, merenje faza i brojači, istovremeno pisanje izlaza).
+"""
+import contextlib
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import marshal
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # nema ga na Windows-u; vršna memorija se tada ne meri
+    resource = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard je opcioni, potreban samo za .zst
+    zstandard = None
+
+# Zaglavlje sidecar datoteke; menja se kad god se promeni format keša
+MAGIC = b"FLTIDX1\n"
+VERZIJA_KESA = 3
+
+# Keš rezultata upita: verzija ključa i podrazumevana ukupna veličina;
+# kad se pređe, keš se čisti do DONJI_PRAG_KESA te veličine
+VERZIJA_REZULTATA = 1
+MAX_BAJTOVA_REZULTATA = 256 << 20
+DONJI_PRAG_KESA = 0.9
+
+# Bafer izlaznih datoteka i broj delova teksta koji se spajaju u jedan write
+VELICINA_BAFERA = 1 << 20
+DELOVA_PO_UPISU = 4096
+
+# Kompresija: kodek -> (sufiks datoteke, početni bajtovi)
+KODECI = {
+    "gzip": (".gz", b"\x1f\x8b"),
+    "zstd": (".zst", b"\x28\xb5\x2f\xfd"),
+}
+
+# Nivo kompresije izlaza (None = podrazumevani nivo kodeka)
+NIVO_KOMPRESIJE = None
+
+# Metrike tekućeg pokretanja (None = merenje isključeno) i funkcije koje
+# dobijaju gotove metrike (dodaj_sink)
+METRIKE = None
+SINKOVI = []
+
+# Vršne alokacije otvorenih faza, spolja ka unutra (faza, uz tracemalloc)
+_VRHOVI_FAZA = []
+
+# Procena ukupne veličine keša rezultata po direktorijumu (_zabelezi_upis)
+_VELICINA_KESA = {}
+
+# Umask procesa; čita se jednom pri uvozu jer ga os.umask menja za ceo
+# proces, a datoteke se mogu pisati i iz više niti (--concurrent thread)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def putanja_kesa(putanja, oznaka):
+    """Vraća putanju sidecar keša (npr. flights.txt.oai.idx) za datu implementaciju."""
+    return f"{putanja}.{oznaka}.idx"
+
+
+def hes_datoteke(putanja, velicina_bloka=1 << 20):
+    """Računa heš sadržaja datoteke čitanjem u blokovima."""
+    h = hashlib.blake2b(digest_size=20)
+    with open(putanja, "rb") as f:
+        while True:
+            blok = f.read(velicina_bloka)
+            if not blok:
+                break
+            h.update(blok)
+    return h.hexdigest()
+
+
+def _kljuc_kesa(putanja, oznaka, st, hes):
+    """Ključ po kome se proverava da li keš odgovara ulaznoj datoteci."""
+    return {
+        "verzija": VERZIJA_KESA,
+        "python": sys.version_info[:2],
+        "oznaka": oznaka,
+        "putanja": os.path.abspath(putanja),
+        "velicina": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "hes": hes,
+    }
+
+
+def procitaj_kes(putanja_idx, kljuc):
+    """
+    Učitava podatke iz keša ako mu se zaglavlje poklapa sa ključem.
+    Vraća None za nepostojeći, zastareo ili oštećen keš.
+    """
+    try:
+        with open(putanja_idx, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            zaglavlje = marshal.load(f)
+            if zaglavlje != kljuc:
+                return None
+            return marshal.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # Skraćen ili izmenjen keš tretiramo kao da ne postoji
+        return None
+
+
+def dozvole_nove_datoteke(putanja):
+    """
+    Postavlja dozvole kakve bi datoteka dobila sa open() (0666 bez umask-a).
+    mkstemp pravi privremenu datoteku sa 0600, a ona posle os.replace
+    postaje konačna datoteka.
+    """
+    os.chmod(putanja, 0o666 & ~_UMASK)
+
+
+def upisi_kes(putanja_idx, kljuc, podaci):
+    """
+    Atomski upisuje keš (privremena datoteka + os.replace).
+    Neuspeh upisa (npr. direktorijum samo za čitanje) se tiho ignoriše.
+    """
+    direktorijum = os.path.dirname(os.path.abspath(putanja_idx))
+    try:
+        fd, privremena = tempfile.mkstemp(dir=direktorijum, suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            marshal.dump(kljuc, f)
+            marshal.dump(podaci, f)
+        dozvole_nove_datoteke(privremena)
+        os.replace(privremena, putanja_idx)
+    except Exception:
+        try:
+            os.unlink(privremena)
+        except OSError:
+            pass
+
+
+def ucitaj_sa_kesom(putanja, ucitaj, oznaka):
+    """
+    Vraća rezultat ucitaj(putanja), koristeći binarni sidecar keš.
+
+    Keš je vezan za putanju, veličinu, mtime i heš sadržaja datoteke;
+    zastareo ili oštećen keš se automatski ponovo gradi. Greške parsiranja
+    iz ucitaj() se prosleđuju pozivaocu kao i ranije, a keš se tada ne piše.
+    """
+    # os.stat podiže FileNotFoundError ako datoteka ne postoji (DAT_GRESKA)
+    st = os.stat(putanja)
+    zabelezi_ulaz(putanja)
+    hes = hes_datoteke(putanja)
+    kljuc = _kljuc_kesa(putanja, oznaka, st, hes)
+    putanja_idx = putanja_kesa(putanja, oznaka)
+
+    podaci = procitaj_kes(putanja_idx, kljuc)
+    if podaci is not None:
+        brojac("kes_pogodaka")
+        return podaci
+
+    brojac("kes_promasaja")
+    podaci = ucitaj(putanja)
+
+    # Ako je datoteka menjana tokom parsiranja, keš bi bio nekonzistentan
+    st_posle = os.stat(putanja)
+    if (st_posle.st_size, st_posle.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+        upisi_kes(putanja_idx, kljuc, podaci)
+    return podaci
+
+
+def kljuc_rezultata(hes, oznaka, parametri):
+    """
+    Ključ rezultata u kešu rezultata: heš sadržaja reda letenja, oznaka
+    implementacije i parametri upita (vrednost koja se može upisati u JSON).
+    """
+    opis = json.dumps([VERZIJA_REZULTATA, oznaka, hes, parametri], ensure_ascii=False)
+    return hashlib.blake2b(opis.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def _putanja_u_kesu(kes_dir, kljuc):
+    return os.path.join(kes_dir, kljuc + ".txt")
+
+
+def postoji_rezultat(kes_dir, kljuc):
+    """Da li je rezultat sa ključem trenutno u kešu rezultata."""
+    return os.path.exists(_putanja_u_kesu(kes_dir, kljuc))
+
+
+def procitaj_rezultat(kes_dir, kljuc, out_path):
+    """
+    Ako je rezultat u kešu, prepisuje ga bajt po bajt u out_path (kompresuje
+    ga prema sufiksu) i vraća True. Pogodak osvežava vreme izmene datoteke,
+    po kome se izbacuju najdavnije korišćeni rezultati.
+    """
+    putanja = _putanja_u_kesu(kes_dir, kljuc)
+    try:
+        ulaz = open(putanja, "rb")
+    except FileNotFoundError:
+        return False
+    with ulaz, otvori_izlaz_binarno(out_path) as izlaz:
+        shutil.copyfileobj(ulaz, izlaz, VELICINA_BAFERA)
+    try:
+        os.utime(putanja)
+    except OSError:
+        # Drugi proces ga je u međuvremenu izbacio; prepisan sadržaj važi
+        pass
+    return True
+
+
+def ocisti_kes_rezultata(kes_dir, max_bajtova, cilj=None):
+    """
+    Ako je ukupna veličina keša veća od max_bajtova, briše najdavnije
+    korišćene rezultate (najstarije vreme izmene) dok ne bude najviše cilj
+    (podrazumevano max_bajtova). Datoteke koje je drugi proces već obrisao
+    se preskaču. Vraća ukupnu veličinu posle čišćenja.
+    """
+    cilj = max_bajtova if cilj is None else cilj
+    zapisi = []
+    with os.scandir(kes_dir) as stavke:
+        for stavka in stavke:
+            # Privremene datoteke (.*.tmp) drugih procesa se ne diraju
+            if stavka.name.startswith(".") or not stavka.name.endswith(".txt"):
+                continue
+            try:
+                st = stavka.stat()
+            except FileNotFoundError:
+                continue
+            zapisi.append((st.st_mtime_ns, st.st_size, stavka.path))
+
+    ukupno = sum(velicina for _, velicina, _ in zapisi)
+    if ukupno <= max_bajtova:
+        return ukupno
+    for _, velicina, putanja in sorted(zapisi):
+        if ukupno <= cilj:
+            break
+        try:
+            os.unlink(putanja)
+            brojac("kes_rezultata_izbacenih")
+        except FileNotFoundError:
+            pass
+        ukupno -= velicina
+    return ukupno
+
+
+def _zabelezi_upis(kes_dir, velicina, max_bajtova):
+    """
+    Dodaje velicina tekućoj proceni veličine keša i čisti keš tek kada
+    procena pređe max_bajtova, i to do DONJI_PRAG_KESA * max_bajtova, pa
+    se direktorijum ne pregleda posle svakog upisa. Procena se prvi put
+    (i posle svakog čišćenja) dobija pregledom direktorijuma; upise drugih
+    procesa vidi tek sledeći pregled.
+    """
+    kljuc = os.path.abspath(kes_dir)
+    ukupno = _VELICINA_KESA.get(kljuc)
+    if ukupno is not None:
+        ukupno += velicina
+    if ukupno is None or ukupno > max_bajtova:
+        ukupno = ocisti_kes_rezultata(kes_dir, max_bajtova, int(max_bajtova * DONJI_PRAG_KESA))
+    _VELICINA_KESA[kljuc] = ukupno
+
+
+def upisi_sa_kesom(kes_dir, kljuc, out_path, izracunaj, max_bajtova=MAX_BAJTOVA_REZULTATA):
+    """
+    Piše rezultat sa ključem u out_path iz keša rezultata u kes_dir.
+
+    Ako ga nema, izracunaj(putanja) ga piše u privremenu datoteku u kes_dir,
+    koja se prepisuje u out_path i zatim atomski (os.replace) postaje zapis
+    keša, pa više procesa može istovremeno da čita i puni isti keš. Kada
+    ukupna veličina pređe max_bajtova, izbacuju se najdavnije korišćeni
+    rezultati (_zabelezi_upis); rezultat veći od max_bajtova se ne čuva. Ako se u kes_dir ne može
+    pisati, rezultat se računa direktno u out_path. Greška iz izracunaj()
+    se prosleđuje pozivaocu, a keš se tada ne menja.
+    """
+    if procitaj_rezultat(kes_dir, kljuc, out_path):
+        brojac("kes_rezultata_pogodaka")
+        return
+
+    brojac("kes_rezultata_promasaja")
+    try:
+        os.makedirs(kes_dir, exist_ok=True)
+        fd, privremena = tempfile.mkstemp(dir=kes_dir, prefix=".", suffix=".tmp")
+    except OSError:
+        izracunaj(out_path)
+        return
+    os.close(fd)
+    try:
+        izracunaj(privremena)
+        with open(privremena, "rb") as ulaz, otvori_izlaz_binarno(out_path) as izlaz:
+            shutil.copyfileobj(ulaz, izlaz, VELICINA_BAFERA)
+        velicina = os.path.getsize(privremena)
+        if velicina <= max_bajtova:
+            dozvole_nove_datoteke(privremena)
+            os.replace(privremena, _putanja_u_kesu(kes_dir, kljuc))
+            _zabelezi_upis(kes_dir, velicina, max_bajtova)
+    finally:
+        try:
+            os.unlink(privremena)
+        except FileNotFoundError:
+            pass
+
+
+def procitaj_parove(izvor):
+    """
+    Čita upite za batch režim: jedan par CITY1->CITY2 po redu.
+    izvor je putanja do datoteke ili "-" za standardni ulaz.
+    Prazni redovi se preskaču; redovi se vraćaju bez okolnih razmaka.
+    """
+    if izvor == "-":
+        linije = sys.stdin.read().splitlines()
+    else:
+        with open(izvor, "r", encoding="utf-8") as f:
+            linije = f.read().splitlines()
+    return [linija.strip() for linija in linije if linija.strip()]
+
+
+# Znakovi koji ne smeju u ime datoteke (razdvajači putanje, NUL) i sam
+# znak za izbegavanje; zapisuju se kao %XX
+_ZNAKOVI_IMENA = {znak: f"%{ord(znak):02X}" for znak in "%/\\\0"}
+
+
+def ime_za_datoteku(grad):
+    """
+    Ime grada bezbedno za ime datoteke: razdvajači putanje, NUL i % se
+    zapisuju kao %XX, pa rezultat ostaje u izlaznom direktorijumu, a
+    različiti gradovi daju različita imena. Uobičajena imena se ne menjaju.
+    """
+    return "".join(_ZNAKOVI_IMENA.get(znak, znak) for znak in grad)
+
+
+def putanja_rezultata(direktorijum, dep, lan, sufiks=""):
+    """Putanja datoteke sa indirektnim letovima za jedan par u batch režimu."""
+    return os.path.join(direktorijum, f"{ime_za_datoteku(dep)}->{ime_za_datoteku(lan)}.txt{sufiks}")
+
+
+def sufiks_kompresije(kodek):
+    """Sufiks izlaznih datoteka za kodek ("gzip", "zstd" ili None)."""
+    return KODECI[kodek][0] if kodek else ""
+
+
+def postavi_nivo_kompresije(nivo):
+    """Nivo kompresije za sve izlaze otvorene sa otvori_izlaz."""
+    global NIVO_KOMPRESIJE
+    NIVO_KOMPRESIJE = nivo
+
+
+def kodek_datoteke(putanja):
+    """Prepoznaje kompresovanu datoteku po početnim bajtovima; None za običan tekst."""
+    with open(putanja, "rb") as f:
+        pocetak = f.read(4)
+    for kodek, (_, magija) in KODECI.items():
+        if pocetak.startswith(magija):
+            return kodek
+    return None
+
+
+def kodek_po_sufiksu(putanja):
+    """Kodek izlazne datoteke prema sufiksu (.gz, .zst); None za običan tekst."""
+    for kodek, (sufiks, _) in KODECI.items():
+        if putanja.endswith(sufiks):
+            return kodek
+    return None
+
+
+def pronadji_ulaz(putanja):
+    """
+    Vraća putanju ulazne datoteke: putanja ako postoji, inače prva postojeća
+    kompresovana varijanta (flights.txt.gz, flights.txt.zst). Ako ne postoji
+    nijedna, vraća putanja, pa otvaranje javlja FileNotFoundError.
+    """
+    if os.path.exists(putanja):
+        return putanja
+    for sufiks, _ in KODECI.values():
+        if os.path.exists(putanja + sufiks):
+            return putanja + sufiks
+    return putanja
+
+
+def _zahtevaj_zstandard():
+    if zstandard is None:
+        raise ImportError("zstd kompresija zahteva paket zstandard")
+
+
+def otvori_ulaz_binarno(putanja):
+    """
+    Otvara ulaznu datoteku za čitanje bajtova; kompresovan sadržaj
+    (prepoznat po početnim bajtovima) se raspakuje tokom čitanja.
+    """
+    kodek = kodek_datoteke(putanja)
+    if kodek == "gzip":
+        return gzip.open(putanja, "rb")
+    if kodek == "zstd":
+        _zahtevaj_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(open(putanja, "rb"))
+    return open(putanja, "rb")
+
+
+def otvori_ulaz(putanja):
+    """
+    Otvara ulaznu tekstualnu datoteku (UTF-8) kao open(putanja, "r");
+    gzip i zstd sadržaj se raspakuje tokom čitanja, bez privremene datoteke.
+    Redovi se dele isto kao u tekstualnom režimu (i \r i \r\n).
+    """
+    if kodek_datoteke(putanja) is None:
+        return open(putanja, "r", encoding="utf-8")
+    return io.TextIOWrapper(
+        io.BufferedReader(otvori_ulaz_binarno(putanja), VELICINA_BAFERA), encoding="utf-8"
+    )
+
+
+def otvori_izlaz_binarno(putanja):
+    """
+    Otvara izlaznu datoteku za pisanje bajtova; za sufiks .gz ili .zst
+    bajtovi se kompresuju tokom pisanja (nivo: postavi_nivo_kompresije).
+    """
+    kodek = kodek_po_sufiksu(putanja)
+    if kodek == "gzip":
+        nivo = 6 if NIVO_KOMPRESIJE is None else NIVO_KOMPRESIJE
+        return gzip.open(putanja, "wb", compresslevel=nivo)
+    if kodek == "zstd":
+        _zahtevaj_zstandard()
+        nivo = 3 if NIVO_KOMPRESIJE is None else NIVO_KOMPRESIJE
+        return zstandard.ZstdCompressor(level=nivo).stream_writer(open(putanja, "wb"))
+    return open(putanja, "wb", buffering=VELICINA_BAFERA)
+
+
+def otvori_izlaz(putanja):
+    """
+    Otvara izlaznu tekstualnu datoteku (UTF-8) sa velikim baferom.
+    Za sufiks .gz ili .zst tekst se kompresuje tokom pisanja
+    (nivo: postavi_nivo_kompresije).
+    """
+    if kodek_po_sufiksu(putanja) is None:
+        return open(putanja, "w", encoding="utf-8", buffering=VELICINA_BAFERA)
+    return io.TextIOWrapper(
+        io.BufferedWriter(otvori_izlaz_binarno(putanja), VELICINA_BAFERA), encoding="utf-8"
+    )
+
+
+def pisi_delove(out, delovi, delova_po_upisu=DELOVA_PO_UPISU):
+    """
+    Upisuje niz već formatiranih delova teksta u tok out.
+    Delovi se spajaju u velike komade, pa je jedan write na hiljade redova
+    umesto jednog po redu.
+    """
+    paket = []
+    for deo in delovi:
+        paket.append(deo)
+        if len(paket) >= delova_po_upisu:
+            out.write("".join(paket))
+            paket.clear()
+    if paket:
+        out.write("".join(paket))
+
+
+def napravi_kes_prikaza(prikazi):
+    """
+    Vraća funkciju koja tekst prikazi(let) računa jednom po letu i pamti ga
+    po id(let), pa direktni i indirektni izlaz dele isti formatiran tekst.
+    Letovi moraju postojati dok se keš koristi (id se ne sme ponovo dodeliti).
+    """
+    kes = {}
+
+    def prikaz(let):
+        tekst = kes.get(id(let))
+        if tekst is None:
+            tekst = kes[id(let)] = prikazi(let)
+        return tekst
+    return prikaz
+
+
+def ukljuci_metrike(implementacija):
+    """Uključuje merenje faza i brojače za jedno pokretanje."""
+    global METRIKE
+    METRIKE = {"implementacija": implementacija, "faze": {}, "brojaci": {}}
+
+
+def metrike_ukljucene():
+    """Da li je merenje uključeno (za brojače koje nije besplatno izračunati)."""
+    return METRIKE is not None
+
+
+def vrsni_rss_kib():
+    """
+    Vršni RSS procesa u KiB (ru_maxrss): najveći od početka procesa, ne
+    samo tekuće faze. None gde resource ne postoji.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Na macOS-u je ru_maxrss u bajtovima
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+@contextlib.contextmanager
+def faza(ime):
+    """
+    Meri blok kao fazu ime: zidno i procesorsko vreme i vršni RSS procesa
+    na kraju faze (vrednost važi za ceo proces do tog trenutka; rast je
+    samo koliko je faza podigla taj vrh). Ako je tracemalloc uključen
+    (python -X tracemalloc), beleži se i vršna Python alokacija same faze.
+    Bez uključenog merenja ne radi ništa. Faza se beleži i kada blok baci
+    izuzetak.
+    """
+    if METRIKE is None:
+        yield
+        return
+    prati = tracemalloc.is_tracing()
+    if prati:
+        # Vrh spoljašnje faze do ovog trenutka se čuva pre resetovanja
+        if _VRHOVI_FAZA:
+            _VRHOVI_FAZA[-1] = max(_VRHOVI_FAZA[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        _VRHOVI_FAZA.append(0)
+    rss_pre = vrsni_rss_kib()
+    t0, c0 = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        rss = vrsni_rss_kib()
+        zapis = METRIKE["faze"][ime] = {
+            "zidno_s": round(time.perf_counter() - t0, 6),
+            "cpu_s": round(time.process_time() - c0, 6),
+            "vrsni_rss_procesa_kib": rss,
+            "rast_vrsnog_rss_procesa_kib": None if rss is None else rss - rss_pre,
+        }
+        if prati:
+            vrh = max(_VRHOVI_FAZA.pop(), tracemalloc.get_traced_memory()[1])
+            if _VRHOVI_FAZA:
+                _VRHOVI_FAZA[-1] = max(_VRHOVI_FAZA[-1], vrh)
+            zapis["vrsna_alokacija_kib"] = vrh // 1024
+
+
+def brojac(ime, n=1):
+    """Dodaje n brojaču ime; bez uključenog merenja ne radi ništa."""
+    if METRIKE is not None:
+        brojaci = METRIKE["brojaci"]
+        brojaci[ime] = brojaci.get(ime, 0) + n
+
+
+def zabelezi_ulaz(putanja):
+    """
+    Beleži ulaznu datoteku pokretanja. Ako je do kraja nijedna faza ne
+    parsira (pogodak keša), brojač redova se dobija u zavrsi_metrike,
+    čitanjem datoteke van merenih faza. Bez uključenog merenja ne radi ništa.
+    """
+    if METRIKE is not None:
+        METRIKE["ulaz"] = putanja
+
+
+def broj_redova(putanja):
+    """Broj redova datoteke (kao pri čitanju po redovima), čitanjem u blokovima."""
+    redova = 0
+    poslednji = b"\n"
+    with otvori_ulaz_binarno(putanja) as f:
+        while True:
+            blok = f.read(VELICINA_BAFERA)
+            if not blok:
+                break
+            redova += blok.count(b"\n")
+            poslednji = blok[-1:]
+    return redova + (poslednji != b"\n")
+
+
+def dodaj_sink(funkcija):
+    """Registruje funkciju koja na kraju pokretanja dobija rečnik metrika."""
+    SINKOVI.append(funkcija)
+
+
+def ucitaj_sink(opis):
+    """Vraća funkciju iz opisa "modul:funkcija" (opcija --metrics-sink)."""
+    modul, _, ime = opis.partition(":")
+    if not modul or not ime:
+        raise ValueError("sink se zadaje kao modul:funkcija")
+    return getattr(importlib.import_module(modul), ime)
+
+
+def zavrsi_metrike(odrediste=None):
+    """
+    Završava merenje: metrike se pišu kao JSON na stderr (odrediste "-")
+    ili u datoteku, a zatim se prosleđuju svim registrovanim sinkovima.
+    """
+    global METRIKE
+    metrike, METRIKE = METRIKE, None
+    if metrike is None:
+        return
+    ulaz = metrike.pop("ulaz", None)
+    if ulaz is not None and "redova" not in metrike["brojaci"]:
+        try:
+            metrike["brojaci"]["redova"] = broj_redova(ulaz)
+        except OSError:
+            pass
+    if odrediste == "-":
+        print(json.dumps(metrike, ensure_ascii=False), file=sys.stderr)
+    elif odrediste is not None:
+        with open(odrediste, "w", encoding="utf-8") as f:
+            json.dump(metrike, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+    for sink in SINKOVI:
+        sink(metrike)
+
+
+def _izvrsi_u_procesu(zadatak):
+    # Greška se javlja roditelju preko izlaznog koda, bez traceback-a na stderr
+    try:
+        zadatak()
+    except BaseException:
+        os._exit(1)
+
+
+def pokreni_uporedo(zadaci, nacin="thread"):
+    """
+    Izvršava funkcije bez argumenata istovremeno i vraća se kad se sve završe.
+
+    nacin "thread": niti; preklapaju se upis na disk i kompresija (oslobađaju
+    GIL), dok formatiranje teksta i dalje deli jedno jezgro.
+    nacin "process": svi zadaci osim poslednjeg se izvršavaju u fork-ovanim
+    procesima, koji vide već učitan red letenja bez kopiranja i serijalizacije,
+    pa se formatiranje izvršava na više jezgara. Poslednji zadatak se
+    izvršava u ovom procesu (njegovi brojači metrika ostaju). Gde fork ne
+    postoji, koriste se niti.
+
+    Izuzetak bilo kog zadatka se prosleđuje pozivaocu (iz procesa kao
+    RuntimeError), ali tek pošto se svi zadaci završe.
+    """
+    if nacin == "process" and "fork" in multiprocessing.get_all_start_methods():
+        # Nepražnjen bafer bi se u procesu deteta ispisao još jednom
+        sys.stdout.flush()
+        sys.stderr.flush()
+        kontekst = multiprocessing.get_context("fork")
+        procesi = [kontekst.Process(target=_izvrsi_u_procesu, args=(z,)) for z in zadaci[:-1]]
+        for p in procesi:
+            p.start()
+        try:
+            zadaci[-1]()
+        finally:
+            for p in procesi:
+                p.join()
+        if any(p.exitcode != 0 for p in procesi):
+            raise RuntimeError("zadatak u procesu deteta nije uspeo")
+        return
+
+    with ThreadPoolExecutor(max_workers=len(zadaci)) as pool:
+        buduci = [pool.submit(z) for z in zadaci]
+    for b in buduci:
+        b.result()
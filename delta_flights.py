@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+from OAI_flights import flight_sort_key, parsiraj_liniju, pisi_direct_blok, upisi_direct
+from common_flights import (
+    VERZIJA_KESA,
+    dozvole_nove_datoteke,
+    hes_datoteke,
+    kodek_po_sufiksu,
+    otvori_izlaz,
+    otvori_ulaz,
+    procitaj_kes,
+    putanja_kesa,
+    sufiks_kompresije,
+    upisi_kes,
+)
+
+# ------------------------------------------------------------
+# Inkrementalne izmene reda letenja (delta).
+#
+# Datoteka sa izmenama ima po jednu izmenu po redu, za grupu
+# letova jedne aviokompanije na jednoj ruti:
+#
+#   +AirSrbia|Beograd->Pariz|08:00-10:00,150.00;12:00-14:00,180.00
+#       dodaje letove (kao da je red dopisan na kraj flights.txt)
+#   =AirSrbia|Beograd->Pariz|09:00-11:00,160.00
+#       zamenjuje sve letove aviokompanije na ruti
+#   -AirSrbia|Beograd->Pariz
+#       uklanja sve letove aviokompanije na ruti
+#
+# Izmene se primenjuju redom na route_map/seg_map (učitane iz
+# flights.txt ili iz keša), a zatim se ponovo pišu samo zahvaćeni
+# blokovi flights_direct.txt i zahvaćeni indirektni rezultati.
+#
+# Stanje (izmenjen red letenja) se čuva u sidecar datoteci
+# flights.txt.oai-delta.idx, vezanoj za heš flights.txt, zajedno sa
+# lancem heševa primenjenih delta datoteka. Verzija stanja je heš
+# osnove i lanca; svaki izlaz se označava verzijom od koje je
+# napravljen (flights.txt.oai-delta.json), pa se samo izlazi prethodne
+# verzije ažuriraju delimično, a svi ostali se pišu iznova.
+# ------------------------------------------------------------
+
+OPERACIJE = "+=-"
+OZNAKA_STANJA = "oai-delta"
+
+
+# ------------------------------------------------------------
+# Funkcija: parsiraj_izmenu
+# Vraća (operacija, airline, dep, lan, letovi) ili None za prazan
+# red; neispravan red baca ValueError
+# ------------------------------------------------------------
+def parsiraj_izmenu(line):
+    line = line.strip()
+    if line == "":
+        return None
+
+    op, ostatak = line[0], line[1:]
+    if op not in OPERACIJE:
+        raise ValueError("Nepoznata operacija izmene")
+
+    if op == "-":
+        parts = ostatak.split("|")
+        if len(parts) != 2 or "->" not in parts[1]:
+            raise ValueError("Pogrešan format uklanjanja")
+        airline = parts[0].strip()
+        dep, lan = [x.strip() for x in parts[1].split("->", 1)]
+        if airline == "" or dep == "" or lan == "":
+            raise ValueError("Prazno polje u izmeni")
+        return op, airline, dep, lan, []
+
+    flights = parsiraj_liniju(ostatak)
+    if not flights:
+        raise ValueError("Izmena bez letova")
+    f = flights[0]
+    return op, f[0], f[1], f[2], flights
+
+
+# ------------------------------------------------------------
+# Funkcija: procitaj_izmene
+# Čita celu datoteku izmena; greška u bilo kom redu se javlja pre
+# nego što se išta promeni
+# ------------------------------------------------------------
+def procitaj_izmene(path):
+    izmene = []
+    with otvori_ulaz(path) as fh:
+        for line in fh:
+            izmena = parsiraj_izmenu(line)
+            if izmena is not None:
+                izmene.append(izmena)
+    return izmene
+
+
+# ------------------------------------------------------------
+# Funkcija: primeni_izmene
+# Menja route_map i seg_map na mestu i vraća skup promenjenih
+# ruta (dep, lan). Liste promenjenih ruta se ponovo sortiraju,
+# pa su iste kao posle ponovnog parsiranja izmenjenog flights.txt.
+# ------------------------------------------------------------
+def primeni_izmene(route_map, seg_map, izmene):
+    promenjene = set()
+    for op, airline, dep, lan, flights in izmene:
+        key = (dep, lan)
+        po_avio = route_map.setdefault(key, {})
+        if op == "+":
+            po_avio.setdefault(airline, []).extend(flights)
+        elif op == "=":
+            po_avio[airline] = list(flights)
+        else:
+            po_avio.pop(airline, None)
+        promenjene.add(key)
+
+    for key in promenjene:
+        po_avio = route_map[key]
+        if not po_avio:
+            del route_map[key]
+            seg_map.pop(key, None)
+            continue
+        for flights in po_avio.values():
+            flights.sort(key=flight_sort_key)
+        seg_map[key] = sorted(
+            (f for flights in po_avio.values() for f in flights), key=flight_sort_key
+        )
+
+    return promenjene
+
+
+# ------------------------------------------------------------
+# Funkcija: zahvacen_upit
+# Rezultat dep->lan sa jednim presedanjem zavisi samo od ruta
+# koje polaze iz dep ili stižu u lan
+# ------------------------------------------------------------
+def zahvacen_upit(dep, lan, promenjene):
+    return any(fr == dep or to == lan for fr, to in promenjene)
+
+
+# ------------------------------------------------------------
+# Funkcija: azuriraj_direct
+# Prepisuje postojeći flights_direct.txt tako da se ponovo pišu
+# samo blokovi promenjenih ruta (novi blokovi se umeću na svoje
+# mesto, uklonjene rute se izostavljaju). Ako datoteka ne postoji,
+# piše se cela. Zamena je atomična (os.replace).
+# ------------------------------------------------------------
+def azuriraj_direct(route_map, promenjene, out_path):
+    if not os.path.exists(out_path):
+        upisi_direct(route_map, out_path)
+        return
+
+    redom = sorted(promenjene)
+    i = 0
+    preskoci = False
+
+    # Privremena datoteka ima isti sufiks, pa se piše istim kodekom
+    fd, privremena = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(out_path)), prefix=".flights_direct_",
+        suffix=sufiks_kompresije(kodek_po_sufiksu(out_path)),
+    )
+    os.close(fd)
+    try:
+        with otvori_ulaz(out_path) as staro, otvori_izlaz(privremena) as out:
+            for line in staro:
+                # Zaglavlje bloka je jedini red bez znaka |
+                if "|" not in line:
+                    key = tuple(line.rstrip("\n").split("->", 1))
+                    while i < len(redom) and redom[i] <= key:
+                        if redom[i] in route_map:
+                            pisi_direct_blok(route_map, redom[i], out)
+                        i += 1
+                    preskoci = key in promenjene
+                if not preskoci:
+                    out.write(line)
+
+            for key in redom[i:]:
+                if key in route_map:
+                    pisi_direct_blok(route_map, key, out)
+        dozvole_nove_datoteke(privremena)
+        os.replace(privremena, out_path)
+    except BaseException:
+        os.unlink(privremena)
+        raise
+
+
+# ------------------------------------------------------------
+# Funkcija: verzija_stanja
+# Verzija reda letenja: heš osnove (flights.txt) i lanca heševa
+# primenjenih delta datoteka, redom
+# ------------------------------------------------------------
+def verzija_stanja(hes_osnove, lanac):
+    opis = json.dumps([hes_osnove, list(lanac)])
+    return hashlib.blake2b(opis.encode("utf-8"), digest_size=20).hexdigest()
+
+
+# ------------------------------------------------------------
+# Funkcija: ucitaj_stanje
+# Vraća (hes_osnove, route_map, seg_map, primenjeno): sačuvano
+# stanje ako je napravljeno od iste osnove i njegov lanac je
+# početak traženog lanca, inače ucitaj_osnovu() i primenjeno = 0.
+# Pozivalac primenjuje delta datoteke od indeksa primenjeno.
+# ------------------------------------------------------------
+def ucitaj_stanje(ulaz, lanac, ucitaj_osnovu):
+    # hes_datoteke podiže FileNotFoundError ako flights.txt ne postoji
+    hes = hes_datoteke(ulaz)
+    kljuc = {"verzija": VERZIJA_KESA, "python": sys.version_info[:2], "hes": hes}
+    podaci = procitaj_kes(putanja_kesa(ulaz, OZNAKA_STANJA), kljuc)
+    if podaci is not None:
+        sacuvan_lanac, route_map, seg_map = podaci
+        if list(lanac[:len(sacuvan_lanac)]) == sacuvan_lanac:
+            return hes, route_map, seg_map, len(sacuvan_lanac)
+
+    route_map, seg_map = ucitaj_osnovu()
+    return hes, route_map, seg_map, 0
+
+
+# ------------------------------------------------------------
+# Funkcija: sacuvaj_stanje
+# Atomski upisuje stanje posle primene celog lanca
+# ------------------------------------------------------------
+def sacuvaj_stanje(ulaz, hes, lanac, route_map, seg_map):
+    kljuc = {"verzija": VERZIJA_KESA, "python": sys.version_info[:2], "hes": hes}
+    upisi_kes(putanja_kesa(ulaz, OZNAKA_STANJA), kljuc, (list(lanac), route_map, seg_map))
+
+
+# ------------------------------------------------------------
+# Funkcija: procitaj_oznake
+# Oznake izlaza: apsolutna putanja -> [verzija, parametri, mtime_ns].
+# Nepostojeća ili oštećena datoteka znači da nijedan izlaz nije označen.
+# ------------------------------------------------------------
+def procitaj_oznake(ulaz):
+    try:
+        with open(f"{ulaz}.{OZNAKA_STANJA}.json", encoding="utf-8") as f:
+            oznake = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return oznake if isinstance(oznake, dict) else {}
+
+
+# ------------------------------------------------------------
+# Funkcija: oznaka_izlaza
+# Verzija od koje je izlaz napravljen sa istim parametrima, ili None.
+# Izlaz koji je posle označavanja prepisan (npr. pokretanjem bez
+# --delta) ima drugo vreme izmene i nema važeću oznaku.
+# ------------------------------------------------------------
+def oznaka_izlaza(oznake, out_path, parametri=None):
+    zapis = oznake.get(os.path.abspath(out_path))
+    try:
+        st = os.stat(out_path)
+    except FileNotFoundError:
+        return None
+    if not isinstance(zapis, list) or len(zapis) != 3:
+        return None
+    verzija, parametri_zapisa, mtime_ns = zapis
+    if parametri_zapisa != parametri or mtime_ns != st.st_mtime_ns:
+        return None
+    return verzija
+
+
+# ------------------------------------------------------------
+# Funkcija: oznaci_izlaz
+# ------------------------------------------------------------
+def oznaci_izlaz(oznake, out_path, verzija, parametri=None):
+    oznake[os.path.abspath(out_path)] = [verzija, parametri, os.stat(out_path).st_mtime_ns]
+
+
+# ------------------------------------------------------------
+# Funkcija: upisi_oznake
+# Atomski upisuje oznake; neuspeh upisa se tiho ignoriše (izlazi se
+# tada sledeći put pišu iznova)
+# ------------------------------------------------------------
+def upisi_oznake(ulaz, oznake):
+    putanja = f"{ulaz}.{OZNAKA_STANJA}.json"
+    try:
+        fd, privremena = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(putanja)), suffix=".tmp"
+        )
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(oznake, f, ensure_ascii=False)
+        dozvole_nove_datoteke(privremena)
+        os.replace(privremena, putanja)
+    except OSError:
+        try:
+            os.unlink(privremena)
+        except OSError:
+            pass
@@ -0,0 +1,145 @@
+import mmap
+import os
+
+from OAI_flights import sortiraj_letove
+from common_flights import brojac, kodek_datoteke, otvori_ulaz_binarno
+
+# ------------------------------------------------------------
+# Brzo učitavanje flights.txt direktno iz bajtova (mmap).
+#
+# Datoteka se ne dekodira red po red: redovi se čitaju kao bytes
+# iz memorijski mapirane datoteke, imena aviokompanija i gradova
+# se dekodiraju samo jednom (tabela internih imena), vremena se
+# pretvaraju jednom po različitom zapisu (tabela vremena), a cene
+# se parsiraju pravo iz bajtova (float prihvata bytes), jednom po
+# različitom zapisu cene (tabela cena).
+#
+# Rezultat je isti kao procitaj_flights_file, a greške u formatu
+# su iste (ValueError). Razlika: razmaci oko polja se uklanjaju
+# kao ASCII razmaci (bytes.strip). Kompresovana datoteka se ne
+# može mapirati, pa se isti redovi čitaju iz raspakovanog toka.
+# ------------------------------------------------------------
+
+
+# ------------------------------------------------------------
+# Funkcija: procitaj_mmap
+# Zamena za procitaj_flights_file
+# ------------------------------------------------------------
+def procitaj_mmap(path):
+    route_map = {}
+    seg_map = {}
+
+    if kodek_datoteke(path) is not None:
+        with otvori_ulaz_binarno(path) as fh:
+            citaj_redove(fh, route_map, seg_map)
+        sortiraj_letove(route_map, seg_map)
+        return route_map, seg_map
+
+    with open(path, "rb") as fh:
+        # Prazna datoteka se ne može mapirati
+        if os.fstat(fh.fileno()).st_size == 0:
+            return route_map, seg_map
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            citaj_redove(iter(mm.readline, b""), route_map, seg_map)
+
+    # Sortiranje letova
+    sortiraj_letove(route_map, seg_map)
+
+    return route_map, seg_map
+
+
+# ------------------------------------------------------------
+# Funkcija: citaj_redove
+# Parsira redove (bytes) i dodaje letove u route_map i seg_map.
+# Svi letovi jednog reda imaju istu rutu i aviokompaniju, pa se
+# dodaju jednim extend pozivom.
+# ------------------------------------------------------------
+def citaj_redove(redovi, route_map, seg_map):
+    imena = {}    # bytes -> str (jedan objekat po imenu)
+    vremena = {}  # bytes -> (hh:mm kao str, minuti)
+    cene = {}     # bytes -> (cena, cena na dve decimale)
+
+    def ime(b):
+        s = imena.get(b)
+        if s is None:
+            s = imena[b] = b.strip().decode("utf-8")
+        return s
+
+    def vreme(b):
+        v = vremena.get(b)
+        if v is None:
+            t = b.strip().decode("utf-8")
+            hh, mm = t.split(":")
+            v = vremena[b] = (t, int(hh) * 60 + int(mm))
+        return v
+
+    def cena(b):
+        c = cene.get(b)
+        if c is None:
+            price = float(b)
+            c = cene[b] = (price, f"{price:.2f}")
+        return c
+
+    redova = 0
+    for redova, red in enumerate(redovi, 1):
+        # U tekstualnom režimu je i samostalno \r kraj reda
+        delovi_reda = red.split(b"\r") if b"\r" in red else (red,)
+        for line in delovi_reda:
+            line = line.strip()
+            if not line:
+                continue
+
+            parts = line.split(b"|")
+            if len(parts) != 3:
+                raise ValueError("Pogrešan format linije")
+
+            route = parts[1]
+            if b"->" not in route:
+                raise ValueError("Pogrešan format rute")
+            dep_b, lan_b = route.split(b"->", 1)
+
+            airline = ime(parts[0])
+            dep_city = ime(dep_b)
+            lan_city = ime(lan_b)
+            if airline == "" or dep_city == "" or lan_city == "":
+                raise ValueError("Prazno polje u liniji")
+
+            flights = []
+            for tok in parts[2].split(b";"):
+                tok = tok.strip()
+                if not tok:
+                    continue
+
+                # Format: hh:mm-hh:mm,price
+                if b"," not in tok:
+                    raise ValueError("Pogrešan format leta")
+                time_range, price_b = tok.split(b",", 1)
+
+                if b"-" not in time_range:
+                    raise ValueError("Pogrešan format vremena")
+                dep_t, lan_t = time_range.split(b"-", 1)
+                dep_str, dep_min = vreme(dep_t)
+                lan_str, lan_min = vreme(lan_t)
+                price, price_txt = cena(price_b)
+
+                flights.append((
+                    airline, dep_city, lan_city, dep_min, lan_min,
+                    dep_str, lan_str, price, f"{dep_str}-{lan_str},{price_txt}"
+                ))
+
+            # Red bez ijednog leta ne pravi rutu
+            if not flights:
+                continue
+
+            key = (dep_city, lan_city)
+            po_avio = route_map.get(key)
+            if po_avio is None:
+                po_avio = route_map[key] = {}
+                seg_map[key] = []
+            if airline in po_avio:
+                po_avio[airline].extend(flights)
+            else:
+                po_avio[airline] = flights
+            seg_map[key].extend(flights)
+
+    brojac("redova", redova)
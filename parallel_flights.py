@@ -0,0 +1,130 @@
+import heapq
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from OAI_flights import flight_sort_key, parsiraj_liniju, procitaj_flights_file
+from common_flights import brojac, kodek_datoteke
+
+# ------------------------------------------------------------
+# Paralelno učitavanje flights.txt na više jezgara.
+#
+# Datoteka se deli na opsege bajtova poravnate na kraj reda,
+# svaki opseg parsira poseban proces (ProcessPoolExecutor), a
+# rezultati se spajaju redom opsega. Rezultat je identičan
+# procitaj_flights_file: isti letovi, isti redosled u listama
+# i isti redosled ključeva u rečnicima.
+# ------------------------------------------------------------
+
+# Manje datoteke se ne isplati deliti na procese
+MIN_BAJTOVA_PO_DELU = 4 << 20
+
+
+# ------------------------------------------------------------
+# Funkcija: granice_delova
+# Deli datoteku na najviše n opsega [pocetak, kraj) tako da
+# svaki opseg počinje na početku reda
+# ------------------------------------------------------------
+def granice_delova(path, n):
+    velicina = os.path.getsize(path)
+    granice = [0]
+    with open(path, "rb") as f:
+        for i in range(1, n):
+            pozicija = velicina * i // n
+            if pozicija <= granice[-1]:
+                continue
+            f.seek(pozicija)
+            f.readline()
+            kraj = f.tell()
+            if granice[-1] < kraj < velicina:
+                granice.append(kraj)
+    granice.append(velicina)
+    return list(zip(granice, granice[1:]))
+
+
+# ------------------------------------------------------------
+# Funkcija: parsiraj_deo
+# Radni proces: parsira jedan opseg bajtova u route_map čije su
+# liste već sortirane po flight_sort_key; vraća (route_map, redova)
+# ------------------------------------------------------------
+def parsiraj_deo(path, pocetak, kraj):
+    with open(path, "rb") as f:
+        f.seek(pocetak)
+        podaci = f.read(kraj - pocetak)
+
+    # TextIOWrapper deli redove isto kao open(path, "r"); seg_map se
+    # gradi tek iz spojenog route_map-a, pa se ovde ne popunjava
+    route_map = {}
+    redova = 0
+    with io.TextIOWrapper(io.BytesIO(podaci), encoding="utf-8") as fh:
+        for redova, line in enumerate(fh, 1):
+            for flight in parsiraj_liniju(line):
+                po_avio = route_map.setdefault((flight[1], flight[2]), {})
+                po_avio.setdefault(flight[0], []).append(flight)
+
+    for po_avio in route_map.values():
+        for flights in po_avio.values():
+            flights.sort(key=flight_sort_key)
+    return route_map, redova
+
+
+# ------------------------------------------------------------
+# Funkcija: spoji_delove
+# Spaja route_map-ove delova redom; liste za isti ključ se
+# spajaju sa heapq.merge, koji je stabilan po redosledu delova,
+# pa je rezultat isti kao stabilno sortiranje cele datoteke
+# ------------------------------------------------------------
+def spoji_delove(delovi):
+    sakupljeno = {}
+    for route_map in delovi:
+        for key, po_avio in route_map.items():
+            cilj = sakupljeno.setdefault(key, {})
+            for airline, flights in po_avio.items():
+                cilj.setdefault(airline, []).append(flights)
+
+    route_map = {}
+    seg_map = {}
+    for key, po_avio in sakupljeno.items():
+        route_map[key] = {}
+        for airline, liste in po_avio.items():
+            if len(liste) == 1:
+                route_map[key][airline] = liste[0]
+            else:
+                route_map[key][airline] = list(heapq.merge(*liste, key=flight_sort_key))
+
+        # Jednaki ključevi su mogući samo unutar iste aviokompanije
+        seg_map[key] = list(heapq.merge(*route_map[key].values(), key=flight_sort_key))
+
+    return route_map, seg_map
+
+
+# ------------------------------------------------------------
+# Funkcija: procitaj_paralelno
+# Paralelna zamena za procitaj_flights_file.
+# Procesa nema više od jezgara, a svaki deo ima bar min_po_delu
+# bajtova; ako ostane jedan deo (jedno jezgro ili mala datoteka),
+# čita se sekvencijalno sa procitaj_flights_file, bez procesa,
+# serijalizacije i spajanja.
+# Greška u bilo kom delu se prosleđuje pozivaocu (GRESKA).
+# Kompresovan tok se ne može deliti po bajtovima, pa se čita
+# sekvencijalno.
+# ------------------------------------------------------------
+def procitaj_paralelno(path, radnika=None, min_po_delu=MIN_BAJTOVA_PO_DELU):
+    if kodek_datoteke(path) is not None:
+        return procitaj_flights_file(path)
+
+    jezgara = os.cpu_count() or 1
+    radnika = min(radnika or jezgara, jezgara)
+    velicina = os.path.getsize(path)
+    radnika = max(1, min(radnika, velicina // max(1, min_po_delu)))
+
+    delovi = granice_delova(path, radnika)
+    if len(delovi) == 1:
+        return procitaj_flights_file(path)
+
+    with ProcessPoolExecutor(max_workers=len(delovi)) as pool:
+        buduci = [pool.submit(parsiraj_deo, path, p, k) for p, k in delovi]
+        rezultati = [b.result() for b in buduci]
+
+    brojac("redova", sum(redova for _, redova in rezultati))
+    return spoji_delove([route_map for route_map, _ in rezultati])
@@ -0,0 +1,340 @@
+import heapq
+from bisect import bisect_left, bisect_right, insort
+
+from common_flights import otvori_izlaz
+
+# ------------------------------------------------------------
+# Pretraga putovanja sa više presedanja nad letovima iz
+# OAI_flights.procitaj_flights_file.
+#
+# Let je tuple:
+#   (airline, dep_city, lan_city, dep_min, lan_min, dep_str, lan_str, price)
+#
+# Presedanje je moguće ako sledeći let polazi najranije u minutu
+# dolaska prethodnog (isto pravilo kao u upisi_indirect).
+# Putovanje je lista letova redom.
+#
+# Letovi trajanja 0 se mogu nadovezati unutar istog minuta u bilo
+# kom redosledu, pa Connection Scan letove jednog minuta polaska
+# prolazi ponovo dok god neki takav let dostigne nešto novo.
+# ------------------------------------------------------------
+
+
+# ------------------------------------------------------------
+# Funkcija: pripremi_konekcije
+# Sve letove iz seg_map sortira jednom po (polazak, dolazak).
+# Vraća (konekcije, polasci) gde je polasci lista minuta polaska
+# za binarnu pretragu početka skeniranja.
+#
+# Letovi koji "stižu pre polaska" se ne mogu vremenski poređati
+# u modelu jednog dana i preskaču se.
+# ------------------------------------------------------------
+def pripremi_konekcije(seg_map):
+    konekcije = [
+        f for flights in seg_map.values() for f in flights if f[4] >= f[3]
+    ]
+    konekcije.sort(key=lambda f: (f[3], f[4]))
+    polasci = [f[3] for f in konekcije]
+    return konekcije, polasci
+
+
+# ------------------------------------------------------------
+# Funkcija: najraniji_dolazak
+# Connection Scan Algorithm: jedan linearan prolaz kroz konekcije
+# sortirane po polasku.
+#
+# najbolje[k][grad] = (najraniji dolazak sa tačno k letova, let)
+# Let c se može uhvatiti sa k letova ako je grad polaska dostignut
+# sa k-1 letova najkasnije u trenutku polaska c.
+#
+# Vraća putovanje (listu letova) sa najranijim dolaskom i najviše
+# max_presedanja presedanja, ili None ako cilj nije dostižan.
+# Kod jednakog dolaska prednost ima putovanje sa manje letova.
+# ------------------------------------------------------------
+def najraniji_dolazak(pripremljeno, dep, lan, max_presedanja=1, pocetak=0):
+    if max_presedanja < 0:
+        raise ValueError("Broj presedanja ne može biti negativan")
+    if dep == lan:
+        return []
+
+    konekcije, polasci = pripremljeno
+    max_letova = max_presedanja + 1
+
+    najbolje = [{} for _ in range(max_letova + 1)]
+    najbolje[0][dep] = (pocetak, None)
+    cilj = None
+
+    i = bisect_left(polasci, pocetak)
+    while i < len(konekcije):
+        minut = polasci[i]
+        kraj = bisect_right(polasci, minut, i)
+
+        # Svi preostali letovi polaze posle najboljeg dolaska u cilj
+        # (let iz tog minuta može i dalje da stigne sa manje letova)
+        if cilj is not None and minut > cilj:
+            break
+
+        promena = True
+        while promena:
+            promena = False
+            for c in konekcije[i:kraj]:
+                fr, to = c[1], c[2]
+                for k in range(max_letova, 0, -1):
+                    prev = najbolje[k - 1].get(fr)
+                    if prev is None or prev[0] > c[3]:
+                        continue
+                    cur = najbolje[k].get(to)
+                    if cur is None or c[4] < cur[0]:
+                        najbolje[k][to] = (c[4], c)
+                        promena = promena or c[4] == minut
+                        if to == lan and (cilj is None or c[4] < cilj):
+                            cilj = c[4]
+        i = kraj
+
+    if cilj is None:
+        return None
+
+    # Najmanji broj letova koji postiže najraniji dolazak
+    k = next(k for k in range(1, max_letova + 1)
+             if lan in najbolje[k] and najbolje[k][lan][0] == cilj)
+
+    putovanje = []
+    grad = lan
+    while k > 0:
+        c = najbolje[k][grad][1]
+        putovanje.append(c)
+        grad = c[1]
+        k -= 1
+    putovanje.reverse()
+    return putovanje
+
+
+# ------------------------------------------------------------
+# Funkcija: dominira
+# Oznaka je (dolazak, cena, broj_letova, let, prethodna_oznaka).
+# a dominira b ako nije gora ni po jednom kriterijumu.
+# ------------------------------------------------------------
+def dominira(a, b):
+    return a[0] <= b[0] and a[1] <= b[1] and a[2] <= b[2]
+
+
+# ------------------------------------------------------------
+# Funkcija: dodaj_u_skup
+# Ubacuje oznaku u Pareto skup grada ako je ne dominira nijedna
+# postojeća; uklanja oznake koje nova dominira.
+# Vraća True ako je oznaka ubačena.
+# ------------------------------------------------------------
+def dodaj_u_skup(skup, oznaka):
+    for o in skup:
+        if dominira(o, oznaka):
+            return False
+    skup[:] = [o for o in skup if not dominira(oznaka, o)]
+    skup.append(oznaka)
+    return True
+
+
+# ------------------------------------------------------------
+# Funkcija: pareto_putovanja
+# Pareto front po (vreme dolaska, ukupna cena, broj presedanja).
+#
+# Label-setting prolaz kroz konekcije sortirane po polasku
+# (višekriterijumski Connection Scan): svaki grad ima skup
+# nedominiranih oznaka, a let c proširuje svaku oznaku svog
+# polaznog grada koja stiže najkasnije u trenutku polaska c.
+# Oznake koje dominira već pronađeni skup u cilju se odbacuju
+# odmah, pa se pun proizvod kombinacija nikad ne formira.
+#
+# Vraća listu putovanja sortiranu po (dolazak, cena, presedanja).
+# ------------------------------------------------------------
+def pareto_putovanja(pripremljeno, dep, lan, max_presedanja=1, pocetak=0):
+    if max_presedanja < 0:
+        raise ValueError("Broj presedanja ne može biti negativan")
+    if dep == lan:
+        return []
+
+    konekcije, polasci = pripremljeno
+    max_letova = max_presedanja + 1
+
+    skupovi = {dep: [(pocetak, 0.0, 0, None, None)]}
+    cilj = []
+
+    i = bisect_left(polasci, pocetak)
+    while i < len(konekcije):
+        minut = polasci[i]
+        kraj = bisect_right(polasci, minut, i)
+
+        promena = True
+        while promena:
+            promena = False
+            for c in konekcije[i:kraj]:
+                skup = skupovi.get(c[1])
+                if not skup:
+                    continue
+
+                nove = []
+                for o in skup:
+                    if o[0] <= c[3] and o[2] < max_letova:
+                        nove.append((c[4], o[1] + c[7], o[2] + 1, c, o))
+
+                for n in nove:
+                    # Ne vredi nastavljati ono što je već lošije od nađenog u cilju
+                    if any(dominira(o, n) for o in cilj):
+                        continue
+                    if c[2] == lan:
+                        dodaj_u_skup(cilj, n)
+                    elif dodaj_u_skup(skupovi.setdefault(c[2], []), n) and c[4] == minut:
+                        promena = True
+        i = kraj
+
+    cilj.sort(key=lambda o: (o[0], o[1], o[2]))
+    return [rekonstruisi(o) for o in cilj]
+
+
+# ------------------------------------------------------------
+# Funkcija: pripremi_izlazne
+# Graf letova iz seg_map: grad -> (letovi sortirani po polasku,
+# lista minuta polaska) za binarnu pretragu izlaznih letova
+# ------------------------------------------------------------
+def pripremi_izlazne(seg_map):
+    izlazni = {}
+    for (fr, to), flights in seg_map.items():
+        izlazni.setdefault(fr, []).extend(f for f in flights if f[4] >= f[3])
+    graf = {}
+    for fr, flights in izlazni.items():
+        flights.sort(key=lambda f: (f[3], f[4]))
+        graf[fr] = (flights, [f[3] for f in flights])
+    return graf
+
+
+# ------------------------------------------------------------
+# Funkcija: najjeftinija_putovanja
+# K najjeftinijih putovanja od dep do lan pretragom sa hipom.
+#
+# Stanje je (cena, dolazak, redni_broj, grad, broj_letova, oznaka);
+# stanja se vade iz hipa po rastućoj ceni (pa po dolasku), pa je
+# svako stanje izvađeno u cilju sledeće najjeftinije putovanje.
+#
+# Odsecanje: ako je u grad već izvađeno K stanja koja nisu skuplja,
+# ne stižu kasnije (i nemaju više letova, kad je broj presedanja
+# ograničen), svako nastavljanje ovog stanja ima bar K jednako
+# dobrih alternativa, pa se stanje ne širi.
+# Pretraga staje čim se nađe K putovanja.
+# ------------------------------------------------------------
+def najjeftinija_putovanja(graf, dep, lan, k, max_presedanja=None, pocetak=0):
+    if k <= 0 or dep == lan:
+        return []
+
+    max_letova = None if max_presedanja is None else max_presedanja + 1
+    hip = [(0.0, pocetak, 0, dep, 0, None)]
+    redni_broj = 1
+    izvadjeni = {}  # grad -> broj_letova -> sortirani dolasci izvađenih stanja
+    rezultat = []
+
+    while hip and len(rezultat) < k:
+        cena, dolazak, _, grad, letova, oznaka = heapq.heappop(hip)
+
+        if grad == lan and letova > 0:
+            rezultat.append(rekonstruisi_iz_steka(oznaka))
+            continue
+
+        # Uz ograničenje presedanja i broj letova mora biti bar jednako dobar
+        po_letovima = izvadjeni.setdefault(grad, {})
+        nivo = 0 if max_letova is None else letova
+        bolji = sum(
+            bisect_right(dolasci, dolazak)
+            for n_letova, dolasci in po_letovima.items() if n_letova <= nivo
+        )
+        if bolji >= k:
+            continue
+        insort(po_letovima.setdefault(nivo, []), dolazak)
+
+        if max_letova is not None and letova >= max_letova:
+            continue
+        if grad not in graf:
+            continue
+
+        flights, polasci = graf[grad]
+        for i in range(bisect_left(polasci, dolazak), len(flights)):
+            f = flights[i]
+            heapq.heappush(
+                hip,
+                (cena + f[7], f[4], redni_broj, f[2], letova + 1, (f, oznaka))
+            )
+            redni_broj += 1
+
+    return rezultat
+
+
+# ------------------------------------------------------------
+# Funkcija: rekonstruisi_iz_steka
+# Oznaka top-K pretrage je povezana lista (let, prethodna_oznaka)
+# ------------------------------------------------------------
+def rekonstruisi_iz_steka(oznaka):
+    putovanje = []
+    while oznaka is not None:
+        putovanje.append(oznaka[0])
+        oznaka = oznaka[1]
+    putovanje.reverse()
+    return putovanje
+
+
+# ------------------------------------------------------------
+# Funkcija: rekonstruisi
+# Od oznake u cilju pravi listu letova prateći prethodne oznake
+# ------------------------------------------------------------
+def rekonstruisi(oznaka):
+    putovanje = []
+    while oznaka[3] is not None:
+        putovanje.append(oznaka[3])
+        oznaka = oznaka[4]
+    putovanje.reverse()
+    return putovanje
+
+
+# ------------------------------------------------------------
+# Funkcija: pisi_putovanje
+# Zaglavlje je lanac gradova (opciono sa ukupnom cenom), zatim
+# po jedan red za svaki let u istom obliku kao u flights_indirect.txt
+# ------------------------------------------------------------
+def pisi_putovanje(out, putovanje, sa_cenom=False):
+    gradovi = [putovanje[0][1]] + [f[2] for f in putovanje]
+    zaglavlje = "->".join(gradovi)
+    if sa_cenom:
+        zaglavlje += f",{sum(f[7] for f in putovanje):.2f}"
+    out.write(zaglavlje + "\n")
+    for f in putovanje:
+        out.write(f"{f[1]}->{f[2]}|{f[0]}|{f[5]}-{f[6]},{f[7]:.2f}\n")
+
+
+# ------------------------------------------------------------
+# Funkcija: upisi_najraniji
+# Upisuje putovanje sa najranijim dolaskom (prazna datoteka ako
+# cilj nije dostižan u zadatom broju presedanja)
+# ------------------------------------------------------------
+def upisi_najraniji(pripremljeno, dep, lan, out_path, max_presedanja=1, pocetak=0):
+    putovanje = najraniji_dolazak(pripremljeno, dep, lan, max_presedanja, pocetak)
+    with otvori_izlaz(out_path) as out:
+        if putovanje:
+            pisi_putovanje(out, putovanje)
+
+
+# ------------------------------------------------------------
+# Funkcija: upisi_pareto
+# Upisuje Pareto front putovanja, svako sa ukupnom cenom u zaglavlju
+# ------------------------------------------------------------
+def upisi_pareto(pripremljeno, dep, lan, out_path, max_presedanja=1, pocetak=0):
+    putovanja = pareto_putovanja(pripremljeno, dep, lan, max_presedanja, pocetak)
+    with otvori_izlaz(out_path) as out:
+        for putovanje in putovanja:
+            pisi_putovanje(out, putovanje, sa_cenom=True)
+
+
+# ------------------------------------------------------------
+# Funkcija: upisi_najjeftinija
+# Upisuje K najjeftinijih putovanja, svako sa ukupnom cenom
+# ------------------------------------------------------------
+def upisi_najjeftinija(graf, dep, lan, out_path, k, max_presedanja=None, pocetak=0):
+    putovanja = najjeftinija_putovanja(graf, dep, lan, k, max_presedanja, pocetak)
+    with otvori_izlaz(out_path) as out:
+        for putovanje in putovanja:
+            pisi_putovanje(out, putovanje, sa_cenom=True)
@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+from collections import deque
+
+from OAI_flights import (
+    napravi_susede,
+    parsiraj_par,
+    procena_indirect,
+    procitaj_flights_file,
+    redovi_indirect,
+)
+from common_flights import ucitaj_sa_kesom
+
+# ------------------------------------------------------------
+# Server za upite nad redom letenja preko lokalnog Unix soketa.
+#
+# Red letenja se učitava jednom (procitaj_flights_file, preko keša),
+# a zatim se odgovara na upite. Protokol je linijski:
+#
+#   CITY1->CITY2   -> "OK <n>\n" + n bajtova teksta koji bi
+#                     upisi_indirect upisao u flights_indirect.txt
+#   STATS          -> "OK <n>\n" + JSON (uptime, broj upita, p50/p99)
+#   neispravan red -> "GRESKA\n"
+#
+# Jedna konekcija može poslati više upita redom. Dužina odgovora
+# se računa unapred (procena_indirect), a tekst se šalje u komadima,
+# pa se ni veliki rezultat ne drži ceo u memoriji po klijentu.
+# ------------------------------------------------------------
+
+# Koliko poslednjih latencija čuvamo za percentile
+BROJ_LATENCIJA = 10000
+
+# Približna veličina jednog poslatog komada odgovora u bajtovima
+VELICINA_KOMADA = 1 << 20
+
+
+# ------------------------------------------------------------
+# Funkcija: novo_stanje
+# Stanje servera je običan rečnik (bez klasa)
+# ------------------------------------------------------------
+def novo_stanje(seg_map):
+    return {
+        "seg_map": seg_map,
+        "susedi": napravi_susede(seg_map),
+        "pocetak": time.monotonic(),
+        "upiti": 0,
+        "greske": 0,
+        "latencije": deque(maxlen=BROJ_LATENCIJA),
+    }
+
+
+# ------------------------------------------------------------
+# Funkcija: percentil
+# Percentil metodom najbližeg ranga nad sortiranom listom
+# ------------------------------------------------------------
+def percentil(sortirano, p):
+    if not sortirano:
+        return None
+    rang = max(1, -(-len(sortirano) * p // 100))
+    return sortirano[rang - 1]
+
+
+# ------------------------------------------------------------
+# Funkcija: statistika
+# Uptime, broj upita i p50/p99 latencije u milisekundama
+# ------------------------------------------------------------
+def statistika(stanje):
+    lat = sorted(stanje["latencije"])
+    p50 = percentil(lat, 50)
+    p99 = percentil(lat, 99)
+    return {
+        "status": "ok",
+        "uptime_s": round(time.monotonic() - stanje["pocetak"], 3),
+        "upiti": stanje["upiti"],
+        "greske": stanje["greske"],
+        "p50_ms": None if p50 is None else round(p50 * 1000, 3),
+        "p99_ms": None if p99 is None else round(p99 * 1000, 3),
+    }
+
+
+# ------------------------------------------------------------
+# Funkcija: pripremi_odgovor
+# Za upit CITY1->CITY2 vraća (broj bajtova odgovora, generator
+# delova teksta koji bi upisi_indirect upisao); tekst se formira
+# tek dok se šalje. Vraća None za neispravan upit.
+# ------------------------------------------------------------
+def pripremi_odgovor(seg_map, zahtev, susedi=None):
+    try:
+        ulaz = parsiraj_par(zahtev)
+        if ulaz is None:
+            return None
+        dep, lan = ulaz
+        bajtova = sum(b for _, _, b in procena_indirect(seg_map, dep, lan, susedi))
+        return bajtova, redovi_indirect(seg_map, dep, lan, susedi)
+    except Exception:
+        return None
+
+
+# ------------------------------------------------------------
+# Funkcija: sledeci_komad
+# Sledeći komad odgovora (UTF-8) od bar velicina bajtova teksta,
+# ili manje na kraju; b"" kada su svi delovi poslati
+# ------------------------------------------------------------
+def sledeci_komad(delovi, velicina=VELICINA_KOMADA):
+    paket = []
+    ukupno = 0
+    for deo in delovi:
+        paket.append(deo)
+        ukupno += len(deo)
+        if ukupno >= velicina:
+            break
+    return "".join(paket).encode("utf-8")
+
+
+# ------------------------------------------------------------
+# Funkcija: posalji_odgovor
+# Šalje zaglavlje "OK <n>" i tekst u komadima; posle svakog komada
+# čeka da se bafer konekcije isprazni (drain). Komadi se formiraju
+# van petlje događaja. Vraća False za neispravan upit.
+# ------------------------------------------------------------
+async def posalji_odgovor(stanje, zahtev, writer):
+    # Veliki upiti ne blokiraju petlju za ostale klijente
+    priprema = await asyncio.to_thread(
+        pripremi_odgovor, stanje["seg_map"], zahtev, stanje["susedi"]
+    )
+    if priprema is None:
+        return False
+
+    bajtova, delovi = priprema
+    writer.write(f"OK {bajtova}\n".encode("ascii"))
+    poslato = 0
+    while True:
+        komad = await asyncio.to_thread(sledeci_komad, delovi)
+        if not komad:
+            break
+        poslato += len(komad)
+        writer.write(komad)
+        await writer.drain()
+    if poslato != bajtova:
+        # Uokvirenje bi bilo pogrešno; klijent ne sme da čita dalje
+        raise ConnectionError("dužina odgovora se ne poklapa sa zaglavljem")
+    return True
+
+
+# ------------------------------------------------------------
+# Funkcija: obradi_klijenta
+# Odgovara na zahteve jednog klijenta dok ne zatvori konekciju
+# Brojači se menjaju samo u petlji događaja, pa nema trka
+# ------------------------------------------------------------
+async def obradi_klijenta(stanje, reader, writer):
+    try:
+        while True:
+            linija = await reader.readline()
+            if not linija:
+                break
+            zahtev = linija.decode("utf-8", errors="replace").strip()
+            if zahtev == "":
+                continue
+
+            if zahtev.upper() in ("STATS", "HEALTH"):
+                telo = (json.dumps(statistika(stanje), sort_keys=True) + "\n").encode("utf-8")
+                writer.write(f"OK {len(telo)}\n".encode("ascii") + telo)
+            else:
+                t0 = time.perf_counter()
+                if await posalji_odgovor(stanje, zahtev, writer):
+                    stanje["upiti"] += 1
+                    stanje["latencije"].append(time.perf_counter() - t0)
+                else:
+                    stanje["greske"] += 1
+                    writer.write(b"GRESKA\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+# ------------------------------------------------------------
+# Funkcija: soket_aktivan
+# Da li na socket_path već sluša neki proces
+# ------------------------------------------------------------
+def soket_aktivan(socket_path):
+    with socket.socket(socket.AF_UNIX) as s:
+        try:
+            s.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+
+# ------------------------------------------------------------
+# Funkcija: pokreni_server
+# Učitava red letenja i sluša na Unix soketu
+# ------------------------------------------------------------
+async def pokreni_server(flights_path, socket_path):
+    # Soket servera koji još radi se ne preuzima (proverava se pre učitavanja)
+    if os.path.exists(socket_path) and soket_aktivan(socket_path):
+        raise RuntimeError(f"na {socket_path} već radi server")
+
+    route_map, seg_map = ucitaj_sa_kesom(flights_path, procitaj_flights_file, "oai")
+    stanje = novo_stanje(seg_map)
+
+    # Zaostali soket od prethodnog pokretanja
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = await asyncio.start_unix_server(
+        lambda r, w: obradi_klijenta(stanje, r, w), path=socket_path
+    )
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# ------------------------------------------------------------
+# Glavna funkcija
+# ------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server za upite nad letovima")
+    parser.add_argument("--flights", default="flights.txt")
+    parser.add_argument("--socket", default="flights.sock")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(pokreni_server(args.flights, args.socket))
+    except FileNotFoundError:
+        print("DAT_GRESKA")
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        print("GRESKA")
+
+
+# Pokretanje programa
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import heapq
+import os
+import pickle
+import tempfile
+from itertools import groupby
+
+from OAI_flights import (
+    dodaj_let, napravi_susede, parsiraj_liniju, pisi_indirect, prikaz_leta, sortiraj_letove
+)
+from common_flights import otvori_izlaz, otvori_ulaz, pisi_delove
+
+# ------------------------------------------------------------
+# Obrada flights.txt tokom čitanja, sa ograničenom memorijom.
+#
+# Letovi se čitaju red po red (generator), za flights_direct.txt
+# se sortiraju spoljnim sortiranjem (delovi od najviše
+# max_u_memoriji letova se sortiraju u memoriji i prelivaju na
+# disk, pa se spajaju sa heapq.merge), a za indirektne upite se
+# u memoriji zadržavaju samo letovi koji mogu biti deo odgovora.
+#
+# Izlaz je identičan upisi_direct / upisi_indirect.
+# ------------------------------------------------------------
+
+# Podrazumevan broj letova koji se sortira u memoriji
+MAX_U_MEMORIJI = 1_000_000
+
+# Koliko zapisa se upisuje jednim pickle.dump pozivom
+VELICINA_PAKETA = 4096
+
+
+# ------------------------------------------------------------
+# Funkcija: citaj_letove
+# Generator koji vraća letove jedan po jedan (isti format i iste
+# greške kao procitaj_flights_file)
+# ------------------------------------------------------------
+def citaj_letove(path):
+    with otvori_ulaz(path) as fh:
+        for line in fh:
+            yield from parsiraj_liniju(line)
+
+
+# ------------------------------------------------------------
+# Funkcija: kljuc_direktnog
+# Redosled u flights_direct.txt: ruta, aviokompanija, zatim
+# polazak i trajanje; redni broj čuva redosled iz datoteke
+# za potpuno jednake letove (kao stabilno sortiranje)
+# ------------------------------------------------------------
+def kljuc_direktnog(zapis):
+    _, f = zapis
+    return (f[1], f[2], f[0], f[3], f[4] - f[3], zapis[0])
+
+
+# ------------------------------------------------------------
+# Funkcija: prelij_na_disk
+# Upisuje sortiran deo u privremenu datoteku u paketima
+# ------------------------------------------------------------
+def prelij_na_disk(deo, direktorijum):
+    fd, putanja = tempfile.mkstemp(dir=direktorijum, suffix=".run")
+    with os.fdopen(fd, "wb") as f:
+        for i in range(0, len(deo), VELICINA_PAKETA):
+            pickle.dump(deo[i:i + VELICINA_PAKETA], f, pickle.HIGHEST_PROTOCOL)
+    return putanja
+
+
+# ------------------------------------------------------------
+# Funkcija: citaj_sa_diska
+# Generator zapisa iz jedne prelivene datoteke
+# ------------------------------------------------------------
+def citaj_sa_diska(putanja):
+    with open(putanja, "rb") as f:
+        while True:
+            try:
+                paket = pickle.load(f)
+            except EOFError:
+                return
+            yield from paket
+
+
+# ------------------------------------------------------------
+# Funkcija: sortiraj_spolja
+# Spoljno sortiranje letova po kljuc_direktnog.
+# Ako sve stane u jedan deo, ništa se ne preliva na disk.
+# Celokupan ulaz se pročita (i proveri) pre prvog vraćenog leta.
+# ------------------------------------------------------------
+def sortiraj_spolja(letovi, max_u_memoriji=MAX_U_MEMORIJI, tmp_dir=None):
+    if max_u_memoriji < 1:
+        raise ValueError("max_u_memoriji mora biti pozitivan")
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir, prefix="flights_sort_") as direktorijum:
+        delovi = []
+        deo = []
+        for zapis in enumerate(letovi):
+            deo.append(zapis)
+            if len(deo) >= max_u_memoriji:
+                deo.sort(key=kljuc_direktnog)
+                delovi.append(prelij_na_disk(deo, direktorijum))
+                deo = []
+
+        deo.sort(key=kljuc_direktnog)
+        if not delovi:
+            for _, f in deo:
+                yield f
+            return
+
+        delovi.append(prelij_na_disk(deo, direktorijum))
+        del deo
+        spojeni = heapq.merge(
+            *(citaj_sa_diska(p) for p in delovi), key=kljuc_direktnog
+        )
+        for _, f in spojeni:
+            yield f
+
+
+# ------------------------------------------------------------
+# Funkcija: upisi_direct_tok
+# Upisuje flights_direct.txt iz letova sortiranih po ruti i
+# aviokompaniji; u memoriji je samo jedna grupa (ruta, aviokompanija)
+# ------------------------------------------------------------
+def upisi_direct_tok(sortirani, out_path):
+    sortirani = iter(sortirani)
+
+    # Prvi let se uzima pre otvaranja datoteke: greška u ulazu
+    # se tako javlja pre nego što se napravi bilo kakav izlaz
+    prvi = next(sortirani, None)
+    tok = sortirani if prvi is None else _sa_prvim(prvi, sortirani)
+
+    with otvori_izlaz(out_path) as out:
+        pisi_delove(out, redovi_direct_toka(tok))
+
+
+# ------------------------------------------------------------
+# Funkcija: redovi_direct_toka
+# Redovi flights_direct.txt iz letova sortiranih po ruti
+# ------------------------------------------------------------
+def redovi_direct_toka(sortirani):
+    for (dep, lan), po_ruti in groupby(sortirani, key=lambda f: (f[1], f[2])):
+        yield f"{dep}->{lan}\n"
+        for airline, flights in groupby(po_ruti, key=lambda f: f[0]):
+            yield f"{airline}|{';'.join(map(prikaz_leta, flights))}\n"
+
+
+def _sa_prvim(prvi, ostali):
+    yield prvi
+    yield from ostali
+
+
+# ------------------------------------------------------------
+# Funkcija: obradi_tokom
+# Jedan prolaz kroz flights.txt: flights_direct.txt uz spoljno
+# sortiranje i indirektni rezultati za listu upita
+# upiti: lista (dep, lan, out_path)
+# ------------------------------------------------------------
+def obradi_tokom(path, direct_path, upiti, max_u_memoriji=MAX_U_MEMORIJI, tmp_dir=None):
+    polasci = {dep for dep, _, _ in upiti}
+    dolasci = {lan for _, lan, _ in upiti}
+
+    # Za upit dep->lan su potrebni samo letovi iz dep i letovi u lan
+    route_map, seg_map = {}, {}
+
+    def sa_izdvajanjem(letovi):
+        for f in letovi:
+            if f[1] in polasci or f[2] in dolasci:
+                dodaj_let(route_map, seg_map, f)
+            yield f
+
+    sortirani = sortiraj_spolja(sa_izdvajanjem(citaj_letove(path)), max_u_memoriji, tmp_dir)
+    upisi_direct_tok(sortirani, direct_path)
+
+    sortiraj_letove(route_map, seg_map)
+    susedi = napravi_susede(seg_map)
+    for dep, lan, out_path in upiti:
+        with otvori_izlaz(out_path) as out:
+            pisi_indirect(seg_map, dep, lan, out, susedi)
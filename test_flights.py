@@ -25,6 +25,25 @@ import pytest
 REPO_DIR = os.path.dirname(os.path.abspath(__file__))
 SCRIPTS = ["CC_Flights.py", "G_flights.py", "OAI_flights.py"]
 
+# Alternative OAI engines must pass the same output tests as the default one.
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+SCRIPT_VARIANTS = SCRIPTS + [
+    "OAI_flights.py --columnar",
+    "OAI_flights.py --stream --chunk-size 2",
+    "OAI_flights.py --workers 2",
+    "OAI_flights.py --mmap",
+    "OAI_flights.py --concurrent thread",
+    "OAI_flights.py --concurrent process",
+    "G_flights.py --concurrent process",
+    "CC_Flights.py --concurrent thread",
+    "OAI_flights.py --all-pairs parovi --shards 3 --all-pairs-workers 2",
+    "OAI_flights.py --cache-dir kes",
+    pytest.param(
+        "OAI_flights.py --engine numpy",
+        marks=pytest.mark.skipif(not HAS_NUMPY, reason="numpy not installed"),
+    ),
+]
+
 # ---------------------------------------------------------------------------
 # Shared sample data
 # ---------------------------------------------------------------------------
@@ -42,14 +61,16 @@ SAMPLE_FLIGHTS = textwrap.dedent("""\
 def run_script(script_name, stdin_input, flights_content=SAMPLE_FLIGHTS):
     """Run script_name with stdin_input and a flights.txt in a fresh temp dir.
 
+    script_name may carry extra command-line options ("OAI_flights.py --columnar").
     Returns (CompletedProcess, direct_txt_content, indirect_txt_content).
     """
+    script_name, *options = script_name.split()
     with tempfile.TemporaryDirectory() as tmpdir:
         with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
             f.write(flights_content)
 
         result = subprocess.run(
-            [sys.executable, os.path.join(REPO_DIR, script_name)],
+            [sys.executable, os.path.join(REPO_DIR, script_name), *options],
             input=stdin_input,
             capture_output=True,
             text=True,
@@ -93,6 +114,51 @@ class TestCCUtilities:
         assert self.mod.trajanje_leta("08:00", "10:00") == 120
         assert self.mod.trajanje_leta("07:00", "09:30") == 150
 
+    def test_indirect_join_matches_brute_force(self, tmp_path):
+        """Bisect join must emit exactly the pairs with dep2 > arr1, legs in departure order."""
+        letovi = [
+            {'aviokompanija': 'X', 'grad_polaska': 'A', 'grad_dolaska': 'H',
+             'letovi': [{'vreme_polaska': '09:00', 'vreme_dolaska': '10:00', 'cena': 1.0},
+                        {'vreme_polaska': '07:00', 'vreme_dolaska': '08:00', 'cena': 2.0}]},
+            {'aviokompanija': 'Y', 'grad_polaska': 'H', 'grad_dolaska': 'B',
+             'letovi': [{'vreme_polaska': '11:00', 'vreme_dolaska': '12:00', 'cena': 3.0},
+                        {'vreme_polaska': '10:00', 'vreme_dolaska': '11:00', 'cena': 4.0},
+                        {'vreme_polaska': '08:30', 'vreme_dolaska': '09:00', 'cena': 5.0}]},
+        ]
+        out = tmp_path / "indirect.txt"
+        self.mod.formiraj_indirektne_letove(letovi, "A->B", str(out))
+        assert out.read_text(encoding="utf-8") == (
+            "A->H->B\n"
+            "A->H\nX|07:00-08:00,2.00\nH->B\nY|08:30-09:00,5.00\n"
+            "A->H\nX|07:00-08:00,2.00\nH->B\nY|10:00-11:00,4.00\n"
+            "A->H\nX|07:00-08:00,2.00\nH->B\nY|11:00-12:00,3.00\n"
+            "A->H\nX|09:00-10:00,1.00\nH->B\nY|11:00-12:00,3.00\n"
+        )
+
+    def test_times_parsed_only_for_joined_routes(self, tmp_path):
+        """A malformed time on a route the query never joins must not abort it."""
+        letovi = [
+            {'aviokompanija': 'X', 'grad_polaska': 'A', 'grad_dolaska': 'H',
+             'letovi': [{'vreme_polaska': '07:00', 'vreme_dolaska': '08:00', 'cena': 1.0}]},
+            {'aviokompanija': 'Y', 'grad_polaska': 'H', 'grad_dolaska': 'B',
+             'letovi': [{'vreme_polaska': '09:00', 'vreme_dolaska': '10:00', 'cena': 2.0}]},
+            {'aviokompanija': 'Z', 'grad_polaska': 'C', 'grad_dolaska': 'D',
+             'letovi': [{'vreme_polaska': 'xx:yy', 'vreme_dolaska': '10:00', 'cena': 3.0}]},
+        ]
+        letovi_iz = self.mod.grupisi_po_gradovima(letovi)
+        assert 'min_polaska' not in letovi_iz['C']['D'][0]
+
+        out = tmp_path / "indirect.txt"
+        self.mod.formiraj_indirektne_letove(letovi, "A->B", str(out), letovi_iz=letovi_iz)
+        assert out.read_text(encoding="utf-8") == (
+            "A->H->B\nA->H\nX|07:00-08:00,1.00\nH->B\nY|09:00-10:00,2.00\n"
+        )
+        assert 'min_polaska' in letovi_iz['H']['B'][0]
+        assert 'min_polaska' not in letovi_iz['C']['D'][0]
+
+        with pytest.raises(ValueError):
+            self.mod.letovi_rute(letovi_iz, 'C', 'D')
+
 
 class TestGUtilities:
     @pytest.fixture(autouse=True)
@@ -117,6 +183,25 @@ class TestGUtilities:
         assert self.mod.formatiraj_cenu(9.5) == "9.50"
         assert self.mod.formatiraj_cenu(1000) == "1000.00"
 
+    def test_indirect_suffix_sorted_by_departure_duration_airline(self, tmp_path):
+        flights = tmp_path / "flights.txt"
+        flights.write_text(
+            "X|A->H|07:00-08:00,1.00;09:00-10:00,2.00\n"
+            "Z|H->B|10:00-12:00,3.00;08:00-09:00,4.00\n"
+            "Y|H->B|10:00-12:00,5.00;10:00-11:00,6.00\n",
+            encoding="utf-8",
+        )
+        out = tmp_path / "indirect.txt"
+        letovi = self.mod.ucitaj_letove(str(flights))
+        self.mod.obradi_indirektne_letove(letovi, "A", "B", str(out))
+        assert out.read_text(encoding="utf-8") == (
+            "A->H->B\n"
+            "  X|07:00-08:00,1.00\n"
+            "    Y|10:00-11:00,6.00\n"
+            "    Y|10:00-12:00,5.00\n"
+            "    Z|10:00-12:00,3.00\n"
+        )
+
 
 class TestOAIUtilities:
     @pytest.fixture(autouse=True)
@@ -134,6 +219,25 @@ class TestOAIUtilities:
         late = ("AirX", "A", "B", 540, 660, "09:00", "11:00", 100.0)
         assert self.mod.flight_sort_key(early) < self.mod.flight_sort_key(late)
 
+    @pytest.mark.parametrize("argv", [
+        "--offset -1", "--limit -1", "--workers -1", "--shards 0", "--cache-max-bytes 0",
+        "--summary --stream", "--limit 3 --pareto", "--all-pairs d --delta x",
+        "--all-pairs d --offset 2", "--cache-dir d --stream", "--concurrent thread --delta x",
+        "--delta x --columnar", "--mmap --workers 2", "--workers 2 --stream",
+        "--stream --top-k 3", "--columnar --max-transfers 2", "--engine numpy --pareto",
+    ])
+    def test_incompatible_options_are_usage_errors(self, argv, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        with pytest.raises(SystemExit) as exc:
+            self.mod.parsiraj_argumente(argv.split())
+        assert exc.value.code == 2
+
+    @pytest.mark.parametrize("argv", ["--offset 0 --stream", "--engine python --mmap", "--limit 2 --offset 1"])
+    def test_default_values_do_not_conflict(self, argv, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        args = self.mod.parsiraj_argumente(argv.split())
+        assert args.ulaz.endswith("flights.txt")
+
 
 # ===========================================================================
 # Integration tests: error handling
@@ -174,7 +278,7 @@ def test_empty_stdin_exits_silently(script):
 # Integration tests: flights_direct.txt content
 # ===========================================================================
 
-@pytest.mark.parametrize("script", SCRIPTS)
+@pytest.mark.parametrize("script", SCRIPT_VARIANTS)
 def test_direct_output_contains_all_routes(script):
     """All three routes in SAMPLE_FLIGHTS must appear in flights_direct.txt."""
     _, direct, _ = run_script(script, "Beograd->Pariz")
@@ -183,7 +287,7 @@ def test_direct_output_contains_all_routes(script):
     assert "Frankfurt->Pariz" in direct
 
 
-@pytest.mark.parametrize("script", SCRIPTS)
+@pytest.mark.parametrize("script", SCRIPT_VARIANTS)
 def test_direct_output_price_always_two_decimals(script):
     """Every price token in flights_direct.txt must have exactly 2 decimal places."""
     _, direct, _ = run_script(script, "Beograd->Pariz")
@@ -193,7 +297,7 @@ def test_direct_output_price_always_two_decimals(script):
         assert len(price.split('.')[1]) == 2, f"Bad price format: {price}"
 
 
-@pytest.mark.parametrize("script", SCRIPTS)
+@pytest.mark.parametrize("script", SCRIPT_VARIANTS)
 def test_direct_output_airlines_alphabetical(script):
     """Airlines on the Beograd->Pariz route must appear in lexicographic order.
 
@@ -217,14 +321,14 @@ def test_direct_output_airlines_alphabetical(script):
 # Integration tests: flights_indirect.txt content
 # ===========================================================================
 
-@pytest.mark.parametrize("script", SCRIPTS)
+@pytest.mark.parametrize("script", SCRIPT_VARIANTS)
 def test_indirect_finds_connection_via_frankfurt(script):
     """Beograd->Pariz must find a valid connection through Frankfurt."""
     _, _, indirect = run_script(script, "Beograd->Pariz")
     assert "Frankfurt" in indirect
 
 
-@pytest.mark.parametrize("script", SCRIPTS)
+@pytest.mark.parametrize("script", SCRIPT_VARIANTS)
 def test_indirect_excludes_impossible_connections(script):
     """Second leg that departs before the first leg arrives must be excluded."""
     flights = textwrap.dedent("""\
@@ -239,7 +343,7 @@ def test_indirect_excludes_impossible_connections(script):
     assert "Lufthansa" in indirect
 
 
-@pytest.mark.parametrize("script", SCRIPTS)
+@pytest.mark.parametrize("script", SCRIPT_VARIANTS)
 def test_indirect_empty_when_no_connection_exists(script):
     """If no valid connection exists, flights_indirect.txt must be empty."""
     flights = textwrap.dedent("""\
@@ -247,3 +351,1985 @@ def test_indirect_empty_when_no_connection_exists(script):
     """)
     _, _, indirect = run_script(script, "Beograd->Pariz", flights_content=flights)
     assert indirect.strip() == ""
+
+
+# ===========================================================================
+# Binary timetable cache (common_flights.ucitaj_sa_kesom)
+# ===========================================================================
+
+CACHE_TAGS = {"CC_Flights.py": "cc", "G_flights.py": "g", "OAI_flights.py": "oai"}
+
+
+def run_in_dir(script, tmpdir, stdin_input="Beograd->Pariz"):
+    """Run script in an existing directory and return (result, direct, indirect)."""
+    result = subprocess.run(
+        [sys.executable, os.path.join(REPO_DIR, script)],
+        input=stdin_input,
+        capture_output=True,
+        text=True,
+        cwd=tmpdir,
+    )
+
+    def read_out(name):
+        p = os.path.join(tmpdir, name)
+        return open(p, encoding="utf-8").read() if os.path.exists(p) else ""
+
+    return result, read_out("flights_direct.txt"), read_out("flights_indirect.txt")
+
+
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_cache_written_and_reused(script):
+    """First run writes the sidecar; a second run gives identical output."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+            f.write(SAMPLE_FLIGHTS)
+        first = run_in_dir(script, tmpdir)
+        idx = os.path.join(tmpdir, f"flights.txt.{CACHE_TAGS[script]}.idx")
+        assert os.path.exists(idx)
+        second = run_in_dir(script, tmpdir)
+    assert first[1:] == second[1:]
+    assert second[0].stdout == ""
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_cache_gets_regular_file_permissions(script):
+    """The sidecar is created like any other file (umask), not 0600."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "flights.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(SAMPLE_FLIGHTS)
+        run_in_dir(script, tmpdir)
+        idx = os.path.join(tmpdir, f"flights.txt.{CACHE_TAGS[script]}.idx")
+        assert os.stat(idx).st_mode & 0o777 == os.stat(path).st_mode & 0o777
+
+
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_corrupt_cache_is_rebuilt(script):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+            f.write(SAMPLE_FLIGHTS)
+        expected = run_in_dir(script, tmpdir)
+        idx = os.path.join(tmpdir, f"flights.txt.{CACHE_TAGS[script]}.idx")
+        data = open(idx, "rb").read()
+        with open(idx, "wb") as f:
+            f.write(data[: len(data) // 2])
+        rebuilt = run_in_dir(script, tmpdir)
+        assert open(idx, "rb").read() == data
+    assert rebuilt[1:] == expected[1:]
+
+
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_stale_cache_detected_after_edit(script):
+    """Changing flights.txt must invalidate the cache."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "flights.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(SAMPLE_FLIGHTS)
+        run_in_dir(script, tmpdir)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("Wizz|Beograd->Rim|06:00-08:00,50.00\n")
+        _, direct, _ = run_in_dir(script, tmpdir)
+    assert "Beograd->Rim" in direct
+
+
+def test_cache_same_size_and_mtime_checked_by_hash():
+    """Content hash catches edits that keep size and mtime unchanged."""
+    common = load_module("common_flights.py")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "flights.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("A|X->Y|08:00-09:00,10.00\n")
+        st = os.stat(path)
+        first = common.ucitaj_sa_kesom(path, lambda p: open(p).read(), "t")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("B|X->Y|08:00-09:00,10.00\n")
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        second = common.ucitaj_sa_kesom(path, lambda p: open(p).read(), "t")
+    assert first.startswith("A|")
+    assert second.startswith("B|")
+
+
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_parse_error_with_cache_still_prints_greska(script):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+            f.write("this is not a flight line\n")
+        result, _, _ = run_in_dir(script, tmpdir)
+        assert not os.path.exists(
+            os.path.join(tmpdir, f"flights.txt.{CACHE_TAGS[script]}.idx")
+        )
+    assert "GRESKA" in result.stdout
+
+
+# ===========================================================================
+# Batch query mode (--batch)
+# ===========================================================================
+
+BATCH_PAIRS = ["Beograd->Pariz", "Beograd->Frankfurt", "Frankfurt->Pariz", "Pariz->Beograd"]
+
+
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_batch_matches_single_queries(script):
+    """Each per-pair batch file must be byte-identical to a single-query run."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+            f.write(SAMPLE_FLIGHTS)
+        result = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, script), "--batch", "--out-dir", "out"],
+            input="\n".join(BATCH_PAIRS) + "\n\n",
+            capture_output=True,
+            text=True,
+            cwd=tmpdir,
+        )
+        assert result.stdout == ""
+        direct = open(os.path.join(tmpdir, "flights_direct.txt"), encoding="utf-8").read()
+        batch = {}
+        for pair in BATCH_PAIRS:
+            with open(os.path.join(tmpdir, "out", pair + ".txt"), encoding="utf-8") as f:
+                batch[pair] = f.read()
+
+    for pair in BATCH_PAIRS:
+        _, single_direct, single_indirect = run_script(script, pair)
+        assert direct == single_direct
+        assert batch[pair] == single_indirect
+
+
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_batch_reads_pairs_from_file(script):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+            f.write(SAMPLE_FLIGHTS)
+        with open(os.path.join(tmpdir, "pairs.txt"), "w", encoding="utf-8") as f:
+            f.write("Beograd->Pariz\n")
+        subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, script), "--batch", "pairs.txt"],
+            input="",
+            capture_output=True,
+            text=True,
+            cwd=tmpdir,
+        )
+        out = os.path.join(tmpdir, "flights_indirect", "Beograd->Pariz.txt")
+        assert "Frankfurt" in open(out, encoding="utf-8").read()
+
+
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_batch_escapes_path_separators_in_city_names(script):
+    flights = SAMPLE_FLIGHTS.replace("Frankfurt", "Frankfurt/Main").replace("Pariz", "../Pariz%20")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+            f.write(flights)
+        result = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, script), "--batch", "--out-dir", "out"],
+            input="Beograd->../Pariz%20\nBeograd->Frankfurt/Main\n",
+            capture_output=True,
+            text=True,
+            cwd=tmpdir,
+        )
+        assert result.stdout == ""
+        # Every result stays directly inside the output directory
+        assert sorted(os.listdir(tmpdir)) == ["flights.txt", "flights.txt.%s.idx" % CACHE_TAGS[script],
+                                              "flights_direct.txt", "out"]
+        assert sorted(os.listdir(os.path.join(tmpdir, "out"))) == [
+            "Beograd->..%2FPariz%2520.txt", "Beograd->Frankfurt%2FMain.txt",
+        ]
+        with open(os.path.join(tmpdir, "out", "Beograd->..%2FPariz%2520.txt"), encoding="utf-8") as f:
+            batch = f.read()
+    _, _, single = run_script(script, "Beograd->../Pariz%20", flights)
+    assert "Frankfurt/Main" in batch and batch == single
+
+
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_batch_missing_flights_file_prints_dat_greska(script):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        result = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, script), "--batch"],
+            input="Beograd->Pariz\n",
+            capture_output=True,
+            text=True,
+            cwd=tmpdir,
+        )
+    assert "DAT_GRESKA" in result.stdout
+
+
+# ===========================================================================
+# Query server over a Unix socket (server_flights.py)
+# ===========================================================================
+
+def _server_request(sock, line):
+    """Send one request line and read one framed response."""
+    sock.sendall(line.encode("utf-8") + b"\n")
+    f = sock.makefile("rb")
+    header = f.readline().decode("ascii")
+    if not header.startswith("OK "):
+        return header.strip()
+    return f.read(int(header.split()[1])).decode("utf-8")
+
+
+def test_server_answers_queries_and_stats():
+    import json
+    import socket
+    import time
+
+    oai = load_module("OAI_flights.py")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        flights = os.path.join(tmpdir, "flights.txt")
+        with open(flights, "w", encoding="utf-8") as f:
+            f.write(SAMPLE_FLIGHTS)
+        sock_path = os.path.join(tmpdir, "flights.sock")
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(REPO_DIR, "server_flights.py"),
+             "--flights", flights, "--socket", sock_path],
+            cwd=tmpdir,
+        )
+        try:
+            deadline = time.time() + 10
+            while not os.path.exists(sock_path) and time.time() < deadline:
+                time.sleep(0.05)
+
+            expected_path = os.path.join(tmpdir, "expected.txt")
+            _, seg_map = oai.procitaj_flights_file(flights)
+            oai.upisi_indirect(seg_map, "Beograd", "Pariz", expected_path)
+            expected = open(expected_path, encoding="utf-8").read()
+
+            clients = [socket.socket(socket.AF_UNIX) for _ in range(3)]
+            for c in clients:
+                c.connect(sock_path)
+            for c in clients:
+                assert _server_request(c, "Beograd->Pariz") == expected
+            assert _server_request(clients[0], "no arrow here") == "GRESKA"
+
+            stats = json.loads(_server_request(clients[1], "STATS"))
+            assert stats["upiti"] == 3
+            assert stats["p50_ms"] is not None and stats["p99_ms"] >= stats["p50_ms"]
+            assert stats["uptime_s"] >= 0
+            for c in clients:
+                c.close()
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+def _start_server(tmpdir, sock_path):
+    """Start server_flights.py and wait until it accepts connections (or exits)."""
+    import socket
+    import time
+
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, "server_flights.py"),
+         "--flights", os.path.join(tmpdir, "flights.txt"), "--socket", sock_path],
+        cwd=tmpdir, stdout=subprocess.PIPE, text=True,
+    )
+    deadline = time.time() + 10
+    while time.time() < deadline and proc.poll() is None:
+        with socket.socket(socket.AF_UNIX) as probe:
+            try:
+                probe.connect(sock_path)
+                break
+            except OSError:
+                time.sleep(0.05)
+    return proc
+
+
+def test_server_keeps_running_server_socket_and_replaces_stale_one():
+    import socket
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+            f.write(SAMPLE_FLIGHTS)
+        sock_path = os.path.join(tmpdir, "flights.sock")
+
+        # A socket file nobody listens on is taken over
+        stale = socket.socket(socket.AF_UNIX)
+        stale.bind(sock_path)
+        stale.close()
+        first = _start_server(tmpdir, sock_path)
+        try:
+            with socket.socket(socket.AF_UNIX) as c:
+                c.connect(sock_path)
+                assert "Beograd->Frankfurt->Pariz" in _server_request(c, "Beograd->Pariz")
+
+            # A second server must not steal the socket of the running one
+            second = _start_server(tmpdir, sock_path)
+            out, _ = second.communicate(timeout=10)
+            assert out == "GRESKA\n"
+            with socket.socket(socket.AF_UNIX) as c:
+                c.connect(sock_path)
+                assert _server_request(c, "STATS").startswith("{")
+        finally:
+            first.terminate()
+            first.communicate(timeout=10)
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_server_streams_response_in_chunks(seed, tmp_path):
+    srv = load_module("server_flights.py")
+    oai = load_module("OAI_flights.py")
+    path = tmp_path / "flights.txt"
+    path.write_text(_random_flights_text(seed, n_lines=150), encoding="utf-8")
+    _, seg_map = oai.procitaj_flights_file(str(path))
+
+    for dep, lan in [("A", "B"), ("C", "F"), ("A", "Nowhere")]:
+        oai.upisi_indirect(seg_map, dep, lan, str(tmp_path / "expected.txt"))
+        expected = (tmp_path / "expected.txt").read_bytes()
+        size, parts = srv.pripremi_odgovor(seg_map, f"{dep}->{lan}")
+        chunks = []
+        while True:
+            chunk = srv.sledeci_komad(parts, 64)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        assert size == len(expected) and b"".join(chunks) == expected
+        if len(expected) > 1000:
+            assert len(chunks) > 1 and max(map(len, chunks)) < len(expected) / 2
+    assert srv.pripremi_odgovor(seg_map, "no arrow here") is None
+
+
+def test_server_percentile_nearest_rank():
+    srv = load_module("server_flights.py")
+    data = list(range(1, 101))
+    assert srv.percentil(data, 50) == 50
+    assert srv.percentil(data, 99) == 99
+    assert srv.percentil([], 50) is None
+
+
+# ===========================================================================
+# Multi-transfer earliest-arrival search (search_flights.py, Connection Scan)
+# ===========================================================================
+
+# Zero-duration legs in one minute, listed against their travel order
+SAME_MINUTE_FLIGHTS = textwrap.dedent("""\
+    A|B->C|10:00-10:00,5
+    A|X->B|10:00-10:00,5
+""")
+
+CHAIN_FLIGHTS = textwrap.dedent("""\
+    Slow|A->D|06:00-23:00,50.00
+    Fast|A->B|06:00-07:00,10.00
+    Fast|B->C|07:00-08:00,10.00
+    Fast|C->D|08:30-09:00,10.00
+    Mid|B->D|07:30-12:00,30.00
+""")
+
+
+def _brute_force_earliest(seg_map, dep, lan, max_legs, start=0):
+    """Exhaustive DFS over journeys with at most max_legs flights."""
+    flights = [f for fl in seg_map.values() for f in fl if f[4] >= f[3]]
+    best = None
+
+    def dfs(city, t, legs):
+        nonlocal best
+        if city == lan and legs:
+            best = t if best is None else min(best, t)
+            return
+        if legs == max_legs:
+            return
+        for f in flights:
+            if f[1] == city and f[3] >= t:
+                dfs(f[2], f[4], legs + 1)
+
+    dfs(dep, start, 0)
+    return best
+
+
+class TestConnectionScan:
+    @pytest.fixture(autouse=True)
+    def _load(self, tmp_path):
+        self.oai = load_module("OAI_flights.py")
+        self.search = load_module("search_flights.py")
+        path = tmp_path / "flights.txt"
+        path.write_text(CHAIN_FLIGHTS, encoding="utf-8")
+        _, self.seg_map = self.oai.procitaj_flights_file(str(path))
+        self.prep = self.search.pripremi_konekcije(self.seg_map)
+
+    def test_transfer_limit_changes_answer(self):
+        j0 = self.search.najraniji_dolazak(self.prep, "A", "D", max_presedanja=0)
+        j1 = self.search.najraniji_dolazak(self.prep, "A", "D", max_presedanja=1)
+        j2 = self.search.najraniji_dolazak(self.prep, "A", "D", max_presedanja=2)
+        assert [f[0] for f in j0] == ["Slow"]
+        assert [f[0] for f in j1] == ["Fast", "Mid"]
+        assert [f[0] for f in j2] == ["Fast", "Fast", "Fast"]
+        assert j2[-1][4] == 9 * 60
+
+    def test_unreachable_and_departure_time(self):
+        assert self.search.najraniji_dolazak(self.prep, "D", "A", 3) is None
+        late = self.search.najraniji_dolazak(self.prep, "A", "D", 3, pocetak=6 * 60 + 1)
+        assert late is None
+
+    def test_same_minute_zero_duration_chain(self, tmp_path):
+        path = tmp_path / "same_minute.txt"
+        path.write_text(SAME_MINUTE_FLIGHTS, encoding="utf-8")
+        _, seg_map = self.oai.procitaj_flights_file(str(path))
+        j = self.search.najraniji_dolazak(self.search.pripremi_konekcije(seg_map), "X", "C", 1)
+        assert [(f[1], f[2]) for f in j] == [("X", "B"), ("B", "C")]
+
+    def test_matches_brute_force_on_random_timetables(self):
+        import random
+        rnd = random.Random(7)
+        cities = ["A", "B", "C", "D", "E"]
+        for _ in range(30):
+            seg_map = {}
+            for _ in range(25):
+                fr, to = rnd.sample(cities, 2)
+                # Shared minutes and zero-duration legs exercise same-minute chains
+                d = rnd.choice((600, rnd.randint(0, 1200)))
+                a = d + rnd.choice((0, rnd.randint(0, 180)))
+                f = ("X", fr, to, d, a, "", "", 1.0)
+                seg_map.setdefault((fr, to), []).append(f)
+            prep = self.search.pripremi_konekcije(seg_map)
+            for k in range(3):
+                j = self.search.najraniji_dolazak(prep, "A", "E", k)
+                expected = _brute_force_earliest(seg_map, "A", "E", k + 1)
+                assert (j[-1][4] if j else None) == expected
+                if j:
+                    assert len(j) <= k + 1
+                    assert all(j[i + 1][3] >= j[i][4] for i in range(len(j) - 1))
+
+    def test_cli_flag_writes_journey(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+                f.write(CHAIN_FLIGHTS)
+            subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--max-transfers", "2"],
+                input="A->D", capture_output=True, text=True, cwd=tmpdir,
+            )
+            indirect = open(os.path.join(tmpdir, "flights_indirect.txt"), encoding="utf-8").read()
+        assert indirect == (
+            "A->B->C->D\n"
+            "A->B|Fast|06:00-07:00,10.00\n"
+            "B->C|Fast|07:00-08:00,10.00\n"
+            "C->D|Fast|08:30-09:00,10.00\n"
+        )
+
+
+def _brute_force_pareto(seg_map, dep, lan, max_legs, start=0):
+    """All non-dominated (arrival, price, legs) triples by exhaustive DFS."""
+    flights = [f for fl in seg_map.values() for f in fl if f[4] >= f[3]]
+    found = set()
+
+    def dfs(city, t, price, legs):
+        if city == lan and legs:
+            found.add((t, price, legs))
+            return
+        if legs == max_legs:
+            return
+        for f in flights:
+            if f[1] == city and f[3] >= t:
+                dfs(f[2], f[4], price + f[7], legs + 1)
+
+    dfs(dep, start, 0.0, 0)
+    return sorted(
+        x for x in found
+        if not any(y != x and all(y[i] <= x[i] for i in range(3)) for y in found)
+    )
+
+
+class TestPareto:
+    @pytest.fixture(autouse=True)
+    def _load(self, tmp_path):
+        self.oai = load_module("OAI_flights.py")
+        self.search = load_module("search_flights.py")
+        path = tmp_path / "flights.txt"
+        path.write_text(CHAIN_FLIGHTS, encoding="utf-8")
+        _, self.seg_map = self.oai.procitaj_flights_file(str(path))
+        self.prep = self.search.pripremi_konekcije(self.seg_map)
+
+    @staticmethod
+    def _triples(journeys):
+        return [(j[-1][4], sum(f[7] for f in j), len(j)) for j in journeys]
+
+    def test_frontier_on_chain(self):
+        journeys = self.search.pareto_putovanja(self.prep, "A", "D", max_presedanja=2)
+        # Fast chain: earliest and cheapest but 2 transfers; Mid: 1 transfer;
+        # Slow: direct. None dominates another.
+        assert self._triples(journeys) == [(540, 30.0, 3), (720, 40.0, 2), (1380, 50.0, 1)]
+
+    def test_same_minute_zero_duration_chain(self, tmp_path):
+        path = tmp_path / "same_minute.txt"
+        path.write_text(SAME_MINUTE_FLIGHTS, encoding="utf-8")
+        _, seg_map = self.oai.procitaj_flights_file(str(path))
+        journeys = self.search.pareto_putovanja(self.search.pripremi_konekcije(seg_map), "X", "C", 1)
+        assert self._triples(journeys) == [(600, 10.0, 2)]
+
+    def test_matches_brute_force_on_random_timetables(self):
+        import random
+        rnd = random.Random(11)
+        cities = ["A", "B", "C", "D", "E"]
+        for _ in range(30):
+            seg_map = {}
+            for _ in range(25):
+                fr, to = rnd.sample(cities, 2)
+                # Shared minutes and zero-duration legs exercise same-minute chains
+                d = rnd.choice((600, rnd.randint(0, 1200)))
+                a = d + rnd.choice((0, rnd.randint(0, 180)))
+                f = ("X", fr, to, d, a, "", "", float(rnd.randint(1, 20)))
+                seg_map.setdefault((fr, to), []).append(f)
+            prep = self.search.pripremi_konekcije(seg_map)
+            for k in range(3):
+                got = self._triples(self.search.pareto_putovanja(prep, "A", "E", k))
+                assert got == _brute_force_pareto(seg_map, "A", "E", k + 1)
+
+    def test_cli_flag_writes_frontier_with_totals(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+                f.write(CHAIN_FLIGHTS)
+            subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--pareto"],
+                input="A->D", capture_output=True, text=True, cwd=tmpdir,
+            )
+            indirect = open(os.path.join(tmpdir, "flights_indirect.txt"), encoding="utf-8").read()
+        assert indirect == (
+            "A->B->D,40.00\n"
+            "A->B|Fast|06:00-07:00,10.00\n"
+            "B->D|Mid|07:30-12:00,30.00\n"
+            "A->D,50.00\n"
+            "A->D|Slow|06:00-23:00,50.00\n"
+        )
+
+
+def _brute_force_prices(seg_map, dep, lan, max_legs, start=0):
+    """Sorted total prices of every feasible journey with at most max_legs flights."""
+    flights = [f for fl in seg_map.values() for f in fl if f[4] >= f[3]]
+    prices = []
+
+    def dfs(city, t, price, legs):
+        if city == lan and legs:
+            prices.append(price)
+            return
+        if legs == max_legs:
+            return
+        for f in flights:
+            if f[1] == city and f[3] >= t:
+                dfs(f[2], f[4], price + f[7], legs + 1)
+
+    dfs(dep, start, 0.0, 0)
+    return sorted(prices)
+
+
+class TestTopK:
+    @pytest.fixture(autouse=True)
+    def _load(self, tmp_path):
+        self.oai = load_module("OAI_flights.py")
+        self.search = load_module("search_flights.py")
+        path = tmp_path / "flights.txt"
+        path.write_text(CHAIN_FLIGHTS, encoding="utf-8")
+        _, self.seg_map = self.oai.procitaj_flights_file(str(path))
+        self.graf = self.search.pripremi_izlazne(self.seg_map)
+
+    def test_cheapest_first(self):
+        journeys = self.search.najjeftinija_putovanja(self.graf, "A", "D", 2)
+        assert [sum(f[7] for f in j) for j in journeys] == [30.0, 40.0]
+        assert [f[0] for f in journeys[0]] == ["Fast", "Fast", "Fast"]
+
+    def test_transfer_limit(self):
+        journeys = self.search.najjeftinija_putovanja(self.graf, "A", "D", 5, max_presedanja=0)
+        assert [[f[0] for f in j] for j in journeys] == [["Slow"]]
+
+    def test_matches_brute_force_on_random_timetables(self):
+        import random
+        rnd = random.Random(3)
+        cities = ["A", "B", "C", "D", "E"]
+        for _ in range(30):
+            seg_map = {}
+            for _ in range(25):
+                fr, to = rnd.sample(cities, 2)
+                d = rnd.randint(0, 1200)
+                a = d + rnd.randint(0, 180)
+                f = ("X", fr, to, d, a, "", "", float(rnd.randint(1, 20)))
+                seg_map.setdefault((fr, to), []).append(f)
+            graf = self.search.pripremi_izlazne(seg_map)
+            for legs in (1, 2, 3):
+                expected = _brute_force_prices(seg_map, "A", "E", legs)[:4]
+                got = self.search.najjeftinija_putovanja(graf, "A", "E", 4, legs - 1)
+                assert [sum(f[7] for f in j) for j in got] == expected
+                for j in got:
+                    assert all(j[i + 1][3] >= j[i][4] for i in range(len(j) - 1))
+
+    def test_cli_flag(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+                f.write(CHAIN_FLIGHTS)
+            subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--top-k", "1"],
+                input="A->D", capture_output=True, text=True, cwd=tmpdir,
+            )
+            indirect = open(os.path.join(tmpdir, "flights_indirect.txt"), encoding="utf-8").read()
+        assert indirect.splitlines()[0] == "A->B->C->D,30.00"
+
+
+# ===========================================================================
+# Columnar timetable (columnar_flights.py)
+# ===========================================================================
+
+def _random_flights_text(seed, n_lines=60, cities=("A", "B", "C", "D", "E", "F")):
+    """Random flights.txt with ties, unpadded times and awkward prices."""
+    import random
+    rnd = random.Random(seed)
+    lines = []
+    for _ in range(n_lines):
+        fr, to = rnd.sample(cities, 2)
+        toks = []
+        for _ in range(rnd.randint(1, 4)):
+            d = rnd.choice([360, 420, 480, 480, 600, 720])
+            a = d + rnd.choice([30, 60, 60, 90])
+            dep = f"{d // 60}:{d % 60:02d}" if rnd.random() < 0.2 else f"{d // 60:02d}:{d % 60:02d}"
+            price = rnd.choice(["100", "99.5", "0.125", "1.005", "12.345", "7"])
+            toks.append(f"{dep}-{a // 60:02d}:{a % 60:02d},{price}")
+        lines.append(f"{rnd.choice(['Zed', 'Air', 'Bee'])}|{fr}->{to}|{';'.join(toks)}")
+    return "\n".join(lines) + "\n"
+
+
+class TestColumnar:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.oai = load_module("OAI_flights.py")
+        self.kol = load_module("columnar_flights.py")
+
+    def test_cents_roundtrip_matches_float_format(self):
+        for price in [0.0, 0.125, 1.005, 150.0, 99.999, 12.345, -3.5, 1e6, -0.0, -0.001]:
+            assert self.kol.cente_u_tekst(self.kol.cena_u_cente(price)) == f"{price:.2f}"
+        for price in [float("inf"), float("-inf"), float("nan"), 1e20]:
+            assert self.kol.cena_u_cente(price) is None
+
+    UNREPRESENTABLE = [
+        "A|B->C|600:00-601:00,10.00\n",
+        "A|B->C|08:00-09:00,inf\n",
+        "A|B->C|08:00-09:00,nan\n",
+        "A|B->C|08:00-09:00,1e20\n",
+    ]
+
+    @pytest.mark.parametrize("line", UNREPRESENTABLE)
+    def test_unrepresentable_timetable_is_not_loaded(self, tmp_path, line):
+        path = tmp_path / "flights.txt"
+        path.write_text(SAMPLE_FLIGHTS + line, encoding="utf-8")
+        assert self.kol.procitaj_kolone(str(path)) is None
+        # Remembered in the sidecar cache as well
+        assert self.kol.ucitaj_kolone_sa_kesom(str(path)) is None
+        assert self.kol.ucitaj_kolone_sa_kesom(str(path)) is None
+
+    @pytest.mark.parametrize("engine", [
+        "--columnar",
+        pytest.param("--engine numpy", marks=pytest.mark.skipif(not HAS_NUMPY, reason="numpy not installed")),
+    ])
+    @pytest.mark.parametrize("line", UNREPRESENTABLE + [
+        "A|B->C|08:00-09:00,-0.0\nA|C->Pariz|10:00-11:00,-0.001\n",
+    ])
+    def test_cli_accepts_what_default_accepts(self, engine, line):
+        timetable = SAMPLE_FLIGHTS + line
+        result, direct, indirect = run_script(f"OAI_flights.py {engine}", "B->Pariz", timetable)
+        assert result.stdout == ""
+        assert (direct, indirect) == run_script("OAI_flights.py", "B->Pariz", timetable)[1:]
+        if "-0.0" in line:
+            assert "08:00-09:00,-0.00" in direct and "10:00-11:00,-0.00" in indirect
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_writers_match_tuple_writers(self, tmp_path, seed):
+        path = tmp_path / "flights.txt"
+        path.write_text(_random_flights_text(seed), encoding="utf-8")
+        route_map, seg_map = self.oai.procitaj_flights_file(str(path))
+        kol = self.kol.procitaj_kolone(str(path))
+
+        self.oai.upisi_direct(route_map, str(tmp_path / "d1.txt"))
+        self.kol.upisi_direct_kolone(kol, str(tmp_path / "d2.txt"))
+        assert (tmp_path / "d1.txt").read_bytes() == (tmp_path / "d2.txt").read_bytes()
+
+        for dep, lan in [("A", "B"), ("C", "F"), ("E", "A"), ("A", "Nowhere")]:
+            self.oai.upisi_indirect(seg_map, dep, lan, str(tmp_path / "i1.txt"))
+            self.kol.upisi_indirect_kolone(kol, dep, lan, str(tmp_path / "i2.txt"))
+            assert (tmp_path / "i1.txt").read_bytes() == (tmp_path / "i2.txt").read_bytes()
+
+    def test_cache_roundtrip(self, tmp_path):
+        path = tmp_path / "flights.txt"
+        path.write_text(SAMPLE_FLIGHTS, encoding="utf-8")
+        kol = self.kol.procitaj_kolone(str(path))
+        again = self.kol.iz_kesa(self.kol.u_kes(kol))
+        assert again == kol
+
+    @pytest.mark.parametrize("seed", [4, 5])
+    def test_numpy_engine_matches_python(self, tmp_path, seed):
+        pytest.importorskip("numpy")
+        path = tmp_path / "flights.txt"
+        path.write_text(_random_flights_text(seed, n_lines=200), encoding="utf-8")
+        kol = self.kol.procitaj_kolone(str(path))
+        for dep, lan in [("A", "B"), ("C", "F"), ("E", "A"), ("A", "Nowhere")]:
+            self.kol.upisi_indirect_kolone(kol, dep, lan, str(tmp_path / "i1.txt"))
+            self.kol.upisi_indirect_numpy(kol, dep, lan, str(tmp_path / "i2.txt"))
+            assert (tmp_path / "i1.txt").read_bytes() == (tmp_path / "i2.txt").read_bytes()
+
+    def test_numpy_engine_writes_dense_hub_in_chunks(self, tmp_path, monkeypatch):
+        pytest.importorskip("numpy")
+        import io
+
+        lines = [f"Air|P->H|{h:02d}:00-{h:02d}:30,10.00" for h in range(0, 12)]
+        lines += [f"Bee|H->O|{h:02d}:00-{h:02d}:30,20.00" for h in range(12, 24)]
+        path = tmp_path / "flights.txt"
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        kol = self.kol.procitaj_kolone(str(path))
+
+        writes = []
+
+        class Recorder(io.StringIO):
+            def write(self, text):
+                writes.append(len(text))
+                return super().write(text)
+
+            def close(self):
+                self.text = self.getvalue()
+
+        recorder = Recorder()
+        pisi_delove = self.kol.pisi_delove
+        monkeypatch.setattr(self.kol, "otvori_izlaz", lambda path: recorder)
+        monkeypatch.setattr(self.kol, "pisi_delove", lambda out, delovi: pisi_delove(out, delovi, 4))
+        self.kol.upisi_indirect_numpy(kol, "P", "O", "ignored")
+        monkeypatch.undo()
+
+        self.kol.upisi_indirect_kolone(kol, "P", "O", str(tmp_path / "expected.txt"))
+        assert recorder.text == (tmp_path / "expected.txt").read_text(encoding="utf-8")
+        # 12 first legs, two parts each, at most 4 parts per write
+        assert len(writes) >= 6
+        assert max(writes) < len(recorder.text) / 2
+
+    @pytest.mark.parametrize("writer", ["direct", "indirect"])
+    def test_python_writers_batch_rows_through_pisi_delove(self, tmp_path, monkeypatch, writer):
+        import io
+
+        path = tmp_path / "flights.txt"
+        path.write_text(_random_flights_text(6, n_lines=200), encoding="utf-8")
+        kol = self.kol.procitaj_kolone(str(path))
+        if writer == "direct":
+            def write(out_path):
+                self.kol.upisi_direct_kolone(kol, out_path)
+        else:
+            def write(out_path):
+                self.kol.upisi_indirect_kolone(kol, "A", "B", out_path)
+        write(str(tmp_path / "expected.txt"))
+        expected = (tmp_path / "expected.txt").read_text(encoding="utf-8")
+
+        writes = []
+        recorder = io.StringIO()
+        real_write = recorder.write
+        recorder.write = lambda text: writes.append(text) or real_write(text)
+        recorder.close = lambda: None
+        monkeypatch.setattr(self.kol, "otvori_izlaz", lambda path: recorder)
+        write("ignored")
+
+        assert recorder.getvalue() == expected
+        rows = expected.count("\n")
+        assert rows > 50 and len(writes) == 1
+
+    def test_cli_columnar_matches_default(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+                f.write(SAMPLE_FLIGHTS)
+            result = subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--columnar"],
+                input="Beograd->Pariz", capture_output=True, text=True, cwd=tmpdir,
+            )
+            assert result.stdout == ""
+            direct = open(os.path.join(tmpdir, "flights_direct.txt"), encoding="utf-8").read()
+            indirect = open(os.path.join(tmpdir, "flights_indirect.txt"), encoding="utf-8").read()
+        _, exp_direct, exp_indirect = run_script("OAI_flights.py", "Beograd->Pariz")
+        assert (direct, indirect) == (exp_direct, exp_indirect)
+
+
+# ===========================================================================
+# Bounded-memory streaming (stream_flights.py)
+# ===========================================================================
+
+class TestStreaming:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.oai = load_module("OAI_flights.py")
+        self.stream = load_module("stream_flights.py")
+
+    @pytest.mark.parametrize("chunk", [1, 3, 1000])
+    def test_matches_in_memory_writers(self, tmp_path, chunk):
+        path = tmp_path / "flights.txt"
+        path.write_text(_random_flights_text(8, n_lines=120), encoding="utf-8")
+        route_map, seg_map = self.oai.procitaj_flights_file(str(path))
+        self.oai.upisi_direct(route_map, str(tmp_path / "d1.txt"))
+        pairs = [("A", "B"), ("C", "F"), ("A", "Nowhere")]
+        upiti = [(d, l, str(tmp_path / f"s_{d}_{l}.txt")) for d, l in pairs]
+        self.stream.obradi_tokom(str(path), str(tmp_path / "d2.txt"), upiti, chunk, str(tmp_path))
+
+        assert (tmp_path / "d1.txt").read_bytes() == (tmp_path / "d2.txt").read_bytes()
+        for dep, lan, out in upiti:
+            self.oai.upisi_indirect(seg_map, dep, lan, str(tmp_path / "i.txt"))
+            assert (tmp_path / "i.txt").read_bytes() == open(out, "rb").read()
+        # Spill files are cleaned up
+        assert not [p for p in os.listdir(tmp_path) if p.startswith("flights_sort_")]
+
+    def test_external_sort_spills_to_disk(self, tmp_path, monkeypatch):
+        spills = []
+        original = self.stream.prelij_na_disk
+        monkeypatch.setattr(
+            self.stream, "prelij_na_disk",
+            lambda deo, d: spills.append(len(deo)) or original(deo, d),
+        )
+        flights = [("X", "A", "B", m, m + 10, "", "", 1.0) for m in range(10, 0, -1)]
+        out = list(self.stream.sortiraj_spolja(iter(flights), 3, str(tmp_path)))
+        assert [f[3] for f in out] == list(range(1, 11))
+        assert spills == [3, 3, 3, 1]
+
+    def test_malformed_line_prints_greska_without_output(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+                f.write(SAMPLE_FLIGHTS + "garbage line\n")
+            result = subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--stream"],
+                input="Beograd->Pariz", capture_output=True, text=True, cwd=tmpdir,
+            )
+            assert not os.path.exists(os.path.join(tmpdir, "flights_direct.txt"))
+        assert result.stdout.strip() == "GRESKA"
+
+
+# ===========================================================================
+# Parallel parsing by byte ranges (parallel_flights.py)
+# ===========================================================================
+
+class TestParallelParsing:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.oai = load_module("OAI_flights.py")
+        # Worker functions are pickled by module name, so import it normally
+        self.par = importlib.import_module("parallel_flights")
+
+    def _assert_same(self, expected, actual):
+        (route_exp, seg_exp), (route_act, seg_act) = expected, actual
+        assert list(route_act) == list(route_exp)
+        for key in route_exp:
+            assert list(route_act[key]) == list(route_exp[key])
+            assert route_act[key] == route_exp[key]
+        assert list(seg_act) == list(seg_exp)
+        assert seg_act == seg_exp
+
+    def test_chunks_are_line_aligned_and_cover_file(self, tmp_path):
+        path = tmp_path / "flights.txt"
+        path.write_bytes(_random_flights_text(1).encode("utf-8"))
+        data = path.read_bytes()
+        for n in range(1, 8):
+            chunks = self.par.granice_delova(str(path), n)
+            assert chunks[0][0] == 0 and chunks[-1][1] == len(data)
+            assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+            assert all(data[start - 1:start] == b"\n" for start, _ in chunks[1:])
+
+    @pytest.fixture
+    def many_cores(self, monkeypatch):
+        # Worker count is capped at os.cpu_count(); exercise the merge anyway
+        monkeypatch.setattr(os, "cpu_count", lambda: 8)
+
+    @pytest.mark.parametrize("workers", [1, 2, 3, 5])
+    @pytest.mark.parametrize("newline", ["\n", "\r\n"])
+    def test_matches_single_process(self, tmp_path, workers, newline, many_cores):
+        path = tmp_path / "flights.txt"
+        text = _random_flights_text(workers, n_lines=150).replace("\n", newline)
+        path.write_bytes(text.rstrip().encode("utf-8"))
+        expected = self.oai.procitaj_flights_file(str(path))
+        actual = self.par.procitaj_paralelno(str(path), workers, min_po_delu=1)
+        self._assert_same(expected, actual)
+
+    def test_error_in_worker_is_raised(self, tmp_path, many_cores):
+        path = tmp_path / "flights.txt"
+        lines = _random_flights_text(3, n_lines=90).splitlines()
+        lines.insert(45, "garbage line")
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        with pytest.raises(ValueError):
+            self.par.procitaj_paralelno(str(path), 3, min_po_delu=1)
+
+    @pytest.mark.parametrize("cores, min_bytes", [(1, 1), (8, 1 << 30)])
+    def test_one_core_or_small_file_parses_serially(self, tmp_path, monkeypatch, cores, min_bytes):
+        path = tmp_path / "flights.txt"
+        path.write_text(_random_flights_text(4, n_lines=60), encoding="utf-8")
+        monkeypatch.setattr(os, "cpu_count", lambda: cores)
+
+        def no_pool(*args, **kwargs):
+            raise AssertionError("process pool started")
+        monkeypatch.setattr(self.par, "ProcessPoolExecutor", no_pool)
+        actual = self.par.procitaj_paralelno(str(path), 4, min_po_delu=min_bytes)
+        self._assert_same(self.oai.procitaj_flights_file(str(path)), actual)
+
+
+# ===========================================================================
+# Bytes-level mmap parser (mmap_flights.py)
+# ===========================================================================
+
+class TestMmapParser:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.oai = load_module("OAI_flights.py")
+        self.mm = load_module("mmap_flights.py")
+
+    @pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+    @pytest.mark.parametrize("seed", [1, 2])
+    def test_matches_text_parser(self, tmp_path, seed, newline):
+        path = tmp_path / "flights.txt"
+        text = _random_flights_text(seed, n_lines=120) + " Air | A -> B | 08:00 - 09:00 , 5 ;; \n\nBee|C->D|;\n"
+        path.write_bytes(text.replace("\n", newline).encode("utf-8"))
+        expected = self.oai.procitaj_flights_file(str(path))
+        actual = self.mm.procitaj_mmap(str(path))
+        assert actual == expected
+        assert [list(m) for m in actual] == [list(m) for m in expected]
+
+    def test_names_are_interned(self, tmp_path):
+        path = tmp_path / "flights.txt"
+        path.write_text("Air|A->B|08:00-09:00,1;10:00-11:00,2\nAir|B->A|08:00-09:00,3\n", encoding="utf-8")
+        _, seg_map = self.mm.procitaj_mmap(str(path))
+        f1, f2 = seg_map[("A", "B")]
+        (f3,) = seg_map[("B", "A")]
+        assert f1[0] is f2[0] is f3[0]
+        assert f1[1] is f3[2]
+        assert f1[5] is f3[5]
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "flights.txt"
+        path.write_bytes(b"")
+        assert self.mm.procitaj_mmap(str(path)) == ({}, {})
+
+    @pytest.mark.parametrize("line", [
+        "garbage line", "Air|AB|08:00-09:00,1", "Air|A->B|08:00-09:00", "Air|A->B|0800,1",
+        "Air|A->B|08-09:00,1", "Air|A->B|08:00-09:00,x", "|A->B|08:00-09:00,1",
+    ])
+    def test_malformed_lines_raise_like_text_parser(self, tmp_path, line):
+        path = tmp_path / "flights.txt"
+        path.write_text(SAMPLE_FLIGHTS + line + "\n", encoding="utf-8")
+        with pytest.raises(ValueError):
+            self.oai.procitaj_flights_file(str(path))
+        with pytest.raises(ValueError):
+            self.mm.procitaj_mmap(str(path))
+
+
+# ===========================================================================
+# Incremental updates (delta_flights.py)
+# ===========================================================================
+
+def _apply_delta_to_text(lines, delta):
+    """Reference: the same delta applied by rewriting flights.txt lines."""
+    lines = list(lines)
+    for change in delta:
+        op, rest = change[0], change[1:]
+        airline, route = [x.strip() for x in rest.split("|")[:2]]
+        if op in "=-":
+            lines = [
+                line for line in lines
+                if [x.strip() for x in line.split("|")[:2]] != [airline, route]
+            ]
+        if op in "+=":
+            lines.append(rest)
+    return lines
+
+
+class TestDelta:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.oai = load_module("OAI_flights.py")
+        self.delta = importlib.import_module("delta_flights")
+
+    DELTA = [
+        "+Air|A->B|05:00-06:00,1.5;23:00-23:30,2",
+        "=Zed|C->D|07:00-08:00,10",
+        "-Bee|A->C",
+        "+Bee|X->A|06:00-06:30,3",
+        "-Air|E->F",
+        "=Air|Q->R|01:00-02:00,4",
+        "-Air|Q->R",
+    ]
+
+    def test_parse_changes(self):
+        assert self.delta.parsiraj_izmenu("  ") is None
+        op, airline, dep, lan, flights = self.delta.parsiraj_izmenu("- Air | A -> B ")
+        assert (op, airline, dep, lan, flights) == ("-", "Air", "A", "B", [])
+        op, airline, dep, lan, flights = self.delta.parsiraj_izmenu("=Air|A->B|08:00-09:00,5")
+        assert (op, airline, dep, lan, len(flights)) == ("=", "Air", "A", "B", 1)
+        for bad in ["*Air|A->B|08:00-09:00,5", "-Air|A->B|08:00-09:00,5", "-Air|AB",
+                    "+Air|A->B|", "+Air|A->B|08:00,5"]:
+            with pytest.raises(ValueError):
+                self.delta.parsiraj_izmenu(bad)
+
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_matches_rebuild_from_scratch(self, tmp_path, seed):
+        lines = _random_flights_text(seed, n_lines=80).splitlines()
+        old = tmp_path / "old.txt"
+        new = tmp_path / "new.txt"
+        old.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        new.write_text("\n".join(_apply_delta_to_text(lines, self.DELTA)) + "\n", encoding="utf-8")
+
+        route_map, seg_map = self.oai.procitaj_flights_file(str(old))
+        self.oai.upisi_direct(route_map, str(tmp_path / "d1.txt"))
+        changes = [self.delta.parsiraj_izmenu(line) for line in self.DELTA]
+        changed = self.delta.primeni_izmene(route_map, seg_map, changes)
+        self.delta.azuriraj_direct(route_map, changed, str(tmp_path / "d1.txt"))
+
+        route_exp, seg_exp = self.oai.procitaj_flights_file(str(new))
+        assert (route_map, seg_map) == (route_exp, seg_exp)
+        self.oai.upisi_direct(route_exp, str(tmp_path / "d2.txt"))
+        assert (tmp_path / "d1.txt").read_bytes() == (tmp_path / "d2.txt").read_bytes()
+
+        assert self.delta.zahvacen_upit("A", "Z", changed)
+        assert self.delta.zahvacen_upit("Z", "D", changed)
+        assert not self.delta.zahvacen_upit("D", "E", changed)
+
+    FIRST = "-AirFrance|Beograd->Pariz\n"
+    SECOND = "=Lufthansa|Frankfurt->Pariz|11:00-12:00,95.00\n"
+    PAIRS = "Beograd->Pariz\nPariz->Frankfurt\n"
+
+    def _run_delta(self, tmpdir, *deltas):
+        options = ["--batch"]
+        for name in deltas:
+            options += ["--delta", name]
+        result = subprocess.run([sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), *options],
+                                input=self.PAIRS, capture_output=True, text=True, cwd=tmpdir)
+        assert result.stdout == ""
+        with open(os.path.join(tmpdir, "flights_direct.txt"), encoding="utf-8") as f:
+            direct = f.read()
+        with open(os.path.join(tmpdir, "flights_indirect", "Beograd->Pariz.txt"), encoding="utf-8") as f:
+            indirect = f.read()
+        return direct, indirect
+
+    @staticmethod
+    def _setup(tmpdir, **files):
+        files.setdefault("flights.txt", SAMPLE_FLIGHTS)
+        for name, text in files.items():
+            with open(os.path.join(tmpdir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+
+    def test_cli_rewrites_only_affected_results(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._setup(tmpdir, **{"first.txt": self.FIRST, "second.txt": self.SECOND})
+            self._run_delta(tmpdir, "first.txt")
+            assert os.path.exists(os.path.join(tmpdir, "flights.txt.oai-delta.idx"))
+
+            untouched = os.path.join(tmpdir, "flights_indirect", "Pariz->Frankfurt.txt")
+            mtime = os.stat(untouched).st_mtime_ns
+            direct, indirect = self._run_delta(tmpdir, "first.txt", "second.txt")
+            assert os.stat(untouched).st_mtime_ns == mtime
+
+            # Patched in place, but with the permissions of a freshly written file
+            if os.name != "nt":
+                mode = os.stat(os.path.join(tmpdir, "flights.txt")).st_mode & 0o777
+                for name in ("flights_direct.txt", "flights.txt.oai-delta.json"):
+                    assert os.stat(os.path.join(tmpdir, name)).st_mode & 0o777 == mode
+
+        updated = SAMPLE_FLIGHTS.replace("AirFrance|Beograd->Pariz|09:00-11:00,200.00\n", "")
+        updated = updated.replace("10:00-11:30,90.00", "11:00-12:00,95.00")
+        _, exp_direct, exp_indirect = run_script("OAI_flights.py", "Beograd->Pariz", updated)
+        assert (direct, indirect) == (exp_direct, exp_indirect)
+
+    def test_cli_other_chain_or_plain_run_regenerates_everything(self):
+        """Outputs of another delta chain, or of a run without --delta, must not be patched."""
+        expected = SAMPLE_FLIGHTS.replace("10:00-11:30,90.00", "11:00-12:00,95.00")
+        _, exp_direct, exp_indirect = run_script("OAI_flights.py", "Beograd->Pariz", expected)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            self._setup(tmpdir, **{"first.txt": self.FIRST, "second.txt": self.SECOND})
+            self._run_delta(tmpdir, "first.txt")
+            assert self._run_delta(tmpdir, "second.txt") == (exp_direct, exp_indirect)
+
+            subprocess.run([sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--batch"],
+                           input=self.PAIRS, capture_output=True, text=True, cwd=tmpdir, check=True)
+            assert self._run_delta(tmpdir, "second.txt") == (exp_direct, exp_indirect)
+
+            # A rewritten flights.txt invalidates the saved state
+            self._setup(tmpdir, **{"flights.txt": expected, "second.txt": "-Nobody|A->B\n"})
+            assert self._run_delta(tmpdir, "second.txt") == (exp_direct, exp_indirect)
+
+    def test_cli_bad_delta_prints_greska(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+                f.write(SAMPLE_FLIGHTS)
+            with open(os.path.join(tmpdir, "changes.txt"), "w", encoding="utf-8") as f:
+                f.write("?nonsense\n")
+            result = subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--delta", "changes.txt"],
+                input="Beograd->Pariz", capture_output=True, text=True, cwd=tmpdir,
+            )
+            assert not os.path.exists(os.path.join(tmpdir, "flights_direct.txt"))
+        assert result.stdout.strip() == "GRESKA"
+
+
+# ===========================================================================
+# In/out neighbor index for intermediate cities
+# ===========================================================================
+
+class TestNeighborIndex:
+    PAIRS = [("A", "B"), ("C", "F"), ("E", "A"), ("A", "Nowhere"), ("Nowhere", "A")]
+
+    def test_oai_index_matches_full_scan(self, tmp_path):
+        import io
+        oai = load_module("OAI_flights.py")
+        path = tmp_path / "flights.txt"
+        path.write_text(_random_flights_text(11, n_lines=150), encoding="utf-8")
+        _, seg_map = oai.procitaj_flights_file(str(path))
+        izlazni, ulazni = susedi = oai.napravi_susede(seg_map)
+        assert izlazni["A"] == {to for fr, to in seg_map if fr == "A"}
+        assert ulazni["B"] == {fr for fr, to in seg_map if to == "B"}
+        for dep, lan in self.PAIRS:
+            full, indexed = io.StringIO(), io.StringIO()
+            oai.pisi_indirect(seg_map, dep, lan, full)
+            oai.pisi_indirect(seg_map, dep, lan, indexed, susedi)
+            assert indexed.getvalue() == full.getvalue()
+
+    def test_columnar_index_matches_full_scan(self, tmp_path):
+        kol_mod = load_module("columnar_flights.py")
+        path = tmp_path / "flights.txt"
+        path.write_text(_random_flights_text(12, n_lines=150), encoding="utf-8")
+        kol = kol_mod.procitaj_kolone(str(path))
+        susedi = kol_mod.susedi_kolone(kol)
+        for dep, lan in self.PAIRS:
+            kol_mod.upisi_indirect_kolone(kol, dep, lan, str(tmp_path / "i1.txt"))
+            kol_mod.upisi_indirect_kolone(kol, dep, lan, str(tmp_path / "i2.txt"), susedi)
+            assert (tmp_path / "i1.txt").read_bytes() == (tmp_path / "i2.txt").read_bytes()
+
+    def test_g_uses_given_index(self, tmp_path):
+        g = load_module("G_flights.py")
+        path = tmp_path / "flights.txt"
+        path.write_text(SAMPLE_FLIGHTS, encoding="utf-8")
+        letovi = g.ucitaj_letove(str(path))
+        izlazni, ulazni = g.napravi_susede(letovi)
+        assert izlazni["Beograd"] == {"Pariz", "Frankfurt"}
+        assert ulazni["Pariz"] == {"Beograd", "Frankfurt"}
+
+        out = tmp_path / "i.txt"
+        g.obradi_indirektne_letove(letovi, "Beograd", "Pariz", str(out), (izlazni, ulazni))
+        expected = out.read_text(encoding="utf-8")
+        assert expected.startswith("Beograd->Frankfurt->Pariz\n")
+        # An index without the intermediate city yields no connections
+        g.obradi_indirektne_letove(letovi, "Beograd", "Pariz", str(out), ({}, {}))
+        assert out.read_text(encoding="utf-8") == ""
+
+
+# ===========================================================================
+# Shared buffered output layer (common_flights.py)
+# ===========================================================================
+
+class TestOutputLayer:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.common = load_module("common_flights.py")
+
+    def test_parts_are_joined_into_few_writes(self):
+        import io
+
+        class CountingStream(io.StringIO):
+            writes = 0
+
+            def write(self, s):
+                CountingStream.writes += 1
+                return super().write(s)
+
+        out = CountingStream()
+        parts = [f"line {i}\n" for i in range(10)]
+        self.common.pisi_delove(out, iter(parts), delova_po_upisu=4)
+        assert out.getvalue() == "".join(parts)
+        assert CountingStream.writes == 3
+
+    def test_render_cache_formats_each_flight_once(self):
+        calls = []
+        render = self.common.napravi_kes_prikaza(lambda f: calls.append(f) or f"{f[0]:.2f}")
+        a, b = (1.005,), (2.5,)
+        assert [render(a), render(b), render(a)] == ["1.00", "2.50", "1.00"]
+        assert calls == [a, b]
+
+    @pytest.mark.parametrize("seed", [21, 22])
+    def test_oai_writers_match_line_by_line_format(self, tmp_path, seed):
+        oai = load_module("OAI_flights.py")
+        path = tmp_path / "flights.txt"
+        path.write_text(_random_flights_text(seed, n_lines=150), encoding="utf-8")
+        _, seg_map = oai.procitaj_flights_file(str(path))
+        render = self.common.napravi_kes_prikaza(oai.prikaz_leta)
+        for dep, lan in [("A", "B"), ("C", "F"), ("E", "A")]:
+            expected = []
+            for med in sorted({t for f, t in seg_map if f == dep} & {f for f, t in seg_map if t == lan}):
+                A, B = seg_map[(dep, med)], seg_map[(med, lan)]
+                expected.append(f"{dep}->{med}->{lan}\n")
+                for a in A:
+                    expected.append(f"{dep}->{med}|{a[0]}|{a[5]}-{a[6]},{a[7]:.2f}\n")
+                    expected.extend(f"{med}->{lan}|{b[0]}|{b[5]}-{b[6]},{b[7]:.2f}\n"
+                                    for b in B if b[3] >= a[4])
+            oai.upisi_indirect(seg_map, dep, lan, str(tmp_path / "i.txt"), prikaz=render)
+            assert (tmp_path / "i.txt").read_text(encoding="utf-8") == "".join(expected)
+
+
+# ===========================================================================
+# Pre-rendered flight strings, minute table and price cache
+# ===========================================================================
+
+class TestPreRendered:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.oai = load_module("OAI_flights.py")
+
+    def test_minute_table(self):
+        assert len(self.oai.MINUTI) == 1440
+        assert all(self.oai.time_to_min(t) == m for t, m in self.oai.MINUTI.items())
+
+    def test_price_cache_keeps_negative_zero(self):
+        assert self.oai.parsiraj_cenu("0") == (0.0, "0.00")
+        assert self.oai.parsiraj_cenu("-0")[1] == "-0.00"
+        assert self.oai.parsiraj_cenu("1.005")[1] == f"{1.005:.2f}"
+
+    def test_flight_carries_rendered_text(self):
+        (f,) = self.oai.parsiraj_liniju("Air|A->B| 8:05 - 09:10 , 12.345 \n")
+        assert f[:8] == ("Air", "A", "B", 485, 550, "8:05", "09:10", 12.345)
+        assert f[8] == "8:05-09:10,12.35"
+        assert self.oai.flight_sort_key(f) == self.oai.flight_sort_key(f[:8])
+
+    @pytest.mark.parametrize("seed", [31, 32])
+    def test_cached_rendering_is_byte_identical(self, tmp_path, seed):
+        path = tmp_path / "flights.txt"
+        path.write_text(_random_flights_text(seed, n_lines=150) + "Air|A->B|07:00-08:00,-0\n",
+                        encoding="utf-8")
+        route_map, seg_map = self.oai.procitaj_flights_file(str(path))
+        # The same timetable without the ninth field goes through f-string formatting
+        route8 = {k: {a: [f[:8] for f in fl] for a, fl in v.items()} for k, v in route_map.items()}
+        seg8 = {k: [f[:8] for f in fl] for k, fl in seg_map.items()}
+
+        self.oai.upisi_direct(route_map, str(tmp_path / "d9.txt"))
+        self.oai.upisi_direct(route8, str(tmp_path / "d8.txt"))
+        assert (tmp_path / "d9.txt").read_bytes() == (tmp_path / "d8.txt").read_bytes()
+        for dep, lan in [("A", "B"), ("C", "F"), ("E", "A")]:
+            self.oai.upisi_indirect(seg_map, dep, lan, str(tmp_path / "i9.txt"))
+            self.oai.upisi_indirect(seg8, dep, lan, str(tmp_path / "i8.txt"))
+            assert (tmp_path / "i9.txt").read_bytes() == (tmp_path / "i8.txt").read_bytes()
+
+
+# ===========================================================================
+# Output size estimate, pagination and per-hub summary
+# ===========================================================================
+
+def _oai_pairs(seg_map, dep, lan):
+    """Brute force: med -> [(a, b)] in output order (OAI: b departs at or after a arrives)."""
+    result = {}
+    for med in sorted({t for f, t in seg_map if f == dep} & {f for f, t in seg_map if t == lan}):
+        result[med] = [(a, b) for a in seg_map[(dep, med)] for b in seg_map[(med, lan)] if b[3] >= a[4]]
+    return result
+
+
+class TestOutputCardinality:
+    FLIGHTS = _random_flights_text(41, n_lines=150, cities=("A", "B", "C", "Đ", "E")) + \
+        "Air|A->Đ|05:00-06:00,0.5\n"
+
+    @pytest.fixture(autouse=True)
+    def _load(self, tmp_path):
+        self.oai = load_module("OAI_flights.py")
+        self.cc = load_module("CC_Flights.py")
+        path = tmp_path / "flights.txt"
+        path.write_text(self.FLIGHTS, encoding="utf-8")
+        self.path = path
+        self.out = str(tmp_path / "out.txt")
+        _, self.seg_map = self.oai.procitaj_flights_file(str(path))
+
+    @pytest.mark.parametrize("dep,lan", [("A", "B"), ("C", "Đ"), ("E", "A")])
+    def test_oai_estimate_matches_output(self, dep, lan):
+        estimate = self.oai.procena_indirect(self.seg_map, dep, lan)
+        self.oai.upisi_indirect(self.seg_map, dep, lan, self.out)
+        assert sum(b for _, _, b in estimate) == os.path.getsize(self.out)
+        pairs = _oai_pairs(self.seg_map, dep, lan)
+        assert [(m, c) for m, c, _ in estimate] == [(m, len(p)) for m, p in pairs.items()]
+
+    @pytest.mark.parametrize("offset,limit", [(0, 1), (2, 3), (5, None), (0, 0), (10**6, 2)])
+    def test_oai_page_is_slice_of_connections(self, offset, limit):
+        text = "".join(self.oai.redovi_indirect_strana(self.seg_map, "A", "B", offset, limit))
+        expected = []
+        for med, pairs in _oai_pairs(self.seg_map, "A", "B").items():
+            expected.append(f"A->{med}->B\n")
+            last = None
+            for a, b in pairs[offset:None if limit is None else offset + limit]:
+                if a is not last:
+                    expected.append(f"A->{med}|{a[0]}|{a[8]}\n")
+                    last = a
+                expected.append(f"{med}->B|{b[0]}|{b[8]}\n")
+        assert text == "".join(expected)
+
+    def test_oai_summary_matches_brute_force(self):
+        lines = list(self.oai.redovi_sazetka(self.seg_map, "A", "B"))
+        expected = []
+        for med, pairs in _oai_pairs(self.seg_map, "A", "B").items():
+            if pairs:
+                price = min(a[7] + b[7] for a, b in pairs)
+                arrival = min(pairs, key=lambda p: p[1][4])[1][6]
+                expected.append(f"A->{med}->B|{len(pairs)}|{price:.2f}|{arrival}\n")
+        assert lines == expected and lines
+
+    @pytest.mark.parametrize("par", ["A->B", "C->Đ", "E->A"])
+    def test_cc_estimate_pages_and_summary(self, par):
+        letovi = self.cc.ucitaj_letove(str(self.path))
+        letovi_iz = self.cc.grupisi_po_gradovima(letovi)
+        estimate = self.cc.procena_indirektnih(letovi_iz, *par.split("->"))
+        self.cc.formiraj_indirektne_letove(letovi, par, self.out, letovi_iz)
+        with open(self.out, encoding="utf-8") as f:
+            full = f.read()
+        assert sum(b for _, _, b in estimate) == len(full.encode("utf-8"))
+
+        # Pages of 2 pairs per hub, concatenated per hub, give back the full listing
+        pages = []
+        for offset in range(0, max([c for _, c, _ in estimate] + [0]) + 2, 2):
+            self.cc.formiraj_indirektne_letove(letovi, par, self.out, letovi_iz, offset, 2)
+            with open(self.out, encoding="utf-8") as f:
+                pages.append(f.read())
+        rebuilt = []
+        for med, _, _ in estimate:
+            header = f"{par.split('->')[0]}->{med}->{par.split('->')[1]}\n"
+            rebuilt.append(header)
+            for page in pages:
+                block = page.split(header, 1)[1]
+                rebuilt.append(re.split(r"^[^\n|]*->[^\n|]*->[^\n|]*\n", block, maxsplit=1, flags=re.M)[0])
+        assert "".join(rebuilt) == full
+
+        self.cc.formiraj_sazetak(letovi, par, self.out, letovi_iz)
+        with open(self.out, encoding="utf-8") as f:
+            summary = f.read().splitlines()
+        assert [line.split("|")[:2] for line in summary] == [
+            [f"{par.split('->')[0]}->{m}->{par.split('->')[1]}", str(c)] for m, c, _ in estimate if c
+        ]
+
+    @pytest.mark.parametrize("script", ["OAI_flights.py", "CC_Flights.py"])
+    def test_cli_output_guard(self, script):
+        ok, _, indirect = run_script(f"{script} --max-output-bytes 100000", "Beograd->Pariz")
+        assert ok.stdout == "" and indirect
+        blocked, _, indirect = run_script(f"{script} --max-output-bytes 10", "Beograd->Pariz")
+        assert blocked.stdout.strip() == "GRESKA"
+        assert indirect == ""
+
+    @pytest.mark.parametrize("script", ["OAI_flights.py", "CC_Flights.py"])
+    def test_cli_summary(self, script):
+        result, _, indirect = run_script(f"{script} --summary", "Beograd->Pariz")
+        assert result.stdout == ""
+        assert indirect == "Beograd->Frankfurt->Pariz|1|210.00|11:30\n"
+
+
+# ===========================================================================
+# Compressed input and output
+# ===========================================================================
+
+def _run_compressed(script, stdin_input, flights_name="flights.txt.gz", flights_content=SAMPLE_FLIGHTS):
+    """Run script with flights.txt stored as flights_name (gzip for .gz).
+
+    Returns (CompletedProcess, {output file name: decompressed text}).
+    """
+    import gzip
+
+    script, *options = script.split()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        opener = gzip.open if flights_name.endswith(".gz") else open
+        with opener(os.path.join(tmpdir, flights_name), "wt", encoding="utf-8") as f:
+            f.write(flights_content)
+        result = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, script), *options],
+            input=stdin_input, capture_output=True, text=True, cwd=tmpdir,
+        )
+        outputs = {}
+        for root, _, files in os.walk(tmpdir):
+            for name in files:
+                # Input, its cache and binary indexes (--all-pairs)
+                if name.startswith("flights.txt") or name.endswith(".idx"):
+                    continue
+                path = os.path.join(root, name)
+                opener = gzip.open if name.endswith(".gz") else open
+                with opener(path, "rt", encoding="utf-8") as f:
+                    outputs[os.path.relpath(path, tmpdir)] = f.read()
+        return result, outputs
+
+
+class TestCompression:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.common = load_module("common_flights.py")
+
+    def test_codec_is_sniffed_from_content_not_name(self, tmp_path):
+        import gzip
+
+        packed = tmp_path / "flights.txt"
+        packed.write_bytes(gzip.compress(b"x"))
+        plain = tmp_path / "plain.gz"
+        plain.write_bytes(b"A|B->C|10:00-11:00,1.00\n")
+        assert self.common.kodek_datoteke(str(packed)) == "gzip"
+        assert self.common.kodek_datoteke(str(plain)) is None
+        assert self.common.kodek_po_sufiksu("flights_direct.txt.zst") == "zstd"
+        assert self.common.kodek_po_sufiksu("flights_direct.txt") is None
+
+    def test_compressed_input_found_when_plain_missing(self, tmp_path):
+        base = str(tmp_path / "flights.txt")
+        assert self.common.pronadji_ulaz(base) == base
+        (tmp_path / "flights.txt.gz").write_bytes(b"")
+        assert self.common.pronadji_ulaz(base) == base + ".gz"
+        (tmp_path / "flights.txt").write_text("", encoding="utf-8")
+        assert self.common.pronadji_ulaz(base) == base
+
+    def test_roundtrip_keeps_text_mode_newlines(self, tmp_path):
+        path = str(tmp_path / "out.txt.gz")
+        self.common.postavi_nivo_kompresije(1)
+        try:
+            with self.common.otvori_izlaz(path) as out:
+                out.write("a\nb\n")
+        finally:
+            self.common.postavi_nivo_kompresije(None)
+        with self.common.otvori_ulaz(path) as fh:
+            assert fh.read() == "a\nb\n"
+
+        (tmp_path / "in.txt").write_bytes(b"x\r\ny\rz\n")
+        import gzip
+        (tmp_path / "in.txt.gz").write_bytes(gzip.compress(b"x\r\ny\rz\n"))
+        with open(tmp_path / "in.txt", encoding="utf-8") as plain, \
+                self.common.otvori_ulaz(str(tmp_path / "in.txt.gz")) as packed:
+            assert list(packed) == list(plain)
+
+    @pytest.mark.parametrize("script", SCRIPT_VARIANTS)
+    def test_gzip_input_and_output_match_plain_run(self, script):
+        plain, direct, indirect = run_script(script, "Beograd->Pariz")
+        result, outputs = _run_compressed(f"{script} --compress gzip", "Beograd->Pariz")
+        assert result.stdout == plain.stdout
+        # Only top-level outputs (--all-pairs also writes its own directory)
+        top_level = {name: text for name, text in outputs.items() if os.sep not in name}
+        assert top_level == {"flights_direct.txt.gz": direct, "flights_indirect.txt.gz": indirect}
+
+    @pytest.mark.parametrize("script", SCRIPTS)
+    def test_batch_outputs_get_codec_suffix(self, script):
+        result, outputs = _run_compressed(
+            f"{script} --batch --compress gzip --compress-level 1",
+            "Beograd->Pariz\n", flights_name="flights.txt",
+        )
+        assert result.stdout == ""
+        _, _, indirect = run_script(script, "Beograd->Pariz")
+        assert outputs[os.path.join("flights_indirect", "Beograd->Pariz.txt.gz")] == indirect
+
+    def test_delta_rewrites_compressed_direct_output(self):
+        import gzip
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+                f.write(SAMPLE_FLIGHTS)
+            with open(os.path.join(tmpdir, "delta.txt"), "w", encoding="utf-8") as f:
+                f.write("-AirSrbia|Beograd->Pariz\n")
+            script = os.path.join(REPO_DIR, "OAI_flights.py")
+            for extra in ([], ["--delta", "delta.txt"]):
+                subprocess.run([sys.executable, script, "--compress", "gzip", *extra],
+                               input="Beograd->Pariz", capture_output=True, text=True,
+                               cwd=tmpdir, check=True)
+            with gzip.open(os.path.join(tmpdir, "flights_direct.txt.gz"), "rt",
+                           encoding="utf-8") as f:
+                direct = f.read()
+        edited = "".join(line for line in SAMPLE_FLIGHTS.splitlines(True)
+                         if not line.startswith("AirSrbia|Beograd->Pariz"))
+        _, expected, _ = run_script("OAI_flights.py", "Beograd->Pariz", edited)
+        assert direct == expected
+
+    def test_compress_level_requires_compress(self):
+        result = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--compress-level", "3"],
+            input="", capture_output=True, text=True,
+        )
+        assert result.returncode == 2
+
+
+# ===========================================================================
+# Synthetic timetable generator (bench_flights.py)
+# ===========================================================================
+
+class TestSyntheticTimetable:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.bench = load_module("bench_flights.py")
+
+    def test_same_seed_same_content(self):
+        gen = self.bench.generisi_redove
+        assert list(gen(500, seed=3, n_cvorista=2, udeo_cvorista=0.5)) == \
+            list(gen(500, seed=3, n_cvorista=2, udeo_cvorista=0.5))
+        assert list(gen(500, seed=3)) != list(gen(500, seed=4))
+
+    def test_tunables_shape_the_timetable(self):
+        lines = list(self.bench.generisi_redove(
+            4000, n_gradova=30, n_aviokompanija=3, letova_po_liniji=4,
+            n_cvorista=2, udeo_cvorista=0.8, seed=5,
+        ))
+        hubs = {self.bench.ime_grada(0), self.bench.ime_grada(1)}
+        routes = [line.split("|")[1].split("->") for line in lines]
+        assert len(lines) == 1000
+        assert all(len(line.rstrip("\n").split("|")[2].split(";")) == 4 for line in lines)
+        assert len({line.split("|")[0] for line in lines}) == 3
+        assert 0.75 < sum(bool(hubs & set(r)) for r in routes) / len(routes) < 0.9
+
+    def test_all_implementations_load_generated_timetable(self, tmp_path):
+        path = str(tmp_path / "flights.txt")
+        self.bench.generisi_flights_txt(path, 2000, n_gradova=20, n_cvorista=2, udeo_cvorista=0.5)
+        _, seg_map = load_module("OAI_flights.py").procitaj_flights_file(path)
+        g_flights = load_module("G_flights.py").ucitaj_letove(path)
+        cc_flights = load_module("CC_Flights.py").ucitaj_letove(path)
+        assert sum(map(len, seg_map.values())) == 2000
+        assert sum(map(len, g_flights.values())) == 2000
+        assert sum(len(r["letovi"]) for r in cc_flights) == 2000
+
+
+# ===========================================================================
+# Opt-in instrumentation (--metrics, --metrics-sink)
+# ===========================================================================
+
+class TestMetrics:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.common = load_module("common_flights.py")
+
+    def test_disabled_by_default(self):
+        with self.common.faza("x"):
+            self.common.brojac("n", 3)
+        assert not self.common.metrike_ukljucene()
+        assert self.common.METRIKE is None
+
+    def test_phases_counters_and_sink(self, tmp_path):
+        seen = []
+        self.common.dodaj_sink(seen.append)
+        self.common.ukljuci_metrike("test")
+        with pytest.raises(KeyError):
+            with self.common.faza("padne"):
+                raise KeyError
+        with self.common.faza("radi"):
+            self.common.brojac("n", 3)
+            self.common.brojac("n")
+        out = tmp_path / "m.json"
+        self.common.zavrsi_metrike(str(out))
+
+        import json
+        written = json.loads(out.read_text(encoding="utf-8"))
+        assert seen == [written]
+        assert written["implementacija"] == "test"
+        assert written["brojaci"] == {"n": 4}
+        assert set(written["faze"]) == {"padne", "radi"}
+        assert {"zidno_s", "cpu_s", "vrsni_rss_procesa_kib", "rast_vrsnog_rss_procesa_kib"} <= \
+            set(written["faze"]["radi"])
+        # Per-phase allocation peaks need tracemalloc
+        assert "vrsna_alokacija_kib" not in written["faze"]["radi"]
+        assert self.common.METRIKE is None
+
+    def test_allocation_peak_is_per_phase_with_tracemalloc(self):
+        import tracemalloc
+
+        self.common.ukljuci_metrike("test")
+        tracemalloc.start()
+        try:
+            with self.common.faza("prva"):
+                big = bytearray(8 << 20)
+                del big
+            with self.common.faza("spoljna"):
+                with self.common.faza("unutrasnja"):
+                    big = bytearray(4 << 20)
+                    del big
+                small = bytearray(1 << 20)
+                del small
+        finally:
+            tracemalloc.stop()
+        phases = self.common.METRIKE["faze"]
+        self.common.zavrsi_metrike()
+
+        assert phases["prva"]["vrsna_alokacija_kib"] >= 8 << 10
+        # The earlier 8 MiB phase does not leak into later peaks
+        assert 4 << 10 <= phases["unutrasnja"]["vrsna_alokacija_kib"] < 8 << 10
+        # An outer phase includes the peak of its nested phase
+        assert 4 << 10 <= phases["spoljna"]["vrsna_alokacija_kib"] < 8 << 10
+
+    @pytest.mark.parametrize("script", SCRIPT_VARIANTS)
+    def test_cli_metrics_on_stderr(self, script):
+        import json
+
+        result, direct, indirect = run_script(f"{script} --metrics", "Beograd->Pariz")
+        _, plain_direct, plain_indirect = run_script(script, "Beograd->Pariz")
+        assert result.stdout == ""
+        assert (direct, indirect) == (plain_direct, plain_indirect)
+        metrics = json.loads(result.stderr)
+        counters = metrics["brojaci"]
+        assert counters["parova"] == 1 and counters["medjugradova"] == 1
+        if "--stream" in script:
+            assert set(metrics["faze"]) == {"tok"}
+            return
+        assert counters["redova"] == 4
+        phases = set(metrics["faze"])
+        if "--all-pairs" in script:
+            # The precomputation is measured inside ucitavanje
+            phases.remove("sve_parove")
+        if "--concurrent" in script:
+            assert phases == {"ucitavanje", "izlaz"}
+        else:
+            assert phases == {"ucitavanje", "direct", "indirect"}
+        assert counters["ruta"] == 3 and counters["letova"] == 5
+
+    @pytest.mark.parametrize("script", SCRIPTS + ["OAI_flights.py --cache-dir kes", "OAI_flights.py --workers 2"])
+    def test_cli_rows_counted_on_cache_hits(self, script):
+        """redova must not disappear when the parse is skipped by a cache."""
+        import json
+
+        script, *options = script.split()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+                f.write(SAMPLE_FLIGHTS)
+            for _ in range(2):
+                result = subprocess.run(
+                    [sys.executable, os.path.join(REPO_DIR, script), *options, "--metrics"],
+                    input="Beograd->Pariz", capture_output=True, text=True, cwd=tmpdir,
+                )
+                counters = json.loads(result.stderr)["brojaci"]
+                assert counters["redova"] == 4
+        assert "kes_pogodaka" in counters or "kes_rezultata_pogodaka" in counters
+
+    @pytest.mark.parametrize("script", SCRIPTS)
+    def test_cli_metrics_sink_and_batch(self, script):
+        import json
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+                f.write(SAMPLE_FLIGHTS)
+            with open(os.path.join(tmpdir, "moj_sink.py"), "w", encoding="utf-8") as f:
+                f.write(
+                    "import json\n"
+                    "def upisi(m):\n"
+                    "    with open('sink.json', 'w') as f:\n"
+                    "        json.dump(m, f)\n"
+                )
+            env = dict(os.environ, PYTHONPATH=tmpdir)
+            result = subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, script), "--batch",
+                 "--metrics-sink", "moj_sink:upisi"],
+                input="\n".join(BATCH_PAIRS), capture_output=True, text=True,
+                cwd=tmpdir, env=env,
+            )
+            with open(os.path.join(tmpdir, "sink.json"), encoding="utf-8") as f:
+                metrics = json.load(f)
+        assert result.stdout == "" and result.stderr == ""
+        assert set(metrics["faze"]) == {"ucitavanje", "direct", "indirect"}
+        assert metrics["brojaci"]["redova"] == 4
+        assert metrics["brojaci"]["kes_promasaja"] == 1
+
+    def test_bad_sink_is_a_usage_error(self):
+        result = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"),
+             "--metrics-sink", "nema_takvog_modula:f"],
+            input="", capture_output=True, text=True,
+        )
+        assert result.returncode == 2
+
+
+# ===========================================================================
+# Concurrent direct and indirect writers (--concurrent)
+# ===========================================================================
+
+class TestConcurrentWriters:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.common = load_module("common_flights.py")
+
+    @pytest.mark.parametrize("mode", ["thread", "process"])
+    def test_tasks_overlap(self, mode, tmp_path):
+        import time
+
+        def task(name):
+            def run():
+                time.sleep(0.3)
+                (tmp_path / name).write_text(name)
+            return run
+
+        t0 = time.perf_counter()
+        self.common.pokreni_uporedo([task("a"), task("b")], mode)
+        assert time.perf_counter() - t0 < 0.55
+        assert (tmp_path / "a").read_text() == "a" and (tmp_path / "b").read_text() == "b"
+
+    @pytest.mark.parametrize("mode", ["thread", "process"])
+    @pytest.mark.parametrize("failing", [0, 1])
+    def test_failure_is_raised_after_all_tasks_finish(self, mode, failing, tmp_path):
+        def ok():
+            (tmp_path / "ok").write_text("done")
+
+        def fail():
+            raise ValueError("x")
+
+        tasks = [fail, ok] if failing == 0 else [ok, fail]
+        with pytest.raises((ValueError, RuntimeError)):
+            self.common.pokreni_uporedo(tasks, mode)
+        assert (tmp_path / "ok").read_text() == "done"
+
+    @pytest.mark.parametrize("script", SCRIPTS)
+    @pytest.mark.parametrize("mode", ["thread", "process"])
+    def test_failing_direct_writer_prints_greska_once(self, script, mode):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "flights.txt"), "w", encoding="utf-8") as f:
+                f.write(SAMPLE_FLIGHTS)
+            # flights_direct.txt cannot be opened for writing
+            os.mkdir(os.path.join(tmpdir, "flights_direct.txt"))
+            result = subprocess.run(
+                [sys.executable, os.path.join(REPO_DIR, script), "--concurrent", mode],
+                input="Beograd->Pariz", capture_output=True, text=True, cwd=tmpdir,
+            )
+            indirect = os.path.join(tmpdir, "flights_indirect.txt")
+            with open(indirect, encoding="utf-8") as f:
+                written = f.read()
+        assert result.stdout == "GRESKA\n"
+        assert result.stderr == ""
+        # The indirect side still completes on its own
+        assert "Beograd->Frankfurt->Pariz" in written
+
+    @pytest.mark.parametrize("mode", ["thread", "process"])
+    def test_failing_indirect_writer_prints_greska(self, mode):
+        result, direct, indirect = run_script(
+            f"OAI_flights.py --concurrent {mode} --max-output-bytes 10", "Beograd->Pariz"
+        )
+        assert result.stdout == "GRESKA\n"
+        assert direct and indirect == ""
+
+
+class TestAllPairs:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.oai = load_module("OAI_flights.py")
+        # Worker functions are pickled by module name, so import it normally
+        self.ap = importlib.import_module("allpairs_flights")
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_every_pair_matches_upisi_indirect(self, tmp_path, seed, workers):
+        path = tmp_path / "flights.txt"
+        path.write_text(_random_flights_text(seed, n_lines=120), encoding="utf-8")
+        _, seg_map = self.oai.procitaj_flights_file(str(path))
+        out_dir = str(tmp_path / "pairs")
+        pairs = self.ap.izracunaj_sve_parove(seg_map, out_dir, shardova=5, radnika=workers)
+
+        cities = sorted({c for route in seg_map for c in route} | {"Nowhere"})
+        non_empty = 0
+        for dep in cities:
+            for lan in cities:
+                expected = tmp_path / "expected.txt"
+                self.oai.upisi_indirect(seg_map, dep, lan, str(expected))
+                assert self.ap.procitaj_par(out_dir, dep, lan) == expected.read_text(encoding="utf-8")
+                non_empty += expected.stat().st_size > 0
+        assert pairs == non_empty
+
+    def test_rebuild_replaces_directory(self, tmp_path):
+        _, seg_map = self.oai.procitaj_flights_file(str(self._write(tmp_path, SAMPLE_FLIGHTS)))
+        out_dir = str(tmp_path / "pairs")
+        self.ap.izracunaj_sve_parove(seg_map, out_dir, shardova=4, radnika=1)
+        self.ap.izracunaj_sve_parove(seg_map, out_dir, shardova=2, radnika=1)
+        assert sorted(os.listdir(out_dir)) == [
+            "deo_000.idx", "deo_000.txt", "deo_001.idx", "deo_001.txt", "manifest.json"
+        ]
+        # No temporary directories are left next to the result
+        assert sorted(os.listdir(tmp_path)) == ["flights.txt", "pairs"]
+        assert "Beograd->Frankfurt->Pariz" in self.ap.procitaj_par(out_dir, "Beograd", "Pariz")
+
+    def test_lookups_load_each_shard_index_once(self, tmp_path, monkeypatch):
+        _, seg_map = self.oai.procitaj_flights_file(str(self._write(tmp_path, SAMPLE_FLIGHTS)))
+        out_dir = str(tmp_path / "pairs")
+        self.ap.izracunaj_sve_parove(seg_map, out_dir, shardova=1, radnika=1)
+
+        loads = []
+        real_load = self.ap.marshal.load
+        monkeypatch.setattr(self.ap.marshal, "load", lambda f: loads.append(f.name) or real_load(f))
+        for _ in range(3):
+            assert "Frankfurt->Pariz" in self.ap.procitaj_par(out_dir, "Beograd", "Pariz")
+            assert self.ap.procitaj_par(out_dir, "Pariz", "Beograd") == ""
+        assert len(loads) == 1
+
+        # A rebuilt directory is not served from the stale index
+        updated = SAMPLE_FLIGHTS.replace("Lufthansa|Frankfurt->Pariz", "Condor|Frankfurt->Pariz")
+        _, seg_map = self.oai.procitaj_flights_file(str(self._write(tmp_path, updated)))
+        self.ap.izracunaj_sve_parove(seg_map, out_dir, shardova=1, radnika=1)
+        assert "Condor" in self.ap.procitaj_par(out_dir, "Beograd", "Pariz")
+
+    def test_shard_does_not_depend_on_hash_seed(self):
+        codes = set()
+        for seed in ("0", "1"):
+            result = subprocess.run(
+                [sys.executable, "-c",
+                 "import allpairs_flights as a; print(a.shard_para('Beograd', 'Pariz', 64))"],
+                capture_output=True, text=True, cwd=REPO_DIR,
+                env={**os.environ, "PYTHONHASHSEED": seed},
+            )
+            codes.add(result.stdout)
+        assert len(codes) == 1
+
+    @staticmethod
+    def _write(tmp_path, text):
+        path = tmp_path / "flights.txt"
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    def _run(self, tmpdir, stdin_input, *options):
+        return subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--all-pairs", "parovi", *options],
+            input=stdin_input, capture_output=True, text=True, cwd=tmpdir,
+        )
+
+    def test_cli_reuses_result_until_timetable_changes(self, tmp_path):
+        import json
+
+        self._write(tmp_path, SAMPLE_FLIGHTS)
+        result = self._run(tmp_path, "", "--metrics")
+        assert result.stdout == ""
+        assert "sve_parove" in json.loads(result.stderr)["faze"]
+        assert (tmp_path / "flights_direct.txt").exists()
+
+        result = self._run(tmp_path, "Beograd->Pariz", "--metrics")
+        assert "sve_parove" not in json.loads(result.stderr)["faze"]
+        assert "Beograd->Frankfurt->Pariz" in (tmp_path / "flights_indirect.txt").read_text(encoding="utf-8")
+
+        self._write(tmp_path, SAMPLE_FLIGHTS.replace("Lufthansa|Frankfurt->Pariz", "Lufthansa|Frankfurt->Rim"))
+        result = self._run(tmp_path, "Beograd->Pariz", "--metrics")
+        assert "sve_parove" in json.loads(result.stderr)["faze"]
+        assert (tmp_path / "flights_indirect.txt").read_text(encoding="utf-8") == ""
+
+    def test_batch_matches_plain_batch(self, tmp_path):
+        self._write(tmp_path, _random_flights_text(4, n_lines=80))
+        pairs = "\n".join(f"{a}->{b}" for a in "ABCDEF" for b in "ABCDEF" if a != b) + "\n"
+        plain = subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--batch", "--out-dir", "plain"],
+            input=pairs, capture_output=True, text=True, cwd=tmp_path,
+        )
+        pre = self._run(tmp_path, pairs, "--batch", "--out-dir", "pre", "--shards", "7")
+        assert plain.stdout == pre.stdout == ""
+        names = sorted(os.listdir(tmp_path / "plain"))
+        assert names == sorted(os.listdir(tmp_path / "pre"))
+        for name in names:
+            assert (tmp_path / "plain" / name).read_bytes() == (tmp_path / "pre" / name).read_bytes()
+
+    @pytest.mark.parametrize("options", [["--summary"], ["--columnar"], ["--stream"], ["--shards", "0"]])
+    def test_rejected_combinations(self, tmp_path, options):
+        self._write(tmp_path, SAMPLE_FLIGHTS)
+        result = self._run(tmp_path, "Beograd->Pariz", *options)
+        assert result.returncode == 2
+
+
+class TestResultCache:
+    @pytest.fixture(autouse=True)
+    def _load(self):
+        self.common = load_module("common_flights.py")
+
+    def _store(self, cache, key, text, max_bytes, out):
+        def compute(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        self.common.upisi_sa_kesom(str(cache), key, str(out), compute, max_bytes)
+
+    def test_hit_streams_stored_result(self, tmp_path):
+        cache = tmp_path / "cache"
+        self._store(cache, "k", "stored\n", 100, tmp_path / "a.txt")
+
+        def fail(path):
+            raise AssertionError("recomputed on a hit")
+        self.common.upisi_sa_kesom(str(cache), "k", str(tmp_path / "b.txt.gz"), fail, 100)
+        import gzip
+        assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "stored\n"
+        assert gzip.decompress((tmp_path / "b.txt.gz").read_bytes()) == b"stored\n"
+
+    @pytest.mark.skipif(os.name == "nt", reason="POSIX permission bits")
+    def test_entry_gets_regular_file_permissions(self, tmp_path):
+        self._store(tmp_path / "cache", "k", "stored\n", 100, tmp_path / "a.txt")
+        mode = (tmp_path / "a.txt").stat().st_mode & 0o777
+        assert (tmp_path / "cache" / "k.txt").stat().st_mode & 0o777 == mode
+
+    def test_least_recently_used_is_evicted_first(self, tmp_path):
+        cache = tmp_path / "cache"
+        out = tmp_path / "out.txt"
+        self._store(cache, "a", "x" * 10, 25, out)
+        self._store(cache, "b", "y" * 10, 25, out)
+        # Make a older than b, then use it again
+        os.utime(cache / "a.txt", ns=(1, 1))
+        os.utime(cache / "b.txt", ns=(2, 2))
+        self._store(cache, "a", "", 25, out)
+        self._store(cache, "c", "z" * 10, 25, out)
+        assert sorted(os.listdir(cache)) == ["a.txt", "c.txt"]
+
+    def test_directory_is_scanned_only_when_limit_is_exceeded(self, tmp_path, monkeypatch):
+        cache = tmp_path / "cache"
+        out = tmp_path / "out.txt"
+        scans = []
+        real_scandir = os.scandir
+        monkeypatch.setattr(os, "scandir", lambda path: scans.append(path) or real_scandir(path))
+
+        for i in range(10):
+            self._store(cache, f"k{i}", "x" * 10, 100, out)
+        # One scan to learn the initial size, none while under the limit
+        assert len(scans) == 1
+
+        self._store(cache, "k10", "x" * 10, 100, out)
+        assert len(scans) == 2
+        # Evicted down to the low watermark, so the next inserts fit again
+        assert len(os.listdir(cache)) == 9
+        self._store(cache, "k11", "x" * 10, 100, out)
+        assert len(scans) == 2
+
+    def test_result_larger_than_limit_is_written_but_not_kept(self, tmp_path):
+        cache = tmp_path / "cache"
+        self._store(cache, "big", "x" * 50, 25, tmp_path / "out.txt")
+        assert (tmp_path / "out.txt").read_text(encoding="utf-8") == "x" * 50
+        assert os.listdir(cache) == []
+
+    def test_failed_computation_leaves_no_entry(self, tmp_path):
+        cache = tmp_path / "cache"
+
+        def fail(path):
+            raise ValueError("too big")
+        with pytest.raises(ValueError):
+            self.common.upisi_sa_kesom(str(cache), "k", str(tmp_path / "out.txt"), fail, 100)
+        assert os.listdir(cache) == []
+
+    def test_key_depends_on_timetable_and_parameters(self):
+        key = self.common.kljuc_rezultata
+        assert key("h1", "oai", {"dep": "A"}) == key("h1", "oai", {"dep": "A"})
+        assert key("h1", "oai", {"dep": "A"}) != key("h2", "oai", {"dep": "A"})
+        assert key("h1", "oai", {"dep": "A"}) != key("h1", "oai", {"dep": "B"})
+
+    def _run(self, tmpdir, stdin_input, *options):
+        return subprocess.run(
+            [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--cache-dir", "kes", "--metrics", *options],
+            input=stdin_input, capture_output=True, text=True, cwd=tmpdir,
+        )
+
+    @staticmethod
+    def _outputs(tmpdir):
+        return [(tmpdir / name).read_text(encoding="utf-8") for name in ("flights_direct.txt", "flights_indirect.txt")]
+
+    def test_cli_hit_skips_loading_until_timetable_changes(self, tmp_path):
+        import json
+
+        (tmp_path / "flights.txt").write_text(SAMPLE_FLIGHTS, encoding="utf-8")
+        first = self._run(tmp_path, "Beograd->Pariz")
+        expected = self._outputs(tmp_path)
+        assert json.loads(first.stderr)["brojaci"]["kes_rezultata_promasaja"] == 2
+
+        os.unlink(tmp_path / "flights_direct.txt")
+        os.unlink(tmp_path / "flights_indirect.txt")
+        second = self._run(tmp_path, "Beograd->Pariz")
+        counters = json.loads(second.stderr)["brojaci"]
+        # Nothing is parsed; redova is counted after the phases
+        assert counters == {"kes_rezultata_pogodaka": 2, "redova": 4}
+        assert self._outputs(tmp_path) == expected
+
+        # Other query parameters are a different entry
+        summary = self._run(tmp_path, "Beograd->Pariz", "--summary")
+        assert json.loads(summary.stderr)["brojaci"]["kes_rezultata_promasaja"] == 1
+
+        (tmp_path / "flights.txt").write_text(SAMPLE_FLIGHTS.replace("10:00-11:30", "06:00-06:30"), encoding="utf-8")
+        changed = self._run(tmp_path, "Beograd->Pariz")
+        assert json.loads(changed.stderr)["brojaci"]["kes_rezultata_promasaja"] == 2
+        assert "Lufthansa" not in (tmp_path / "flights_indirect.txt").read_text(encoding="utf-8")
+
+    def test_concurrent_processes_share_cache(self, tmp_path):
+        (tmp_path / "flights.txt").write_text(_random_flights_text(5), encoding="utf-8")
+        _, _, expected = run_script("OAI_flights.py", "A->B", _random_flights_text(5))
+        runs = []
+        for i in range(6):
+            work = tmp_path / f"run{i}"
+            work.mkdir()
+            (work / "flights.txt").write_text(_random_flights_text(5), encoding="utf-8")
+            runs.append((work, subprocess.Popen(
+                [sys.executable, os.path.join(REPO_DIR, "OAI_flights.py"), "--cache-dir", str(tmp_path / "kes"),
+                 "--cache-max-bytes", "200"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=work,
+            )))
+        for work, proc in runs:
+            out, _ = proc.communicate("A->B")
+            assert out == ""
+            assert (work / "flights_indirect.txt").read_text(encoding="utf-8") == expected
+        # Only finished entries remain, within the byte limit
+        names = os.listdir(tmp_path / "kes")
+        assert all(name.endswith(".txt") and not name.startswith(".") for name in names)
+        assert sum(os.path.getsize(tmp_path / "kes" / name) for name in names) <= 200
+
+    def test_rejected_combinations(self, tmp_path):
+        (tmp_path / "flights.txt").write_text(SAMPLE_FLIGHTS, encoding="utf-8")
+        for options in (["--stream"], ["--cache-max-bytes", "0"]):
+            assert self._run(tmp_path, "Beograd->Pariz", *options).returncode == 2
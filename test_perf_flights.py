@@ -0,0 +1,202 @@
+"""
+Performance regression tier for CC_Flights.py, G_flights.py and OAI_flights.py.
+
+These tests generate mid-size timetables in process and check scaling
+properties instead of absolute speed:
+
+  * the indirect join grows roughly linearly with the size of its output
+    (an O(|A|*|B|) join on a timetable with few valid connections does not);
+  * parsed memory per flight stays under a byte budget;
+  * each implementation's load + direct + indirect run, normalized by a
+    fixed pure-Python calibration workload, stays within a tolerance of
+    the stored baseline in perf_baselines.json.
+
+The tier is slow, so it only runs with FLIGHTS_PERF=1 (CI sets it in a
+separate step). FLIGHTS_PERF_UPDATE=1 rewrites perf_baselines.json from
+the current run instead of comparing against it.
+"""
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import pytest
+
+import bench_flights
+import CC_Flights
+import G_flights
+import OAI_flights
+
+pytestmark = pytest.mark.skipif(
+    os.environ.get("FLIGHTS_PERF") != "1", reason="performance tier: set FLIGHTS_PERF=1"
+)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES = os.path.join(REPO_DIR, "perf_baselines.json")
+UPDATE = os.environ.get("FLIGHTS_PERF_UPDATE") == "1"
+
+IMPLEMENTATIONS = ("OAI", "G", "CC")
+
+
+def best_of(repeat, func, *args):
+    """Shortest of repeat runs of func(*args), in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def calibration_seconds():
+    """Fixed workload of the same kind as the scripts: parse, sort and format."""
+    rnd = random.Random(0)
+    lines = [f"A{i % 40}|X->Y|{rnd.randint(0, 1379)},{rnd.randint(2000, 90000) / 100:.2f}"
+             for i in range(100_000)]
+
+    def work():
+        rows = []
+        for line in lines:
+            airline, _, rest = line.split("|")
+            minute, price = rest.split(",")
+            rows.append((int(minute), float(price), airline))
+        rows.sort()
+        "".join(f"{a}|{m // 60:02d}:{m % 60:02d},{p:.2f}\n" for m, p, a in rows)
+    return best_of(3, work)
+
+
+def phases(name, path, dep, lan, out_dir):
+    """(load, write_direct(data), write_indirect(data)) as each main() runs them."""
+    direct = os.path.join(out_dir, "flights_direct.txt")
+    indirect = os.path.join(out_dir, "flights_indirect.txt")
+    if name == "OAI":
+        return (
+            lambda: OAI_flights.procitaj_flights_file(path),
+            lambda data: OAI_flights.upisi_direct(data[0], direct),
+            lambda data: OAI_flights.upisi_indirect(data[1], dep, lan, indirect),
+        )
+    if name == "G":
+        return (
+            lambda: G_flights.ucitaj_letove(path),
+            lambda data: G_flights.obradi_direktne_letove(data, izlazno_ime=direct),
+            lambda data: G_flights.obradi_indirektne_letove(data, dep, lan, indirect),
+        )
+    return (
+        lambda: CC_Flights.ucitaj_letove(path),
+        lambda data: CC_Flights.formiraj_direktne_letove(data, direct),
+        lambda data: CC_Flights.formiraj_indirektne_letove(data, f"{dep}->{lan}", indirect),
+    )
+
+
+def sparse_hub_timetable(n, late=5, seed=1):
+    """
+    n evening flights P->H and n flights H->O of which only `late` depart
+    after every arrival, so the output has about n * late connections while
+    a pairwise join would look at n * n.
+    """
+    rnd = random.Random(seed)
+    hh_mm = bench_flights.hh_mm
+    lines = []
+    for i in range(n):
+        dep = rnd.randint(18 * 60, 21 * 60)
+        lines.append(f"A{i % 20}|P->H|{hh_mm(dep)}-{hh_mm(dep + rnd.randint(30, 120))},"
+                     f"{rnd.randint(5000, 50000) / 100:.2f}\n")
+    for i in range(n):
+        dep = 23 * 60 + rnd.randint(30, 50) if i < late else rnd.randint(0, 17 * 60)
+        lines.append(f"B{i % 20}|H->O|{hh_mm(dep)}-{hh_mm(min(dep + 9, 23 * 60 + 59))},"
+                     f"{rnd.randint(5000, 50000) / 100:.2f}\n")
+    return "".join(lines)
+
+
+def reset_parse_caches():
+    """
+    Empty the module-level parse caches so a measurement does not depend on
+    which tests ran before. OAI_flights.MINUTI is a fixed table built at
+    import time, not filled while parsing, so it is left alone.
+    """
+    OAI_flights.KES_CENA.clear()
+
+
+@pytest.fixture(scope="module")
+def baselines():
+    if UPDATE or not os.path.exists(BASELINES):
+        stored = {"tolerancija": 2.0, "memorija_tolerancija": 1.25, "implementacije": {}}
+    else:
+        with open(BASELINES, encoding="utf-8") as f:
+            stored = json.load(f)
+    yield stored
+    if UPDATE:
+        with open(BASELINES, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+def check_baseline(baselines, name, key, value, tolerance_key):
+    """Compare value with the stored baseline (or record it when updating)."""
+    stored = baselines["implementacije"].setdefault(name, {})
+    if UPDATE:
+        stored[key] = round(value, 3)
+        return
+    assert key in stored, f"no baseline for {name}.{key}; run with FLIGHTS_PERF_UPDATE=1"
+    limit = stored[key] * baselines[tolerance_key]
+    assert value <= limit, f"{name}.{key} = {value:.3f}, baseline {stored[key]} (limit {limit:.3f})"
+
+
+@pytest.mark.parametrize("name", IMPLEMENTATIONS)
+def test_indirect_join_is_linear_in_output(name, tmp_path):
+    path = str(tmp_path / "flights.txt")
+    measured = []
+    for n in (4000, 32000):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(sparse_hub_timetable(n))
+        load, _, write_indirect = phases(name, path, "P", "O", str(tmp_path))
+        data = load()
+        seconds = best_of(3, write_indirect, data)
+        size = os.path.getsize(tmp_path / "flights_indirect.txt")
+        measured.append((seconds, size))
+
+    (t_small, b_small), (t_large, b_large) = measured
+    # 8x input, 8x output: linear join ~8x, pairwise join ~64x
+    assert b_large / b_small < 10
+    assert t_large / t_small < 3 * (b_large / b_small), measured
+
+
+@pytest.mark.parametrize("name", IMPLEMENTATIONS)
+def test_parse_memory_per_flight(name, baselines, tmp_path):
+    flights = 20_000
+    path = str(tmp_path / "flights.txt")
+    bench_flights.generisi_flights_txt(path, flights, n_gradova=100, n_cvorista=3, udeo_cvorista=0.5)
+    load, _, _ = phases(name, path, "", "", str(tmp_path))
+
+    # Price texts cached by earlier tests would not be counted again
+    reset_parse_caches()
+    gc.collect()
+    tracemalloc.start()
+    data = load()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+
+    check_baseline(baselines, name, "bajtova_po_letu", held / flights, "memorija_tolerancija")
+
+
+@pytest.mark.parametrize("name", IMPLEMENTATIONS)
+def test_end_to_end_time_against_baseline(name, baselines):
+    calibration = calibration_seconds()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "flights.txt")
+        bench_flights.generisi_flights_txt(path, 100_000, n_gradova=100, n_cvorista=3, udeo_cvorista=0.5)
+        dep, lan = bench_flights.najgusci_upit(path, [bench_flights.ime_grada(i) for i in range(3, 13)])
+        load, write_direct, write_indirect = phases(name, path, dep, lan, tmp)
+
+        def run():
+            data = load()
+            write_direct(data)
+            write_indirect(data)
+        seconds = best_of(2, run)
+
+    check_baseline(baselines, name, "relativno_vreme", seconds / calibration, "tolerancija")